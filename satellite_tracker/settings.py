@@ -174,3 +174,97 @@ LOGOUT_REDIRECT_URL = "home"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Satellite position snapshot (/api/positions/all/)
+# Every worker memory-maps the same file; a file lock makes sure only one of them recomputes it per interval.
+POSITION_SNAPSHOT_PATH = os.environ.get("POSITION_SNAPSHOT_PATH", str(BASE_DIR / "var" / "positions.snapshot"))
+POSITION_SNAPSHOT_INTERVAL_S = float(os.environ.get("POSITION_SNAPSHOT_INTERVAL_S", "10"))
+POSITION_SNAPSHOT_MAX_AGE_S = float(os.environ.get("POSITION_SNAPSHOT_MAX_AGE_S", "60"))
+# start a refresher thread inside each web worker; set to 0 when `manage.py refresh_positions` runs as a sidecar
+POSITION_SNAPSHOT_BACKGROUND = os.environ.get("POSITION_SNAPSHOT_BACKGROUND", "1") == "1"
+
+# Binary dump of the TLE table (python manage.py snapshot_catalog) that load_catalog maps instead of querying
+CATALOG_SNAPSHOT_PATH = os.environ.get("CATALOG_SNAPSHOT_PATH", str(BASE_DIR / "var" / "catalog.snapshot"))
+# rows written since the dump that load_catalog applies on top of it before it writes a new one
+CATALOG_SNAPSHOT_MAX_DELTA = int(os.environ.get("CATALOG_SNAPSHOT_MAX_DELTA", "500"))
+
+# TLE history (?t= on the position and track endpoints), thinned by python manage.py compact_tle_history:
+# older than COMPACT_AFTER_DAYS only the last element set of each day is kept, older than RETENTION_DAYS none (0 = never)
+TLE_HISTORY_COMPACT_AFTER_DAYS = float(os.environ.get("TLE_HISTORY_COMPACT_AFTER_DAYS", "30"))
+TLE_HISTORY_RETENTION_DAYS = float(os.environ.get("TLE_HISTORY_RETENTION_DAYS", "0"))
+
+# /api/satellites/ keyset pages: default and largest ?limit= (?all=1 still returns the whole table)
+SATELLITE_PAGE_SIZE = int(os.environ.get("SATELLITE_PAGE_SIZE", "500"))
+SATELLITE_PAGE_MAX_SIZE = int(os.environ.get("SATELLITE_PAGE_MAX_SIZE", "5000"))
+
+# Rows per chunk of the streaming NDJSON/CSV exports (?format= on /api/satellites/ and /api/positions/all/)
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "2000"))
+
+# Process pool for catalog-wide batch jobs (screen_conjunctions --workers, benchmark_propagation); 0 = one per CPU
+PROPAGATION_WORKERS = int(os.environ.get("PROPAGATION_WORKERS", "0"))
+
+# Geodetic conversion for propagated positions: "numpy" (closed form) or "pyproj" (reference)
+GEODETIC_BACKEND = os.environ.get("GEODETIC_BACKEND", "numpy")
+
+# Chebyshev ephemeris fast path for "where is it now" requests (satellites/services/ephemeris.py)
+EPHEMERIS_ENABLED = os.environ.get("EPHEMERIS_ENABLED", "1") == "1"
+EPHEMERIS_WINDOW_H = float(os.environ.get("EPHEMERIS_WINDOW_H", "6"))
+EPHEMERIS_MAX_ERROR_KM = float(os.environ.get("EPHEMERIS_MAX_ERROR_KM", "0.01"))
+EPHEMERIS_MAX_SPEED_ERROR_KMS = float(os.environ.get("EPHEMERIS_MAX_SPEED_ERROR_KMS", "1e-5"))
+EPHEMERIS_DEGREE = int(os.environ.get("EPHEMERIS_DEGREE", "8"))
+EPHEMERIS_CACHE_SIZE = int(os.environ.get("EPHEMERIS_CACHE_SIZE", "1024"))
+
+# Shared cache of "right now" positions (satellites/services/position_cache.py): one computation per satellite,
+# TLE and POSITION_CACHE_QUANTUM_S bucket. locmem is per process; point POSITION_CACHE_BACKEND/LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache + redis://...) to share it between workers.
+# MAX_ENTRIES bounds the memory, the backend culls the oldest entries past it. A quantum of 0 disables the cache.
+POSITION_CACHE_QUANTUM_S = float(os.environ.get("POSITION_CACHE_QUANTUM_S", "1"))
+POSITION_CACHE_TTL_S = float(os.environ.get("POSITION_CACHE_TTL_S", "10"))
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "positions": {
+        "BACKEND": os.environ.get("POSITION_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("POSITION_CACHE_LOCATION", "positions"),
+    },
+}
+if "redis" not in CACHES["positions"]["BACKEND"]:
+    # locmem/file/db backends cull past MAX_ENTRIES; redis has its own maxmemory policy and rejects the option
+    CACHES["positions"]["OPTIONS"] = {"MAX_ENTRIES": int(os.environ.get("POSITION_CACHE_MAX_ENTRIES", "20000"))}
+
+# Records per INSERT ... ON CONFLICT statement when import_catalog upserts the TLE table
+TLE_UPSERT_CHUNK_SIZE = int(os.environ.get("TLE_UPSERT_CHUNK_SIZE", "1000"))
+
+# Concurrent TLE refresh (satellites/services/tle_refresh.py): requests in flight overall / per host, and timeout
+TLE_REFRESH_CONCURRENCY = int(os.environ.get("TLE_REFRESH_CONCURRENCY", "16"))
+TLE_REFRESH_PER_HOST = int(os.environ.get("TLE_REFRESH_PER_HOST", "8"))
+TLE_REFRESH_TIMEOUT_S = float(os.environ.get("TLE_REFRESH_TIMEOUT_S", "15"))
+
+# Cross-worker lease on a stale-TLE refresh: how long a worker may hold it, and how often the others check
+TLE_REFRESH_LEASE_S = float(os.environ.get("TLE_REFRESH_LEASE_S", "30"))
+TLE_REFRESH_LEASE_POLL_S = float(os.environ.get("TLE_REFRESH_LEASE_POLL_S", "0.1"))
+
+# Stale TLEs: "swr" serves a stale row younger than TLE_STALE_LIMIT_HOURS at once and refreshes it in the background
+# (TLE_BACKGROUND_REFRESH_WORKERS threads per process); "blocking" makes the request wait for CelesTrak
+TLE_REFRESH_POLICY = os.environ.get("TLE_REFRESH_POLICY", "swr")
+TLE_STALE_LIMIT_HOURS = float(os.environ.get("TLE_STALE_LIMIT_HOURS", "168"))
+TLE_BACKGROUND_REFRESH_WORKERS = int(os.environ.get("TLE_BACKGROUND_REFRESH_WORKERS", "2"))
+
+# Failed TLE fetches are not retried for a while: the delay doubles with each repeated failure, up to the max.
+# An unknown/decayed object (not found) waits much longer than an upstream error (5xx, timeout)
+TLE_NOT_FOUND_TTL_S = float(os.environ.get("TLE_NOT_FOUND_TTL_S", "3600"))
+TLE_NOT_FOUND_MAX_TTL_S = float(os.environ.get("TLE_NOT_FOUND_MAX_TTL_S", "86400"))
+TLE_UPSTREAM_ERROR_TTL_S = float(os.environ.get("TLE_UPSTREAM_ERROR_TTL_S", "60"))
+TLE_UPSTREAM_ERROR_MAX_TTL_S = float(os.environ.get("TLE_UPSTREAM_ERROR_MAX_TTL_S", "3600"))
+TLE_NEGATIVE_CACHE_SIZE = int(os.environ.get("TLE_NEGATIVE_CACHE_SIZE", "10000"))
+# CelesTrak calls stop for the cooldown after this many consecutive upstream failures
+CELESTRAK_BREAKER_THRESHOLD = int(os.environ.get("CELESTRAK_BREAKER_THRESHOLD", "5"))
+CELESTRAK_BREAKER_COOLDOWN_S = float(os.environ.get("CELESTRAK_BREAKER_COOLDOWN_S", "60"))
+
+# CelesTrak groups import_catalog pulls by default (comma separated, e.g. "active,starlink,debris"); several groups
+# are downloaded concurrently by up to TLE_IMPORT_WORKERS threads
+TLE_IMPORT_GROUPS = [group for group in os.environ.get("TLE_IMPORT_GROUPS", "active").split(",") if group.strip()]
+TLE_IMPORT_WORKERS = int(os.environ.get("TLE_IMPORT_WORKERS", "8"))
+TLE_IMPORT_TIMEOUT_S = float(os.environ.get("TLE_IMPORT_TIMEOUT_S", "60"))
@@ -1,7 +1,11 @@
 from django.contrib import admin
 
-from .models import TLE, Favorite
+from .models import TLE, Favorite, Conjunction, TLERefreshLease, DownloadValidator, TLEHistory
 
 #my models to be registered in the admin interface
 admin.site.register(TLE)
 admin.site.register(Favorite)
+admin.site.register(Conjunction)
+admin.site.register(TLERefreshLease)
+admin.site.register(DownloadValidator)
+admin.site.register(TLEHistory)
@@ -0,0 +1,70 @@
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from satellites.models import TLE
+from satellites.services.parallel import propagate_parallel, shutdown_executor
+from satellites.services.propagation import julian_dates
+
+"""Command that measures how catalog propagation scales with the number of worker processes.
+Every worker count propagates the same satellites over the same time grid, results are checked against the
+single-process run and the best of --repeat runs is reported (the pool is warmed up first, so process start-up and
+shard parsing are not counted)."""
+
+
+class Command(BaseCommand):
+    help = "Benchmark sharded multi-process propagation of the TLE catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", default=None, help="Comma separated worker counts (default: 1,2,4,... up to the CPU count).")
+        parser.add_argument("--satellites", type=int, default=None, help="Number of satellites (default: the whole TLE table, repeated if needed).")
+        parser.add_argument("--minutes", type=float, default=90.0, help="Length of the time grid (default: 90 min).")
+        parser.add_argument("--step", type=float, default=10.0, help="Time step in seconds (default: 10 s).")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per worker count, the best one is kept (default: 3).")
+
+    def handle(self, *args, **options):
+        tles = list(TLE.objects.order_by("norad_id").values_list("line1", "line2"))
+        if not tles:
+            raise CommandError("The TLE table is empty, run import_catalog first.")
+        count = options["satellites"] or len(tles)
+        tles = [tles[i % len(tles)] for i in range(count)]
+
+        if options["workers"]:
+            worker_counts = [int(value) for value in options["workers"].split(",")]
+        else:
+            cpus = os.cpu_count() or 1
+            worker_counts = sorted({1, cpus} | {2 ** k for k in range(1, cpus.bit_length()) if 2 ** k <= cpus})
+        if any(workers <= 0 for workers in worker_counts):
+            raise CommandError("--workers must be positive.")
+
+        offsets = np.arange(0.0, options["minutes"] * 60.0, options["step"])
+        jd, fr = julian_dates(datetime.now(timezone.utc), offsets)
+        evaluations = count * len(offsets)
+        self.stdout.write(f"{count} satellites x {len(offsets)} instants = {evaluations} propagations, {os.cpu_count()} CPUs")
+        self.stdout.write(f"{'workers':>8} {'seconds':>9} {'props/s':>12} {'speedup':>8} {'efficiency':>10}")
+
+        baseline_time = None
+        baseline = None
+        try:
+            for workers in worker_counts:
+                propagate_parallel(tles, jd[:2], fr[:2], workers=workers)  # warm-up: start the pool, parse the shards
+                best = float("inf")
+                for _ in range(max(1, options["repeat"])):
+                    started = time.perf_counter()
+                    result = propagate_parallel(tles, jd, fr, workers=workers)
+                    best = min(best, time.perf_counter() - started)
+
+                if baseline is None:
+                    baseline, baseline_time = result, best
+                elif not np.array_equal(result.r_km, baseline.r_km, equal_nan=True):
+                    raise CommandError(f"Results with {workers} workers differ from the single-process run.")
+
+                speedup = baseline_time / best
+                self.stdout.write(
+                    f"{workers:>8} {best:>9.3f} {evaluations / best:>12.0f} {speedup:>7.2f}x {speedup / workers:>9.0%}"
+                )
+        finally:
+            shutdown_executor()
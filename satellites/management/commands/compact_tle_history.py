@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from satellites.models import TLEHistory
+from satellites.services.tle_history import compact_history
+
+"""Command that thins out the TLE history (see tle_history.py); meant for a daily cron:
+python manage.py compact_tle_history"""
+
+
+class Command(BaseCommand):
+    help = "Compact old TLE history to one element set per day and expire it past the retention."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--compact-after-days", type=float, default=None,
+                            help="Override TLE_HISTORY_COMPACT_AFTER_DAYS (0 disables compaction).")
+        parser.add_argument("--retention-days", type=float, default=None,
+                            help="Override TLE_HISTORY_RETENTION_DAYS (0 keeps everything).")
+
+    def handle(self, *args, **options):
+        expired, compacted = compact_history(
+            compact_after_days=options["compact_after_days"], retention_days=options["retention_days"]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"TLE history: {expired} expired, {compacted} compacted away, {TLEHistory.objects.count()} kept."
+        ))
@@ -1,24 +1,141 @@
-from django.core.management.base import BaseCommand
-import httpx
-from satellites.services.tle_fetcher import parse_tle_catalog, upsert_tles
+import time
 
-CELESTRAK_ACTIVE = "https://celestrak.org/NORAD/elements/gp.php?GROUP=active&FORMAT=TLE"
+from django.core.management.base import BaseCommand, CommandError
+import httpx
+from satellites.services.catalog_ingest import configured_groups, group_url, ingest_catalog
+from satellites.services.catalog_snapshot import refresh_catalog_snapshot
+from satellites.services.http_cache import load_validator, record_download, record_not_modified, request_headers
+from satellites.services.tle_fetcher import parse_tle_catalog, upsert_tle_stream, upsert_tles
+from satellites.services.tle_parser import ParseStats, iter_tles, open_tle_file
 
 """Command to import/refresh the satellite catalog from CelesTrak.
-Needed to run this at least once to populate the TLE table run: python manage.py import_catalog to populate the TLE table"""
+Needed to run this at least once to populate the TLE table run: python manage.py import_catalog to populate the TLE table
+With --file it streams a local TLE/3LE file (plain or gzipped, e.g. a historical dump) in chunks instead.
+Several sources (--group starlink --group debris --file extra.tle, or TLE_IMPORT_GROUPS) are read concurrently
+and merged by NORAD ID, the freshest epoch winning, see services/catalog_ingest.py."""
+
+def _megabytes(size_bytes):
+    return f"{size_bytes / 1e6:.2f} MB"
+
 
 class Command(BaseCommand):
-    help = "Import/refresh the satellite catalog (TLE table) from CelesTrak 'active' group."
+    help = "Import/refresh the satellite catalog (TLE table) from CelesTrak groups (TLE_IMPORT_GROUPS, 'active' by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=None, help="Records per bulk upsert statement (default: TLE_UPSERT_CHUNK_SIZE).")
+        parser.add_argument("--group", action="append", default=None, help="CelesTrak group to import (repeatable, default: TLE_IMPORT_GROUPS).")
+        parser.add_argument("--file", action="append", default=None, help="Import this TLE file (.gz ok), repeatable; without --group no CelesTrak group is downloaded.")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] is not None and options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size must be positive.")
+        files = options["file"] or []
+        groups = options["group"] or ([] if files else configured_groups())
+        if not groups and len(files) == 1:
+            self._import_file(files[0], options["chunk_size"])
+            return
+        if len(groups) + len(files) > 1:
+            self._ingest(groups, files, options["chunk_size"])
+            return
+        if not groups:
+            raise CommandError("No CelesTrak group to import (TLE_IMPORT_GROUPS is empty).")
 
-    def handle(self, *args, **options): 
-        # fetch the active satellites catalog from CelesTrak
-        self.stdout.write("Downloading active satellites catalog from CelesTrak...")
+        # fetch the group's catalog from CelesTrak
+        self.stdout.write(f"Downloading {groups[0]} satellites catalog from CelesTrak...")
+        url = group_url(groups[0])
+        validator = load_validator(url)
+        started = time.perf_counter()
         with httpx.Client(timeout=30.0, follow_redirects=True) as client:
-            r = client.get(CELESTRAK_ACTIVE)
+            r = client.get(url, headers=request_headers(validator))
+            if r.status_code == 304 and validator is not None:
+                record_not_modified(validator)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f"Catalog not modified since the last import (304 in {elapsed:.2f}s): parse and upsert skipped, "
+                    f"saved {_megabytes(validator.size_bytes)} and ~{max(validator.download_s - elapsed, 0.0):.2f}s."
+                ))
+                return
             r.raise_for_status()
             text = r.text
+        downloaded = time.perf_counter()
 
         # parse and insert the TLE records into the database
         records = parse_tle_catalog(text)
-        count = upsert_tles(records)
-        self.stdout.write(self.style.SUCCESS(f"Upserted {count} TLE records."))
+        parsed = time.perf_counter()
+        if options["chunk_size"] is not None:
+            result = upsert_tles(records, chunk_size=options["chunk_size"])
+        else:
+            result = upsert_tles(records)
+        stored = time.perf_counter()
+        # only now that the records are in: a failed import must not be skipped with a 304 next time
+        record_download(url, r.headers, r.num_bytes_downloaded, stored - started, validator is not None)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Upserted {result.total} TLE records: {result.inserted} inserted, {result.updated} updated, "
+            f"{result.unchanged} unchanged, {result.rejected} older than stored."
+        ))
+        self.stdout.write(
+            f"download {downloaded - started:.2f}s ({_megabytes(r.num_bytes_downloaded)}), "
+            f"parse {parsed - downloaded:.2f}s, upsert {stored - parsed:.2f}s, total {stored - started:.2f}s"
+        )
+        self._refresh_snapshot(result)
+
+    def _refresh_snapshot(self, result):
+        """Re-dump the binary catalog snapshot (snapshot_catalog) when there is one and the import changed rows."""
+        if result is None or not (result.inserted or result.updated):
+            return
+        snapshot = refresh_catalog_snapshot()
+        if snapshot is not None:
+            self.stdout.write(f"Catalog snapshot rewritten ({len(snapshot.data)} TLEs).")
+
+    def _import_file(self, path, chunk_size):
+        self.stdout.write(f"Streaming TLEs from {path}...")
+        stats = ParseStats()
+        started = time.perf_counter()
+        try:
+            with open_tle_file(path) as lines:
+                result = upsert_tle_stream(iter_tles(lines, stats=stats), chunk_size=chunk_size)
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Upserted {result.total} TLE records: {result.inserted} inserted, {result.updated} updated, "
+            f"{result.unchanged} unchanged, {result.rejected} older than stored ({stats.skipped} malformed skipped)."
+        ))
+        self.stdout.write(f"total {elapsed:.2f}s")
+        self._refresh_snapshot(result)
+
+    def _ingest(self, groups, files, chunk_size):
+        self.stdout.write(f"Reading {len(groups)} CelesTrak group(s) and {len(files)} file(s) concurrently...")
+        result = ingest_catalog(groups, files, chunk_size=chunk_size)
+
+        for source in result.sources:
+            if source.error:
+                self.stderr.write(f"  {source.source}: FAILED after {source.seconds:.2f}s ({source.error})")
+            elif source.not_modified:
+                self.stdout.write(
+                    f"  {source.source}: not modified (304 in {source.seconds:.2f}s), "
+                    f"saved {_megabytes(source.saved_bytes)} and ~{source.saved_s:.2f}s"
+                )
+            else:
+                self.stdout.write(
+                    f"  {source.source}: {source.records} records, {source.skipped} malformed, {source.seconds:.2f}s"
+                )
+        if result.upserted is not None:
+            upserted = result.upserted
+            self.stdout.write(self.style.SUCCESS(
+                f"Upserted {upserted.total} TLE records ({result.unique} distinct NORAD IDs): {upserted.inserted} "
+                f"inserted, {upserted.updated} updated, {upserted.unchanged} unchanged, "
+                f"{upserted.rejected} older than stored."
+            ))
+        not_modified = [source for source in result.sources if source.not_modified]
+        if not_modified:
+            self.stdout.write(
+                f"{len(not_modified)} source(s) unchanged, saved {_megabytes(sum(s.saved_bytes for s in not_modified))} "
+                f"and ~{sum(s.saved_s for s in not_modified):.2f}s of download and parse."
+            )
+        self.stdout.write(", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result.timings.items()))
+        self._refresh_snapshot(result.upserted)
+        if result.failed:
+            raise CommandError(f"{len(result.failed)} of {len(result.sources)} sources could not be read.")
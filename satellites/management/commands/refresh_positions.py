@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from satellites.services.snapshot import refresh_snapshot, snapshot_interval
+
+"""Command that keeps the shared full-catalog position snapshot fresh.
+Run it next to gunicorn (python manage.py refresh_positions) and set POSITION_SNAPSHOT_BACKGROUND=0 so the web
+workers only read the snapshot, or pass --once to publish a single snapshot (e.g. from cron)."""
+
+
+class Command(BaseCommand):
+    help = "Recompute the full-catalog position snapshot every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=None, help="Seconds between snapshots (default: POSITION_SNAPSHOT_INTERVAL_S).")
+        parser.add_argument("--once", action="store_true", help="Publish one snapshot and exit.")
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or snapshot_interval()
+        while True:
+            started = time.perf_counter()
+            snapshot = refresh_snapshot()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Snapshot generation {snapshot.generation}: {len(snapshot.data)} positions in {elapsed:.3f}s"
+            )
+            if options["once"]:
+                return
+            time.sleep(max(0.0, interval - elapsed))
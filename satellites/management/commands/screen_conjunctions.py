@@ -0,0 +1,36 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from satellites.services.conjunctions import screen_catalog, store_conjunctions
+
+"""Command that screens the whole TLE catalog for close approaches and stores them for /api/conjunctions/.
+Run it from cron (e.g. every few hours after import_catalog), each run replaces the previous results."""
+
+
+class Command(BaseCommand):
+    help = "Find every pair of satellites closer than --threshold-km during the next --hours and store them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threshold-km", type=float, default=10.0, help="Report pairs closer than this (default: 10 km).")
+        parser.add_argument("--hours", type=float, default=24.0, help="Length of the screening window (default: 24 h).")
+        parser.add_argument("--step", type=float, default=20.0, help="Sampling step in seconds (default: 20 s).")
+        parser.add_argument("--workers", type=int, default=1, help="Propagate on this many processes (default: 1, in-process).")
+
+    def handle(self, *args, **options):
+        threshold_km = options["threshold_km"]
+        hours = options["hours"]
+        step = options["step"]
+        workers = options["workers"]
+        if threshold_km <= 0 or hours <= 0 or step <= 0 or workers <= 0:
+            raise CommandError("--threshold-km, --hours, --step and --workers must be positive.")
+
+        screened_at = datetime.now(timezone.utc).replace(microsecond=0)
+        started = time.perf_counter()
+        events = screen_catalog(start=screened_at, hours=hours, threshold_km=threshold_km, step_s=step, workers=workers)
+        elapsed = time.perf_counter() - started
+        stored = store_conjunctions(events, screened_at)
+        self.stdout.write(
+            self.style.SUCCESS(f"Stored {stored} conjunctions under {threshold_km} km over {hours} h in {elapsed:.1f}s")
+        )
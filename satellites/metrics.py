@@ -0,0 +1,56 @@
+from prometheus_client import Counter, Gauge
+
+"""Application metrics, exposed with the django_prometheus ones on /metrics."""
+
+TLE_FETCHES = Counter(
+    "satellites_tle_fetches_total",
+    "CelesTrak fetches made by get_or_refresh_tle.",
+    ["outcome"],  # ok / not_found / error
+)
+
+TLE_FETCHES_COALESCED = Counter(
+    "satellites_tle_fetches_coalesced_total",
+    "Stale-TLE refreshes that did not fetch because another caller was already doing it.",
+    ["scope"],  # process: waited on a thread of this worker / lease: another worker held the DB lease
+)
+
+TLE_BACKGROUND_REFRESHES = Counter(
+    "satellites_tle_background_refreshes_total",
+    "Stale-while-revalidate refreshes of stale TLEs served from the database.",
+    ["outcome"],  # queued / ok / error
+)
+
+TLE_NEGATIVE_CACHE = Counter(
+    "satellites_tle_negative_cache_total",
+    "Negative cache of failed TLE fetches: entries stored, and fetches skipped because of one (hit).",
+    ["event", "reason"],  # stored / hit x not_found / upstream_error
+)
+
+CELESTRAK_BREAKER_STATE = Gauge(
+    "satellites_upstream_breaker_state",
+    "Circuit breaker in front of an upstream: 0 closed, 1 open, 2 half-open.",
+    ["upstream"],
+)
+
+CELESTRAK_BREAKER_TRANSITIONS = Counter(
+    "satellites_upstream_breaker_transitions_total",
+    "Circuit breaker state changes.",
+    ["upstream", "state"],
+)
+
+UPSTREAM_CALLS_REJECTED = Counter(
+    "satellites_upstream_calls_rejected_total",
+    "Upstream calls not made because the circuit breaker was open.",
+    ["upstream"],
+)
+
+CONDITIONAL_DOWNLOADS = Counter(
+    "satellites_conditional_downloads_total",
+    "CelesTrak downloads sent with If-None-Match/If-Modified-Since.",
+    ["result"],  # not_modified (304, nothing parsed or written) / modified
+)
+
+CONDITIONAL_BYTES_SAVED = Counter(
+    "satellites_conditional_download_bytes_saved_total",
+    "Bytes not downloaded thanks to a 304, estimated from the last full download of the URL.",
+)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellites', '0002_favorite_user_alter_favorite_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conjunction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('norad_id_a', models.PositiveIntegerField()),
+                ('norad_id_b', models.PositiveIntegerField()),
+                ('tca', models.DateTimeField()),
+                ('miss_distance_km', models.FloatField()),
+                ('relative_speed_kms', models.FloatField()),
+                ('screened_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['tca'],
+                'indexes': [models.Index(fields=['tca'], name='satellites__tca_a9d747_idx'), models.Index(fields=['norad_id_a', 'tca'], name='satellites__norad_i_bbeb47_idx'), models.Index(fields=['norad_id_b', 'tca'], name='satellites__norad_i_dd6b11_idx')],
+            },
+        ),
+    ]
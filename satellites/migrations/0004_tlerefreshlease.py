@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellites', '0003_conjunction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TLERefreshLease',
+            fields=[
+                ('norad_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('holder', models.CharField(max_length=128)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:20
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations, models
+
+
+# frozen copies of satellites.tle_format as of this migration: later changes to it must not change what it backfills
+def tle_epoch(line1):
+    try:
+        year = int(line1[18:20])
+        day = float(line1[20:32])
+    except ValueError:
+        return None
+    year += 1900 if year >= 57 else 2000
+    return datetime(year, 1, 1, tzinfo=timezone.utc) + timedelta(days=day - 1)
+
+
+def tle_content_hash(name, line1, line2):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{name}\n{line1}\n{line2}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def backfill(apps, schema_editor):
+    TLE = apps.get_model("satellites", "TLE")
+    rows = TLE.objects.only("norad_id", "name", "line1", "line2").order_by("norad_id")
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        row.epoch = tle_epoch(row.line1)
+        row.content_hash = tle_content_hash(row.name, row.line1, row.line2)
+        batch.append(row)
+        if len(batch) >= 1000:
+            # leave updated_at alone: the rows were not refreshed
+            TLE.objects.bulk_update(batch, ["epoch", "content_hash"])
+            batch = []
+    if batch:
+        TLE.objects.bulk_update(batch, ["epoch", "content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellites', '0004_tlerefreshlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tle',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='tle',
+            name='epoch',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellites', '0005_tle_epoch_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadValidator',
+            fields=[
+                ('url', models.CharField(max_length=512, primary_key=True, serialize=False)),
+                ('etag', models.CharField(blank=True, max_length=256)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('size_bytes', models.PositiveBigIntegerField(default=0)),
+                ('download_s', models.FloatField(default=0.0)),
+                ('checked_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
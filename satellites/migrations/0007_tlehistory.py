@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:30
+
+from django.db import migrations, models
+
+
+def seed_history(apps, schema_editor):
+    # the current element sets are the first entries of the history
+    TLE = apps.get_model("satellites", "TLE")
+    TLEHistory = apps.get_model("satellites", "TLEHistory")
+    rows = TLE.objects.filter(epoch__isnull=False).values_list("norad_id", "epoch", "name", "line1", "line2")
+    TLEHistory.objects.bulk_create(
+        [
+            TLEHistory(norad_id=norad_id, epoch=epoch, name=name, line1=line1, line2=line2)
+            for norad_id, epoch, name, line1, line2 in rows.iterator(chunk_size=2000)
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellites', '0006_downloadvalidator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TLEHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('norad_id', models.PositiveIntegerField()),
+                ('epoch', models.DateTimeField()),
+                ('name', models.CharField(blank=True, max_length=128)),
+                ('line1', models.CharField(max_length=80)),
+                ('line2', models.CharField(max_length=80)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'TLE history',
+                'ordering': ['norad_id', 'epoch'],
+                'constraints': [models.UniqueConstraint(fields=('norad_id', 'epoch'), name='tlehistory_norad_epoch')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from satellites.tle_format import tle_content_hash, tle_epoch
+
 #Each model class represents a table in the database.
 
 class TLE(models.Model):
@@ -12,6 +14,17 @@ class TLE(models.Model):
     line1 = models.CharField(max_length=80) # 1st of TLE data
     line2 = models.CharField(max_length=80) # 2nd of TLE data
     updated_at = models.DateTimeField(auto_now=True) # timestamp of last update
+    epoch = models.DateTimeField(null=True, blank=True, db_index=True) # element set epoch, parsed from line1
+    content_hash = models.CharField(max_length=32, blank=True, db_index=True) # digest of name + lines
+
+    def save(self, *args, **kwargs):
+        # keep epoch and content_hash in step with the lines (bulk writes set them themselves)
+        self.epoch = tle_epoch(self.line1)
+        self.content_hash = tle_content_hash(self.name, self.line1, self.line2)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "epoch", "content_hash"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         # shows norad_id and name
@@ -35,3 +48,76 @@ class Favorite(models.Model):
     def __str__(self):
         # shows name and norad_id
         return f"{self.name} ({self.norad_id})"
+
+class Conjunction(models.Model):
+    """A close approach between two catalogued objects found by the last conjunction screening."""
+
+    norad_id_a = models.PositiveIntegerField() # lower NORAD ID of the pair
+    norad_id_b = models.PositiveIntegerField() # higher NORAD ID of the pair
+    tca = models.DateTimeField() # time of closest approach
+    miss_distance_km = models.FloatField() # distance at TCA
+    relative_speed_kms = models.FloatField() # relative velocity at TCA
+    screened_at = models.DateTimeField() # when the screening run that found it started
+
+    class Meta:
+
+        """Meta options for the Conjunction model."""
+        ordering = ["tca"] # soonest first
+        indexes = [
+            models.Index(fields=["tca"]),
+            models.Index(fields=["norad_id_a", "tca"]),
+            models.Index(fields=["norad_id_b", "tca"]),
+        ]
+
+    def __str__(self):
+        # shows the pair and the miss distance
+        return f"{self.norad_id_a} x {self.norad_id_b} @ {self.tca:%Y-%m-%d %H:%M:%S} ({self.miss_distance_km:.2f} km)"
+
+class TLERefreshLease(models.Model):
+    """Short-lived claim on a CelesTrak refresh, so only one web worker fetches a given stale TLE at a time."""
+
+    norad_id = models.PositiveIntegerField(primary_key=True) # satellite being refreshed
+    holder = models.CharField(max_length=128) # host:pid:token of the worker doing it
+    expires_at = models.DateTimeField() # after this the lease can be taken over (crashed holder)
+
+    def __str__(self):
+        # shows who holds the lease and until when
+        return f"{self.norad_id} held by {self.holder} until {self.expires_at:%H:%M:%S}"
+
+class DownloadValidator(models.Model):
+    """ETag/Last-Modified of the last full download of an upstream URL, sent back to get a 304 when it is unchanged."""
+
+    url = models.CharField(max_length=512, primary_key=True) # the exact URL requested
+    etag = models.CharField(max_length=256, blank=True) # ETag response header
+    last_modified = models.CharField(max_length=64, blank=True) # Last-Modified response header, as sent
+    size_bytes = models.PositiveBigIntegerField(default=0) # bytes on the wire of that download
+    download_s = models.FloatField(default=0.0) # how long that download (and parse) took
+    checked_at = models.DateTimeField(auto_now=True) # last 200 or 304 from the URL
+
+    def __str__(self):
+        # shows the URL and its validators
+        return f"{self.url} etag={self.etag or '-'} last_modified={self.last_modified or '-'}"
+
+class TLEHistory(models.Model):
+    """Append-only record of every element set stored for a satellite, to propagate past instants with the TLE of the time."""
+
+    norad_id = models.PositiveIntegerField() # NORAD ID of the satellite
+    epoch = models.DateTimeField() # element set epoch
+    name = models.CharField(max_length=128, blank=True) # satellite name at the time
+    line1 = models.CharField(max_length=80) # 1st of TLE data
+    line2 = models.CharField(max_length=80) # 2nd of TLE data
+    recorded_at = models.DateTimeField(auto_now_add=True) # when it was added here
+
+    class Meta:
+
+        """Meta options for the TLEHistory model."""
+        ordering = ["norad_id", "epoch"]
+        constraints = [
+            # one element set per epoch, and the (norad_id, epoch) index the time travel lookups run on
+            models.UniqueConstraint(fields=["norad_id", "epoch"], name="tlehistory_norad_epoch"),
+        ]
+        verbose_name_plural = "TLE history"
+
+    def __str__(self):
+        # shows norad_id and epoch
+        return f"{self.norad_id} @ {self.epoch:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,31 @@
+from rest_framework import renderers
+
+from .services.export import encode_rows
+
+# renderers for the streaming exports (?format=ndjson / ?format=csv, or the matching Accept header). The export views
+# answer those formats with a StreamingHttpResponse themselves; rendering only happens for the small responses that
+# still go through DRF, such as a 400 {"detail": ...}.
+
+
+class _RowsRenderer(renderers.BaseRenderer):
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        if not rows:
+            return b""
+        fields = list(rows[0])
+        body = encode_rows([[row.get(field) for field in fields] for row in rows], fields, self.format)
+        if self.format == "csv":
+            body = encode_rows([fields], fields, "csv") + body
+        return body
+
+
+class NDJSONRenderer(_RowsRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class CSVRenderer(_RowsRenderer):
+    media_type = "text/csv"
+    format = "csv"
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from django.db.models import Q
 
 from satellites.models import TLE
 
@@ -63,3 +66,56 @@ def search_catalog(query: str) -> Optional[TLE]:
         return match
 
     return qs.filter(name__icontains=query).order_by("name").first()
+
+
+# /api/satellites/: keyset pages straight from values_list, no model instances or serializer per row
+CATALOG_FIELDS = ("norad_id", "name", "line1", "line2", "updated_at")
+
+
+class CatalogPage(NamedTuple):
+    results: List[Dict[str, object]]
+    next_after: Optional[int]  # NORAD ID to pass as ?after= for the next page, None on the last one
+
+
+def parse_catalog_fields(raw: Optional[str]) -> Sequence[str]:
+    """?fields=norad_id,name --> the requested columns in CATALOG_FIELDS order (all of them when empty)."""
+    requested = [field.strip() for field in (raw or "").split(",") if field.strip()]
+    if not requested:
+        return CATALOG_FIELDS
+    unknown = sorted(set(requested) - set(CATALOG_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown field(s) {', '.join(unknown)}, expected some of {', '.join(CATALOG_FIELDS)}.")
+    return [field for field in CATALOG_FIELDS if field in requested]
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        # as DRF renders a DateTimeField, so the rows look the same as the serialized full dump
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return value
+
+
+def catalog_page(
+    *, after: Optional[int] = None, limit: int = 500, fields: Sequence[str] = CATALOG_FIELDS, search: str = ""
+) -> CatalogPage:
+    """One page of the catalog ordered by NORAD ID, starting after the given ID.
+    The seek is WHERE norad_id > after on the primary key, so every page costs the same however deep it is."""
+    qs = TLE.objects.order_by("norad_id")
+    if after is not None:
+        qs = qs.filter(norad_id__gt=after)
+    search = (search or "").strip()
+    if search:
+        match = Q(name__icontains=search)
+        if search.isdigit():
+            match |= Q(norad_id=int(search))
+        qs = qs.filter(match)
+
+    # the key is always read, one row past the page tells whether there is a next one
+    columns = list(dict.fromkeys(["norad_id", *fields]))
+    rows = list(qs.values_list(*columns)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    positions = [columns.index(field) for field in fields]
+    results = [{field: _json_value(row[i]) for field, i in zip(fields, positions)} for row in rows]
+    return CatalogPage(results, rows[-1][0] if has_more else None)
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+from django.conf import settings
+
+from satellites.models import DownloadValidator
+from satellites.services.http_cache import load_validators, record_download, record_not_modified, request_headers
+from satellites.services.tle_fetcher import UpsertResult, upsert_tles
+from satellites.services.tle_parser import ParseStats, iter_tles, open_tle_file, tle_epoch
+
+"""
+Catalog ingestion from several sources at once: CelesTrak groups (active, starlink, debris, stations...) and local
+TLE files. Every source is read by a worker thread of its own, which feeds the lines to iter_tles as they arrive,
+so downloading and parsing overlap and the wall time is that of the slowest source, not the sum of all of them.
+The per-source records are then merged by NORAD ID (objects are in several groups: the freshest epoch wins) and
+written with one upsert_tles call.
+Group downloads are conditional (http_cache.py): a group that answers 304 is neither parsed nor written.
+"""
+
+CELESTRAK_GROUP = "https://celestrak.org/NORAD/elements/gp.php?GROUP={group}&FORMAT=TLE"
+
+
+def group_url(group: str) -> str:
+    return CELESTRAK_GROUP.format(group=group)
+
+
+def configured_groups() -> List[str]:
+    """The CelesTrak groups import_catalog pulls when none are given (TLE_IMPORT_GROUPS)."""
+    groups = getattr(settings, "TLE_IMPORT_GROUPS", ["active"])
+    if isinstance(groups, str):
+        groups = groups.split(",")
+    return [group.strip() for group in groups if group.strip()]
+
+
+class SourceResult(NamedTuple):
+    source: str  # URL or file path
+    records: int  # valid TLE records read
+    skipped: int  # malformed records thrown away by the parser
+    seconds: float  # download + parse time of this source
+    error: Optional[str]  # why the source could not be read, None when it was
+    not_modified: bool = False  # 304: unchanged since the last import, nothing read
+    size_bytes: int = 0  # bytes downloaded (compressed size on the wire)
+    saved_bytes: int = 0  # with a 304: size of the download it spared
+    saved_s: float = 0.0  # with a 304: time the last full download and parse took, minus this request
+
+
+class IngestResult(NamedTuple):
+    sources: List[SourceResult]
+    unique: int  # distinct NORAD IDs after the merge
+    upserted: Optional[UpsertResult]  # None when nothing was read
+    timings: Dict[str, float]  # seconds per stage: read (download + parse), merge, upsert, total
+
+    @property
+    def failed(self) -> List[SourceResult]:
+        return [source for source in self.sources if source.error is not None]
+
+
+Freshest = Dict[int, Tuple[Optional[datetime], Dict]]
+
+
+def _keep_freshest(freshest: Freshest, record: Dict, epoch: Optional[datetime]) -> None:
+    current = freshest.get(record["norad_id"])
+    if current is None or (epoch is not None and (current[0] is None or epoch > current[0])):
+        freshest[record["norad_id"]] = (epoch, record)
+
+
+def _read_records(lines: Iterable, stats: ParseStats) -> Freshest:
+    freshest: Freshest = {}
+    for record in iter_tles(lines, stats=stats):
+        _keep_freshest(freshest, record, tle_epoch(record["line1"]))
+    return freshest
+
+
+def _read_url(
+    client: httpx.Client, url: str, validator: Optional[DownloadValidator]
+) -> Tuple[Freshest, SourceResult, Optional[httpx.Headers]]:
+    started = time.perf_counter()
+    stats = ParseStats()
+    try:
+        with client.stream("GET", url, headers=request_headers(validator)) as response:
+            if response.status_code == 304 and validator is not None:
+                seconds = time.perf_counter() - started
+                return {}, SourceResult(
+                    url, 0, 0, seconds, None, not_modified=True,
+                    saved_bytes=validator.size_bytes, saved_s=max(validator.download_s - seconds, 0.0),
+                ), None
+            response.raise_for_status()
+            freshest = _read_records(response.iter_lines(), stats)
+            size_bytes = response.num_bytes_downloaded
+    except httpx.HTTPError as exc:
+        return {}, SourceResult(url, 0, 0, time.perf_counter() - started, f"{type(exc).__name__}: {exc}"), None
+    seconds = time.perf_counter() - started
+    return freshest, SourceResult(url, stats.records, stats.skipped, seconds, None, size_bytes=size_bytes), response.headers
+
+
+def _read_file(path: str) -> Tuple[Freshest, SourceResult, None]:
+    started = time.perf_counter()
+    stats = ParseStats()
+    try:
+        with open_tle_file(path) as lines:
+            freshest = _read_records(lines, stats)
+    except OSError as exc:
+        return {}, SourceResult(path, 0, 0, time.perf_counter() - started, f"{type(exc).__name__}: {exc}"), None
+    return freshest, SourceResult(path, stats.records, stats.skipped, time.perf_counter() - started, None), None
+
+
+def ingest_catalog(
+    groups: Sequence[str] = (),
+    files: Sequence[str] = (),
+    *,
+    client: Optional[httpx.Client] = None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> IngestResult:
+    """Read every group and file concurrently, merge them freshest-epoch-wins and upsert the result.
+    A source that fails is reported in its SourceResult and the others are still imported. The validators of the
+    groups downloaded in full are only stored once their records are written, so a failed import is not skipped
+    the next time with a 304.
+    The client can be injected (one with an httpx.MockTransport in the tests); it is shared by the worker threads."""
+    started = time.perf_counter()
+    urls = [group_url(group) for group in dict.fromkeys(groups)]
+    paths = list(dict.fromkeys(files))
+    workers = workers or int(getattr(settings, "TLE_IMPORT_WORKERS", 8))
+    validators = load_validators(urls)
+    close_client = client is None
+    client = client or httpx.Client(
+        timeout=float(getattr(settings, "TLE_IMPORT_TIMEOUT_S", 60.0)),
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=workers),
+    )
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls) + len(paths)))) as pool:
+            futures = [pool.submit(_read_url, client, url, validators.get(url)) for url in urls]
+            futures += [pool.submit(_read_file, path) for path in paths]
+            results = [future.result() for future in futures]
+    finally:
+        if close_client:
+            client.close()
+    read = time.perf_counter()
+
+    merged: Freshest = {}
+    for freshest, _, _ in results:
+        if not merged:
+            merged = freshest
+            continue
+        for epoch, record in freshest.values():
+            _keep_freshest(merged, record, epoch)
+    records = [record for _, record in merged.values()]
+    merged_at = time.perf_counter()
+
+    upserted = upsert_tles(records, chunk_size=chunk_size) if records else None
+    stored = time.perf_counter()
+
+    for _, source, headers in results:
+        if source.not_modified:
+            record_not_modified(validators[source.source])
+        elif headers is not None:
+            record_download(source.source, headers, source.size_bytes, source.seconds, source.source in validators)
+
+    timings = {
+        "read": read - started,
+        "merge": merged_at - read,
+        "upsert": stored - merged_at,
+        "total": stored - started,
+    }
+    return IngestResult([source for _, source, _ in results], len(records), upserted, timings)
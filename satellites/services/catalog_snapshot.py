@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+from sgp4.api import WGS72, Satrec
+
+from satellites.models import TLE
+
+logger = logging.getLogger(__name__)
+
+"""
+Binary catalog snapshot: the whole TLE table plus the SGP4 elements already parsed out of the lines, in one file
+(fixed header + NumPy structured array). Loading it is an mmap, no ORM query and no twoline2rv per row; the Satrec
+objects are rebuilt with sgp4init straight from the stored elements. Forked gunicorn workers map the same file, so
+they share its pages instead of each holding the rows as model instances.
+The header carries the catalog signature (row count, latest updated_at) the file was dumped at. Rows written since
+(single refreshes, touches) are read back as a delta and applied on top of the mapped rows by snapshot.load_catalog,
+which rewrites the file once that delta grows past CATALOG_SNAPSHOT_MAX_DELTA rows or rows were deleted; a catalog
+import rewrites an existing snapshot straight away (refresh_catalog_snapshot).
+"""
+
+CATALOG_SNAPSHOT_MAGIC = b"STLCAT01"
+CATALOG_SNAPSHOT_VERSION = 1
+# magic, format version, row size, unix timestamp of the dump, row count, signature row count, signature latest
+# updated_at in microseconds (-1 for an empty table) -> padded to 64 bytes so the array stays aligned
+_HEADER = struct.Struct("<8sIIdQQq")
+HEADER_SIZE = 64
+
+CATALOG_DTYPE = np.dtype(
+    [
+        ("norad_id", "<u4"),
+        ("name", "S128"),
+        ("line1", "S69"),
+        ("line2", "S69"),
+        # the sgp4init arguments, as twoline2rv parsed them
+        ("jdsatepoch", "<f8"),
+        ("jdsatepochF", "<f8"),
+        ("bstar", "<f8"),
+        ("ndot", "<f8"),
+        ("nddot", "<f8"),
+        ("ecco", "<f8"),
+        ("argpo", "<f8"),
+        ("inclo", "<f8"),
+        ("mo", "<f8"),
+        ("no_kozai", "<f8"),
+        ("nodeo", "<f8"),
+    ]
+)
+
+_ELEMENTS = ("bstar", "ndot", "nddot", "ecco", "argpo", "inclo", "mo", "no_kozai", "nodeo")
+# sgp4init counts the epoch in days from 1949 December 31 00:00 UT
+_SGP4_EPOCH_JD = 2433281.5
+
+Signature = Tuple[int, int]
+
+
+class CatalogSnapshot(NamedTuple):
+    created: datetime
+    signature: Signature  # catalog_signature() of the table when it was dumped
+    data: np.ndarray  # CATALOG_DTYPE rows sorted by NORAD ID, memory-mapped when read from disk
+
+
+def catalog_snapshot_path() -> Path:
+    return Path(getattr(settings, "CATALOG_SNAPSHOT_PATH", Path(settings.BASE_DIR) / "var" / "catalog.snapshot"))
+
+
+def catalog_signature() -> Signature:
+    """(row count, latest updated_at in microseconds): changes whenever a TLE row is written or deleted."""
+    agg = TLE.objects.aggregate(count=Count("pk"), latest=Max("updated_at"))
+    latest = agg["latest"]
+    return agg["count"], -1 if latest is None else round(latest.timestamp() * 1_000_000)
+
+
+# dumping
+
+def catalog_rows(entries: Iterable[Tuple[int, str, str, str, Satrec]]) -> np.ndarray:
+    """CATALOG_DTYPE rows for (norad_id, name, line1, line2, parsed Satrec) entries."""
+    return np.array(
+        [
+            (
+                norad_id, (name or "").strip().encode("utf-8")[:128], line1.encode("ascii"), line2.encode("ascii"),
+                sat.jdsatepoch, sat.jdsatepochF, *(getattr(sat, field) for field in _ELEMENTS),
+            )
+            for norad_id, name, line1, line2, sat in entries
+        ],
+        dtype=CATALOG_DTYPE,
+    )
+
+
+def build_catalog_rows() -> Tuple[Signature, np.ndarray]:
+    """Parse every TLE row once. --> returns (signature, CATALOG_DTYPE array without the unparsable rows)"""
+    signature = catalog_signature()
+    entries = []
+    queryset = TLE.objects.order_by("norad_id").values_list("norad_id", "name", "line1", "line2")
+    for norad_id, name, line1, line2 in queryset.iterator(chunk_size=2000):
+        try:
+            sat = Satrec.twoline2rv(line1, line2)
+        except ValueError:
+            logger.warning("Skipping unparsable TLE for NORAD %s", norad_id)
+            continue
+        entries.append((norad_id, name, line1, line2, sat))
+    return signature, catalog_rows(entries)
+
+
+def write_catalog_snapshot(
+    path: Optional[Path] = None, *, rows: Optional[Tuple[Signature, np.ndarray]] = None
+) -> CatalogSnapshot:
+    """Dump the TLE table to path (CATALOG_SNAPSHOT_PATH), atomically (temp file + rename).
+    rows: (signature, CATALOG_DTYPE array) already built by the caller, instead of reading the table again; the
+    signature must have been taken before the rows were read, so that the delta covers anything newer."""
+    path = Path(path or catalog_snapshot_path())
+    signature, data = rows if rows is not None else build_catalog_rows()
+    created = datetime.now(timezone.utc)
+    header = _HEADER.pack(
+        CATALOG_SNAPSHOT_MAGIC, CATALOG_SNAPSHOT_VERSION, CATALOG_DTYPE.itemsize, created.timestamp(), len(data),
+        *signature,
+    ).ljust(HEADER_SIZE, b"\0")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(header)
+        fh.write(data.tobytes())
+    os.replace(tmp, path)
+    return CatalogSnapshot(created, signature, data)
+
+
+def refresh_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """Dump the table again after a catalog import, when there is a snapshot to keep current (None otherwise)."""
+    if not catalog_snapshot_path().exists():
+        return None
+    return write_catalog_snapshot()
+
+
+# loading
+
+def read_catalog_snapshot(path: Path) -> Optional[CatalogSnapshot]:
+    """Memory-map a catalog snapshot. --> returns None if the file is missing or not a snapshot of this format"""
+    try:
+        with open(path, "rb") as fh:
+            header = fh.read(HEADER_SIZE)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER_SIZE:
+        return None
+    magic, version, itemsize, unix_ts, count, sig_count, sig_latest = _HEADER.unpack_from(header)
+    if magic != CATALOG_SNAPSHOT_MAGIC or version != CATALOG_SNAPSHOT_VERSION or itemsize != CATALOG_DTYPE.itemsize:
+        return None
+    if count:
+        data = np.memmap(path, dtype=CATALOG_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+    else:
+        data = np.zeros(0, dtype=CATALOG_DTYPE)
+    return CatalogSnapshot(datetime.fromtimestamp(unix_ts, tz=timezone.utc), (sig_count, sig_latest), data)
+
+
+_loaded_lock = threading.Lock()
+_loaded: Optional[Tuple[Tuple[int, int], CatalogSnapshot]] = None
+
+
+def load_catalog_snapshot(signature: Optional[Signature] = None) -> Optional[CatalogSnapshot]:
+    """The snapshot file, mapped once per file version; None when there is none, or it does not match signature
+    (when one is given)."""
+    global _loaded
+    path = catalog_snapshot_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns)
+    with _loaded_lock:
+        if _loaded is not None and _loaded[0] == key:
+            snapshot = _loaded[1]
+        else:
+            snapshot = read_catalog_snapshot(path)
+            if snapshot is None:
+                return None
+            _loaded = (key, snapshot)
+    if signature is not None and snapshot.signature != signature:
+        return None
+    return snapshot
+
+
+def satrecs_from_rows(data: np.ndarray) -> List[Satrec]:
+    """Rebuild the Satrec of every row with sgp4init from its stored elements (no TLE parsing)."""
+    columns = [data[field].tolist() for field in ("norad_id", "jdsatepoch", "jdsatepochF", *_ELEMENTS)]
+    sats = []
+    for norad_id, jd, fraction, *elements in zip(*columns):
+        sat = Satrec()
+        sat.sgp4init(WGS72, "i", norad_id, jd + fraction - _SGP4_EPOCH_JD, *elements)
+        # the epoch passed as one float loses a few microseconds, put back the exact two-part one
+        sat.jdsatepoch, sat.jdsatepochF = jd, fraction
+        sats.append(sat)
+    return sats
+
+
+def changed_since(signature: Signature) -> List[Tuple[int, str, str, str]]:
+    """(norad_id, name, line1, line2) of the rows written at or after the latest updated_at of signature: what a
+    snapshot dumped at that signature misses (a row already in it may come back, applying it again is harmless)."""
+    rows = TLE.objects.order_by("norad_id").values_list("norad_id", "name", "line1", "line2")
+    if signature[1] >= 0:
+        # a microsecond early, the float round trip of the timestamp must not skip the row it came from
+        since = datetime.fromtimestamp((signature[1] - 1) / 1_000_000, tz=timezone.utc)
+        rows = rows.filter(updated_at__gte=since)
+    return list(rows)
+
+
+def max_delta() -> int:
+    """Rows load_catalog applies on top of the snapshot before it rather writes a new one."""
+    return int(getattr(settings, "CATALOG_SNAPSHOT_MAX_DELTA", 500))
+
+
+def reset_catalog_snapshot_cache() -> None:
+    global _loaded
+    with _loaded_lock:
+        _loaded = None
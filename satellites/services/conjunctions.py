@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from sgp4.api import Satrec, SatrecArray
+
+from satellites.models import Conjunction, TLE
+from satellites.services.catalog import catalog_label
+from satellites.services.parallel import propagate_parallel
+from satellites.services.propagation import julian_dates
+from satellites.services.snapshot import load_catalog
+from satellites.services.spatial import grid_candidate_pairs
+
+logger = logging.getLogger(__name__)
+
+"""
+Conjunction screening: every pair of catalogued objects that comes closer than a threshold in a time window.
+The catalog is propagated in blocks of time steps with SatrecArray, and at every step a uniform grid (spatial.py)
+only hands back pairs that are near each other, so the cost grows with the number of close pairs, not with n^2.
+Distances and relative velocities are taken in TEME directly: a rotation does not change distances, so there is
+no need for the ECEF/geodetic steps here.
+"""
+
+# fastest two catalogued objects can close on each other (head-on in LEO), used to pad the search radius so an
+# encounter whose closest approach falls between two samples is still caught
+MAX_RELATIVE_SPEED_KMS = 16.0
+# mean elements vs osculating radius, how far an object can stray from its SGP4 apogee/perigee
+SHELL_MARGIN_KM = 50.0
+
+
+class ConjunctionEvent(NamedTuple):
+    norad_id_a: int
+    norad_id_b: int
+    tca: datetime
+    miss_distance_km: float
+    relative_speed_kms: float
+
+
+def shell_overlap_mask(sats: Sequence[Satrec], margin_km: float) -> np.ndarray:
+    """
+    Apogee/perigee filter: an object whose [perigee, apogee] radius band (widened by margin_km) does not overlap
+    the band of any other object can never be close to anything, so it does not need to be propagated at all.
+
+    --> returns a boolean mask aligned with sats
+    """
+    if len(sats) < 2:
+        return np.zeros(len(sats), dtype=bool)
+    # alta/altp are apogee/perigee altitudes in Earth radii of the gravity model
+    lo = np.array([(1.0 + sat.altp) * sat.radiusearthkm for sat in sats]) - margin_km
+    hi = np.array([(1.0 + sat.alta) * sat.radiusearthkm for sat in sats]) + margin_km
+
+    order = np.argsort(lo, kind="stable")
+    lo_sorted, hi_sorted = lo[order], hi[order]
+    # sorted by the lower bound, a band overlaps an earlier one if the highest earlier upper bound reaches it,
+    # and a later one if the next lower bound is inside it
+    reach_before = np.concatenate([[-np.inf], np.maximum.accumulate(hi_sorted)[:-1]])
+    next_lo = np.concatenate([lo_sorted[1:], [np.inf]])
+    overlaps = (reach_before >= lo_sorted) | (next_lo <= hi_sorted)
+
+    mask = np.empty(len(sats), dtype=bool)
+    mask[order] = overlaps
+    return mask
+
+
+def _merge_encounters(pair_keys, times, misses, speeds, gap_s):
+    """Keep the closest sample of each encounter (same pair, samples less than gap_s apart)."""
+    order = np.lexsort((times, pair_keys))
+    pair_keys, times, misses, speeds = pair_keys[order], times[order], misses[order], speeds[order]
+    new_group = np.ones(len(pair_keys), dtype=bool)
+    new_group[1:] = (pair_keys[1:] != pair_keys[:-1]) | (np.diff(times) > gap_s)
+    groups = np.cumsum(new_group) - 1
+    # closest sample first inside every group, then the first row of each group
+    best = np.lexsort((misses, groups))
+    first = np.ones(len(best), dtype=bool)
+    first[1:] = groups[best][1:] != groups[best][:-1]
+    keep = best[first]
+    return pair_keys[keep], times[keep], misses[keep], speeds[keep]
+
+
+def screen_satellites(
+    sats: Sequence[Satrec],
+    norad_ids: Sequence[int],
+    *,
+    start: datetime,
+    hours: float = 24.0,
+    threshold_km: float = 10.0,
+    step_s: float = 20.0,
+    time_chunk: int = 90,
+    lines: Optional[Sequence[Tuple[str, str]]] = None,
+    workers: int = 1,
+) -> List[ConjunctionEvent]:
+    """Screen a list of parsed satellites against each other, see screen_catalog.
+    With workers > 1 and the TLE lines of sats, the propagation of every time chunk is sharded over a process pool
+    (parallel.py); the grid/pair work stays in this process.
+
+    --> returns the conjunctions sorted by TCA"""
+
+    norad_ids = np.asarray(norad_ids, dtype=np.int64)
+    keep = shell_overlap_mask(sats, threshold_km + SHELL_MARGIN_KM)
+    candidates = [sat for sat, kept in zip(sats, keep) if kept]
+    ids = norad_ids[keep]
+    n = len(candidates)
+    if n < 2:
+        return []
+
+    if workers > 1 and lines is not None:
+        kept_lines = [line for line, kept in zip(lines, keep) if kept]
+
+        def propagate(jd_chunk, fr_chunk):
+            result = propagate_parallel(kept_lines, jd_chunk, fr_chunk, workers=workers, frame="teme", with_velocity=True)
+            return result.r_km, result.v_kms
+    else:
+        sat_array = SatrecArray(candidates)
+
+        def propagate(jd_chunk, fr_chunk):
+            error, r, v = sat_array.sgp4(jd_chunk, fr_chunk)
+            r[error != 0] = np.nan
+            return r, v
+
+    offsets = np.arange(0.0, hours * 3600.0 + step_s, step_s)
+    jd, fr = julian_dates(start, offsets)
+    half_step = 0.5 * step_s
+    search_radius = threshold_km + MAX_RELATIVE_SPEED_KMS * half_step
+
+    found_i: List[np.ndarray] = []
+    found_j: List[np.ndarray] = []
+    found_t: List[np.ndarray] = []
+    found_miss: List[np.ndarray] = []
+    found_speed: List[np.ndarray] = []
+
+    for begin in range(0, len(offsets), time_chunk):
+        stop = begin + time_chunk
+        r, v = propagate(jd[begin:stop], fr[begin:stop])
+        for k, offset in enumerate(offsets[begin:stop]):
+            pos = r[:, k, :]
+            i, j = grid_candidate_pairs(pos, search_radius)
+            if i.size == 0:
+                continue
+            dr = pos[j] - pos[i]
+            dv = v[j, k, :] - v[i, k, :]
+            dist = np.sqrt(np.einsum("ij,ij->i", dr, dr))
+            speed2 = np.einsum("ij,ij->i", dv, dv)
+            speed = np.sqrt(speed2)
+            # only pairs that can get under the threshold within half a step of this sample
+            near = dist < threshold_km + speed * half_step
+            if not near.any():
+                continue
+            i, j, dr, dv, speed, speed2 = i[near], j[near], dr[near], dv[near], speed[near], speed2[near]
+
+            # relative motion is almost a straight line over a few seconds (both objects feel nearly the same
+            # gravity), so the closest approach is where d(dr + dv * tau) / dtau is perpendicular to dv
+            tau = -np.einsum("ij,ij->i", dr, dv) / np.maximum(speed2, 1e-12)
+            tau = np.clip(tau, -half_step, half_step)
+            miss_vec = dr + dv * tau[:, None]
+            miss = np.sqrt(np.einsum("ij,ij->i", miss_vec, miss_vec))
+            hit = miss < threshold_km
+            if hit.any():
+                found_i.append(i[hit])
+                found_j.append(j[hit])
+                found_t.append(offset + tau[hit])
+                found_miss.append(miss[hit])
+                found_speed.append(speed[hit])
+
+    if not found_i:
+        return []
+
+    i = np.concatenate(found_i)
+    j = np.concatenate(found_j)
+    pair_keys, times, misses, speeds = _merge_encounters(
+        i * n + j,
+        np.concatenate(found_t),
+        np.concatenate(found_miss),
+        np.concatenate(found_speed),
+        gap_s=2.0 * step_s,
+    )
+
+    # the first and last samples can extrapolate half a step outside the window
+    inside = (times >= 0.0) & (times <= hours * 3600.0)
+    pair_keys, times, misses, speeds = pair_keys[inside], times[inside], misses[inside], speeds[inside]
+
+    events: List[ConjunctionEvent] = []
+    for key, t, miss, speed in zip(pair_keys.tolist(), times.tolist(), misses.tolist(), speeds.tolist()):
+        a, b = ids[key // n], ids[key % n]
+        if a > b:
+            a, b = b, a
+        events.append(ConjunctionEvent(int(a), int(b), start + timedelta(seconds=t), miss, speed))
+    events.sort(key=lambda event: event.tca)
+    return events
+
+
+def screen_catalog(
+    *,
+    start: Optional[datetime] = None,
+    hours: float = 24.0,
+    threshold_km: float = 10.0,
+    step_s: float = 20.0,
+    workers: int = 1,
+) -> List[ConjunctionEvent]:
+    """
+    Find every pair of objects in the TLE table closer than threshold_km during [start, start + hours].
+    The catalog is sampled every step_s seconds; at each sample only pairs the grid reports as neighbours (cells of
+    threshold + the distance two objects can close in half a step) are checked, and the closest approach of each
+    one is interpolated linearly from its relative position and velocity. Samples of the same encounter are merged.
+
+    --> returns the conjunctions sorted by TCA
+    """
+    start = (start or datetime.now(timezone.utc)).replace(microsecond=0)
+    catalog = load_catalog()
+    events = screen_satellites(
+        catalog.sats,
+        catalog.norad_ids,
+        start=start,
+        hours=hours,
+        threshold_km=threshold_km,
+        step_s=step_s,
+        lines=catalog.lines,
+        workers=workers,
+    )
+    logger.info("Screened %s objects over %sh: %s conjunctions under %s km", len(catalog.sats), hours, len(events), threshold_km)
+    return events
+
+
+def store_conjunctions(events: Sequence[ConjunctionEvent], screened_at: datetime) -> int:
+    """Replace the stored conjunctions with the result of a new screening. --> returns how many rows were written"""
+    rows = [
+        Conjunction(
+            norad_id_a=event.norad_id_a,
+            norad_id_b=event.norad_id_b,
+            tca=event.tca,
+            miss_distance_km=event.miss_distance_km,
+            relative_speed_kms=event.relative_speed_kms,
+            screened_at=screened_at,
+        )
+        for event in events
+    ]
+    with transaction.atomic():
+        Conjunction.objects.all().delete()
+        Conjunction.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def conjunctions_payload(
+    *,
+    norad_id: Optional[int] = None,
+    max_km: Optional[float] = None,
+    since: Optional[datetime] = None,
+    limit: int = 1000,
+) -> Dict[str, object]:
+    """Return the stored conjunctions (optionally for one object / under max_km / after since) for the API."""
+    queryset = Conjunction.objects.all()
+    if norad_id is not None:
+        queryset = queryset.filter(Q(norad_id_a=norad_id) | Q(norad_id_b=norad_id))
+    if max_km is not None:
+        queryset = queryset.filter(miss_distance_km__lte=max_km)
+    if since is not None:
+        queryset = queryset.filter(tca__gte=since)
+    rows = list(queryset.order_by("tca")[:limit])
+
+    names = dict(
+        TLE.objects.filter(
+            norad_id__in={row.norad_id_a for row in rows} | {row.norad_id_b for row in rows}
+        ).values_list("norad_id", "name")
+    )
+    latest = Conjunction.objects.order_by("-screened_at").values_list("screened_at", flat=True).first()
+    return {
+        "screened_at": latest.isoformat() if latest else None,
+        "count": len(rows),
+        "conjunctions": [
+            {
+                "norad_id_a": row.norad_id_a,
+                "name_a": catalog_label(names.get(row.norad_id_a), row.norad_id_a),
+                "norad_id_b": row.norad_id_b,
+                "name_b": catalog_label(names.get(row.norad_id_b), row.norad_id_b),
+                "tca": row.tca.isoformat(),
+                "miss_distance_km": row.miss_distance_km,
+                "relative_speed_kms": row.relative_speed_kms,
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from sgp4.api import Satrec
+
+from satellites.services.satrec_cache import satrec_cache
+
+"""
+Precomputed ephemerides: piecewise Chebyshev fits of SGP4 over a rolling window.
+For every satellite that gets polled, the ECEF position and the speed are sampled with SGP4 at Chebyshev nodes over
+the next EPHEMERIS_WINDOW_H hours (one sgp4_array call) and turned into polynomial coefficients for equal segments.
+The segments are halved until the fit is within EPHEMERIS_MAX_ERROR_KM (and EPHEMERIS_MAX_SPEED_ERROR_KMS for the
+speed) of SGP4 at check points between the nodes.
+After that a position is a segment lookup plus a Clenshaw recurrence on plain floats, no SGP4, no NumPy.
+"""
+
+Sample = Tuple[float, float, float, float]  # x_km, y_km, z_km (ECEF), speed_kms
+
+
+def _settings_float(name: str, default: float) -> float:
+    return float(getattr(settings, name, default))
+
+
+def _chebyshev_matrix(degree: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Chebyshev-Gauss nodes on [-1, 1] and the matrix turning values at those nodes into coefficients."""
+    k = np.arange(degree + 1)
+    theta = np.pi * (k + 0.5) / (degree + 1)
+    nodes = np.cos(theta)
+    # c_j = 2/(N+1) * sum_k f(x_k) cos(j theta_k), with c_0 halved (numpy.polynomial.chebyshev convention)
+    matrix = 2.0 / (degree + 1) * np.cos(np.outer(k, theta))
+    matrix[0] *= 0.5
+    return nodes, matrix
+
+
+def _clenshaw4(series, x: float) -> Sample:
+    """Clenshaw recurrence for the 4 series of a segment at once, series[j] = (cx_j, cy_j, cz_j, cs_j)."""
+    x2 = 2.0 * x
+    bx1 = by1 = bz1 = bs1 = 0.0
+    bx2 = by2 = bz2 = bs2 = 0.0
+    for cx, cy, cz, cs in reversed(series[1:]):
+        bx1, bx2 = cx + x2 * bx1 - bx2, bx1
+        by1, by2 = cy + x2 * by1 - by2, by1
+        bz1, bz2 = cz + x2 * bz1 - bz2, bz1
+        bs1, bs2 = cs + x2 * bs1 - bs2, bs1
+    cx, cy, cz, cs = series[0]
+    return cx + x * bx1 - bx2, cy + x * by1 - by2, cz + x * bz1 - bz2, cs + x * bs1 - bs2
+
+
+class Ephemeris:
+    """Fit of one TLE over [start, end): `segments` equal pieces, each with 4 Chebyshev series (x, y, z, speed)."""
+
+    __slots__ = ("line1", "line2", "start", "start_ts", "end_ts", "segment_s", "segments", "coefficients", "max_error_km")
+
+    def __init__(self, line1: str, line2: str, start: datetime, segment_s: float, coefficients, max_error_km: float):
+        self.line1 = line1
+        self.line2 = line2
+        self.start = start
+        self.segment_s = segment_s
+        # per segment, one (x, y, z, speed) tuple per degree, plain python floats so evaluation needs no NumPy;
+        # None means SGP4 failed somewhere in the window
+        self.coefficients = coefficients
+        self.segments = len(coefficients) if coefficients is not None else 1
+        self.max_error_km = max_error_km
+        # POSIX seconds, comparing floats is much cheaper than datetime arithmetic on every lookup
+        self.start_ts = start.timestamp()
+        self.end_ts = self.start_ts + segment_s * self.segments
+
+    @property
+    def end(self) -> datetime:
+        return self.start + timedelta(seconds=self.segment_s * self.segments)
+
+    @property
+    def usable(self) -> bool:
+        return self.coefficients is not None
+
+    def covers(self, when: datetime) -> bool:
+        return self.start_ts <= when.timestamp() < self.end_ts
+
+    def evaluate(self, when: datetime) -> Sample:
+        """Position/speed at `when` (must be covered)."""
+        return self.evaluate_ts(when.timestamp())
+
+    def evaluate_ts(self, ts: float) -> Sample:
+        offset = ts - self.start_ts
+        index = min(int(offset // self.segment_s), self.segments - 1)
+        x = 2.0 * (offset - index * self.segment_s) / self.segment_s - 1.0
+        return _clenshaw4(self.coefficients[index], x)
+
+
+def _sample(sat: Satrec, start: datetime, offsets: np.ndarray):
+    """SGP4 ECEF positions and speeds at start + offsets. --> returns (ok, positions (t, 3), speeds (t,))"""
+    # imported here, propagate_now uses this module for its fast path (fits are rare, the import cost does not matter)
+    from satellites.services.propagation import ecef_positions, julian_dates
+
+    jd, fr = julian_dates(start, offsets)
+    error, ecef = ecef_positions(sat, jd, fr)
+    _, _, v = sat.sgp4_array(jd, fr)
+    return bool(np.all(error == 0)), ecef, np.sqrt(np.einsum("ij,ij->i", v, v))
+
+
+def fit_ephemeris(
+    sat: Satrec,
+    line1: str,
+    line2: str,
+    start: datetime,
+    *,
+    window_s: float,
+    degree: int = 8,
+    max_error_km: float = 0.01,
+    max_speed_error_kms: float = 1e-5,
+    max_halvings: int = 8,
+) -> Ephemeris:
+    """
+    Fit the satellite over [start, start + window_s). Segments start at 1/6 of the orbital period and are halved
+    until every segment is within max_error_km (position) and max_speed_error_kms (speed) of SGP4 at the midpoints
+    between nodes. If SGP4 fails anywhere in the window (decay...), the returned ephemeris is not usable and callers
+    fall back to plain SGP4.
+    """
+    period_s = 2.0 * math.pi / sat.no_kozai * 60.0  # no_kozai is in rad/min
+    segment_s = min(window_s, period_s / 6.0)
+    nodes, matrix = _chebyshev_matrix(degree)
+    # check points halfway between consecutive nodes, where the interpolation error peaks
+    checks = np.cos(np.pi * np.arange(1, degree + 1) / (degree + 1))
+
+    for _ in range(max_halvings + 1):
+        segments = int(math.ceil(window_s / segment_s))
+        starts = np.arange(segments) * segment_s
+        half = 0.5 * segment_s
+        node_offsets = (starts[:, None] + half * (nodes[None, :] + 1.0)).ravel()
+        check_offsets = (starts[:, None] + half * (checks[None, :] + 1.0)).ravel()
+
+        ok, positions, speeds = _sample(sat, start, np.concatenate([node_offsets, check_offsets]))
+        if not ok:
+            return Ephemeris(line1, line2, start, window_s, None, max_error_km)
+
+        n_nodes = node_offsets.size
+        values = np.column_stack([positions[:n_nodes], speeds[:n_nodes]]).reshape(segments, degree + 1, 4)
+        coefficients = np.einsum("jk,skc->sjc", matrix, values)  # (segments, degree + 1, 4 series)
+
+        # chebval wants the coefficient index first --> (segments, 4 series, checks)
+        fitted = np.polynomial.chebyshev.chebval(checks, np.moveaxis(coefficients, 1, 0))
+        expected = positions[n_nodes:].reshape(segments, degree, 3).transpose(0, 2, 1)
+        error_km = np.sqrt(((fitted[:, :3] - expected) ** 2).sum(axis=1)).max()
+        # the speed is served from the same segments, so it has to be within its own bound too
+        speed_error_kms = np.abs(fitted[:, 3] - speeds[n_nodes:].reshape(segments, degree)).max()
+        if error_km <= max_error_km and speed_error_kms <= max_speed_error_kms:
+            return Ephemeris(line1, line2, start, segment_s, coefficients.tolist(), max_error_km)
+        segment_s *= 0.5
+
+    # could not reach the bound (very eccentric orbit at perigee...), SGP4 it is
+    return Ephemeris(line1, line2, start, window_s, None, max_error_km)
+
+
+class EphemerisCache:
+    """
+    Process-wide LRU of fitted ephemerides, keyed by norad_id.
+    An entry is refitted when the TLE lines change or when the requested instant leaves its window, so a polled
+    satellite costs one fit every EPHEMERIS_WINDOW_H hours instead of one SGP4 run per request.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, Ephemeris]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fits = 0
+
+    def position(self, norad_id: int, line1: str, line2: str, when: datetime) -> Optional[Sample]:
+        """Return (x_km, y_km, z_km, speed_kms) at `when`, or None if this satellite has to go through SGP4."""
+        ts = when.timestamp()
+        with self._lock:
+            ephemeris = self._entries.get(norad_id)
+            if (
+                ephemeris is not None
+                and ephemeris.start_ts <= ts < ephemeris.end_ts
+                and ephemeris.line1 == line1
+                and ephemeris.line2 == line2
+            ):
+                self._entries.move_to_end(norad_id)
+                self.hits += 1
+                return ephemeris.evaluate_ts(ts) if ephemeris.usable else None
+            self.misses += 1
+
+        # fit outside the lock; the window starts a minute early so slightly skewed clocks still hit it
+        ephemeris = fit_ephemeris(
+            satrec_cache.get(norad_id, line1, line2),
+            line1,
+            line2,
+            when.replace(second=0, microsecond=0) - timedelta(minutes=1),
+            window_s=_settings_float("EPHEMERIS_WINDOW_H", 6.0) * 3600.0,
+            degree=int(getattr(settings, "EPHEMERIS_DEGREE", 8)),
+            max_error_km=_settings_float("EPHEMERIS_MAX_ERROR_KM", 0.01),
+            max_speed_error_kms=_settings_float("EPHEMERIS_MAX_SPEED_ERROR_KMS", 1e-5),
+        )
+        with self._lock:
+            self.fits += 1
+            self._entries[norad_id] = ephemeris
+            self._entries.move_to_end(norad_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return ephemeris.evaluate_ts(ts) if ephemeris.usable and ephemeris.covers(when) else None
+
+    def invalidate(self, norad_id: int) -> bool:
+        with self._lock:
+            return self._entries.pop(norad_id, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.fits = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "fits": self.fits,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# one shared cache per process (each gunicorn worker gets its own)
+ephemeris_cache = EphemerisCache(maxsize=getattr(settings, "EPHEMERIS_CACHE_SIZE", 1024))
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from sgp4.api import Satrec
+
+from satellites.models import TLE
+from satellites.services.catalog import CATALOG_FIELDS
+from satellites.services.propagation import propagate_arrays
+from satellites.services.snapshot import PositionSnapshot
+from satellites.services.tle_parser import iter_chunks
+
+logger = logging.getLogger(__name__)
+
+"""
+Streaming bulk export of the catalog and of positions, as NDJSON (one JSON object per line) or CSV.
+Every generator here works on chunks of EXPORT_CHUNK_SIZE rows and yields one encoded block per chunk. The response
+starts with the first chunk and never holds more than one chunk, whatever the size of the catalog:
+- the catalog comes from QuerySet.iterator() over values_list, so no model instances and no full result set;
+- positions come from the mapped snapshot sliced chunk by chunk, or at another instant from the TLE table read and
+  propagated one chunk (one SatrecArray call) at a time.
+"""
+
+EXPORT_FORMATS = ("ndjson", "csv")
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+POSITION_FIELDS = ("norad_id", "name", "lat", "lon", "alt_km", "vel_kms", "timestamp")
+
+
+def export_chunk_size() -> int:
+    return int(getattr(settings, "EXPORT_CHUNK_SIZE", 2000))
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_rows(rows: Sequence[Sequence], fields: Sequence[str], fmt: str) -> bytes:
+    """One block of NDJSON lines or CSV records (without the header) for rows aligned with fields."""
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({field: _json_value(value) for field, value in zip(fields, row)}) + "\n" for row in rows
+        ).encode("utf-8")
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(
+        [_json_value(value) for value in row] for row in rows
+    )
+    return buffer.getvalue().encode("utf-8")
+
+
+def _stream(chunks: Iterable[List[Sequence]], fields: Sequence[str], fmt: str) -> Iterator[bytes]:
+    if fmt == "csv":
+        yield encode_rows([fields], fields, "csv")  # the header, also when there are no rows
+    for chunk in chunks:
+        yield encode_rows(chunk, fields, fmt)
+
+
+def stream_catalog(fmt: str, fields: Sequence[str] = CATALOG_FIELDS, *, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """The TLE table ordered by NORAD ID, only the given CATALOG_FIELDS columns."""
+    chunk_size = chunk_size or export_chunk_size()
+    rows = TLE.objects.order_by("norad_id").values_list(*fields).iterator(chunk_size=chunk_size)
+    return _stream(iter_chunks(rows, chunk_size), fields, fmt)
+
+
+def _snapshot_chunks(snapshot: PositionSnapshot, chunk_size: int) -> Iterator[List[Sequence]]:
+    stamp = snapshot.timestamp.isoformat()
+    for begin in range(0, len(snapshot.data), chunk_size):
+        data = snapshot.data[begin:begin + chunk_size]
+        names = [raw.decode("utf-8", errors="ignore") for raw in data["name"].tolist()]
+        yield [
+            (*row, stamp)
+            for row in zip(
+                data["norad_id"].tolist(), names, data["lat"].tolist(), data["lon"].tolist(),
+                data["alt_km"].tolist(), data["vel_kms"].tolist(),
+            )
+        ]
+
+
+def _propagated_chunks(timestamp: datetime, chunk_size: int) -> Iterator[List[Sequence]]:
+    stamp = timestamp.isoformat()
+    rows = TLE.objects.order_by("norad_id").values_list("norad_id", "name", "line1", "line2").iterator(chunk_size=chunk_size)
+    for chunk in iter_chunks(rows, chunk_size):
+        sats = []
+        kept = []
+        for norad_id, name, line1, line2 in chunk:
+            try:
+                sats.append(Satrec.twoline2rv(line1, line2))
+            except ValueError:
+                logger.warning("Skipping unparsable TLE for NORAD %s", norad_id)
+                continue
+            kept.append((norad_id, (name or "").strip()))
+        if not sats:
+            continue
+        arrays = propagate_arrays(sats, timestamp=timestamp)
+        ok = np.flatnonzero(arrays["error"] == 0).tolist()
+        lat, lon = arrays["lat"].tolist(), arrays["lon"].tolist()
+        alt_km, vel_kms = arrays["alt_km"].tolist(), arrays["vel_kms"].tolist()
+        yield [(*kept[i], lat[i], lon[i], alt_km[i], vel_kms[i], stamp) for i in ok]
+
+
+def stream_positions(
+    fmt: str,
+    *,
+    snapshot: Optional[PositionSnapshot] = None,
+    timestamp: Optional[datetime] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[bytes]:
+    """Every satellite position (POSITION_FIELDS): the rows of snapshot, or the catalog propagated to timestamp."""
+    chunk_size = chunk_size or export_chunk_size()
+    if snapshot is not None:
+        chunks = _snapshot_chunks(snapshot, chunk_size)
+    else:
+        chunks = _propagated_chunks(timestamp, chunk_size)
+    return _stream(chunks, POSITION_FIELDS, fmt)
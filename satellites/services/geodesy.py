@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+# WGS84 ellipsoid, kilometres (same units the rest of the propagation code works in)
+WGS84_A_KM = 6378.137
+WGS84_F = 1.0 / 298.257223563
+WGS84_B_KM = WGS84_A_KM * (1.0 - WGS84_F)
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)  # first eccentricity squared
+WGS84_EP2 = WGS84_E2 / (1.0 - WGS84_E2)  # second eccentricity squared
+
+GEODETIC_BACKENDS = ("numpy", "pyproj")
+
+
+def ecef_to_geodetic(x_km, y_km, z_km) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Closed-form WGS84 ECEF -> geodetic conversion (Heikkinen's solution, the one usually credited to Zhu).
+    No iterations and no PROJ, just NumPy, so it works the same for one point or for a whole catalog of them.
+    It is exact to well below a millimetre for anything outside the Earth's core, which covers every satellite.
+
+    --> returns (lat_deg, lon_deg, alt_km), with the same shape as the inputs
+    """
+    x = np.asarray(x_km, dtype=float)
+    y = np.asarray(y_km, dtype=float)
+    z = np.asarray(z_km, dtype=float)
+
+    a2 = WGS84_A_KM * WGS84_A_KM
+    b2 = WGS84_B_KM * WGS84_B_KM
+    e4 = WGS84_E2 * WGS84_E2
+
+    r2 = x * x + y * y
+    r = np.sqrt(r2)
+    z2 = z * z
+
+    F = 54.0 * b2 * z2
+    G = r2 + (1.0 - WGS84_E2) * z2 - WGS84_E2 * (a2 - b2)
+    c = e4 * F * r2 / (G * G * G)
+    s = np.cbrt(1.0 + c + np.sqrt(c * c + 2.0 * c))
+    k = s + 1.0 / s + 1.0
+    P = F / (3.0 * k * k * G * G)
+    Q = np.sqrt(1.0 + 2.0 * e4 * P)
+    r0 = -(P * WGS84_E2 * r) / (1.0 + Q) + np.sqrt(
+        np.maximum(
+            0.5 * a2 * (1.0 + 1.0 / Q) - P * (1.0 - WGS84_E2) * z2 / (Q * (1.0 + Q)) - 0.5 * P * r2,
+            0.0,
+        )
+    )
+    d = r - WGS84_E2 * r0
+    U = np.sqrt(d * d + z2)
+    V = np.sqrt(d * d + (1.0 - WGS84_E2) * z2)
+    z0 = b2 * z / (WGS84_A_KM * V)
+
+    alt_km = U * (1.0 - b2 / (WGS84_A_KM * V))
+    lat = np.degrees(np.arctan2(z + WGS84_EP2 * z0, r))
+    lon = np.degrees(np.arctan2(y, x))
+    return lat, lon, alt_km
+
+
+def ecef_to_geodetic_scalar(x_km: float, y_km: float, z_km: float) -> Tuple[float, float, float]:
+    """
+    Same closed-form solution as ecef_to_geodetic for a single point, written with math on plain floats.
+    NumPy costs a few microseconds per call on 0-d arrays, which dominates single-position requests.
+    """
+    a2 = WGS84_A_KM * WGS84_A_KM
+    b2 = WGS84_B_KM * WGS84_B_KM
+    e4 = WGS84_E2 * WGS84_E2
+
+    r2 = x_km * x_km + y_km * y_km
+    r = math.sqrt(r2)
+    z2 = z_km * z_km
+
+    F = 54.0 * b2 * z2
+    G = r2 + (1.0 - WGS84_E2) * z2 - WGS84_E2 * (a2 - b2)
+    c = e4 * F * r2 / (G * G * G)
+    s = (1.0 + c + math.sqrt(c * c + 2.0 * c)) ** (1.0 / 3.0)
+    k = s + 1.0 / s + 1.0
+    P = F / (3.0 * k * k * G * G)
+    Q = math.sqrt(1.0 + 2.0 * e4 * P)
+    r0 = -(P * WGS84_E2 * r) / (1.0 + Q) + math.sqrt(
+        max(0.5 * a2 * (1.0 + 1.0 / Q) - P * (1.0 - WGS84_E2) * z2 / (Q * (1.0 + Q)) - 0.5 * P * r2, 0.0)
+    )
+    d = r - WGS84_E2 * r0
+    U = math.sqrt(d * d + z2)
+    V = math.sqrt(d * d + (1.0 - WGS84_E2) * z2)
+    z0 = b2 * z_km / (WGS84_A_KM * V)
+
+    alt_km = U * (1.0 - b2 / (WGS84_A_KM * V))
+    lat = math.degrees(math.atan2(z_km + WGS84_EP2 * z0, r))
+    lon = math.degrees(math.atan2(y_km, x_km))
+    return lat, lon, alt_km
+
+
+def geodetic_to_ecef(lat_deg, lon_deg, alt_km) -> np.ndarray:
+    """Forward WGS84 conversion (exact), the inverse of ecef_to_geodetic. --> returns an (..., 3) array in km"""
+    lat = np.radians(np.asarray(lat_deg, dtype=float))
+    lon = np.radians(np.asarray(lon_deg, dtype=float))
+    h = np.asarray(alt_km, dtype=float)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    # prime vertical radius of curvature
+    n = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+    return np.stack(
+        [
+            (n + h) * cos_lat * np.cos(lon),
+            (n + h) * cos_lat * np.sin(lon),
+            (n * (1.0 - WGS84_E2) + h) * sin_lat,
+        ],
+        axis=-1,
+    )
+
+
+def look_angles(sat_ecef_km, lat_deg: float, lon_deg: float, alt_km: float = 0.0):
+    """
+    Azimuth/elevation/range of ECEF positions as seen by a ground observer at (lat, lon, alt).
+    The line of sight is rotated into the observer's local East-North-Up frame, so it works on any (..., 3) block
+    of positions (one satellite over time, or a whole catalog at one instant).
+
+    --> returns (azimuth_deg measured clockwise from north, elevation_deg, range_km)
+    """
+    observer = geodetic_to_ecef(lat_deg, lon_deg, alt_km)
+    d = np.asarray(sat_ecef_km, dtype=float) - observer
+    lat = math.radians(lat_deg)
+    lon = math.radians(lon_deg)
+    sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+    sin_lon, cos_lon = math.sin(lon), math.cos(lon)
+
+    dx, dy, dz = d[..., 0], d[..., 1], d[..., 2]
+    east = -sin_lon * dx + cos_lon * dy
+    north = -sin_lat * cos_lon * dx - sin_lat * sin_lon * dy + cos_lat * dz
+    up = cos_lat * cos_lon * dx + cos_lat * sin_lon * dy + sin_lat * dz
+
+    rng = np.sqrt(dx * dx + dy * dy + dz * dz)
+    elevation = np.degrees(np.arcsin(np.clip(up / rng, -1.0, 1.0)))
+    azimuth = np.degrees(np.arctan2(east, north)) % 360.0
+    return azimuth, elevation, rng
+
+
+@lru_cache(maxsize=1)
+def _pyproj_transformer():
+    # imported lazily, pyproj/PROJ is only needed when someone explicitly asks for the reference backend
+    from pyproj import Transformer
+
+    return Transformer.from_crs("epsg:4978", "epsg:4979", always_xy=True)
+
+
+def ecef_to_geodetic_pyproj(x_km, y_km, z_km) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Reference implementation through pyproj (EPSG:4978 -> EPSG:4979). Same inputs/outputs as ecef_to_geodetic."""
+    x = np.asarray(x_km, dtype=float) * 1000.0
+    y = np.asarray(y_km, dtype=float) * 1000.0
+    z = np.asarray(z_km, dtype=float) * 1000.0
+    lon, lat, alt_m = _pyproj_transformer().transform(x, y, z)
+    return np.asarray(lat, dtype=float), np.asarray(lon, dtype=float), np.asarray(alt_m, dtype=float) / 1000.0
+
+
+def convert_ecef_to_geodetic(x_km, y_km, z_km, *, backend: str = "numpy"):
+    """Dispatch to the requested backend ("numpy" is the default, "pyproj" is kept as a reference)."""
+    if backend == "numpy":
+        if isinstance(x_km, float) and isinstance(y_km, float) and isinstance(z_km, float):
+            return ecef_to_geodetic_scalar(x_km, y_km, z_km)
+        return ecef_to_geodetic(x_km, y_km, z_km)
+    if backend == "pyproj":
+        return ecef_to_geodetic_pyproj(x_km, y_km, z_km)
+    raise ValueError(f"Unknown geodetic backend {backend!r}, expected one of {GEODETIC_BACKENDS}")
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Mapping, NamedTuple, Optional
+
+from satellites.metrics import CONDITIONAL_BYTES_SAVED, CONDITIONAL_DOWNLOADS
+from satellites.models import DownloadValidator
+
+"""
+Conditional GETs for the CelesTrak downloads. The ETag and Last-Modified of the last full download of every URL are
+kept in DownloadValidator and sent back as If-None-Match/If-Modified-Since; a 304 answer means the payload did not
+change, so the caller skips parsing and writing it altogether. The size and duration of that last full download
+are kept too, to report what a 304 saved. Compression is asked for explicitly, httpx decodes it transparently.
+"""
+
+ACCEPT_ENCODING = "gzip, deflate"
+
+
+class Download(NamedTuple):
+    """A full 200 download, whose validators record_download(*download) stores once its records are written."""
+    url: str
+    headers: Mapping[str, str]
+    size_bytes: int
+    download_s: float
+    conditional: bool  # the request carried validators (they did not match)
+
+
+def request_headers(validator: Optional[DownloadValidator]) -> Dict[str, str]:
+    """Headers for a (conditional when there is a validator) GET of a CelesTrak URL."""
+    headers = {"Accept-Encoding": ACCEPT_ENCODING}
+    if validator is not None:
+        if validator.etag:
+            headers["If-None-Match"] = validator.etag
+        if validator.last_modified:
+            headers["If-Modified-Since"] = validator.last_modified
+    return headers
+
+
+def load_validator(url: str) -> Optional[DownloadValidator]:
+    return DownloadValidator.objects.filter(url=url).first()
+
+
+def load_validators(urls: Iterable[str]) -> Dict[str, DownloadValidator]:
+    return {validator.url: validator for validator in DownloadValidator.objects.filter(url__in=list(urls))}
+
+
+def record_not_modified(validator: DownloadValidator) -> None:
+    """A 304 for validator.url: count what it saved and note when the URL was last checked."""
+    CONDITIONAL_DOWNLOADS.labels(result="not_modified").inc()
+    CONDITIONAL_BYTES_SAVED.inc(validator.size_bytes)
+    validator.save(update_fields=["checked_at"])
+
+
+def record_download(url: str, headers, size_bytes: int, download_s: float, conditional: bool) -> None:
+    """A full 200 download of url: keep its validators for the next request (or forget them when there are none)."""
+    if conditional:
+        CONDITIONAL_DOWNLOADS.labels(result="modified").inc()
+    etag = headers.get("ETag") or ""
+    last_modified = headers.get("Last-Modified") or ""
+    if not etag and not last_modified:
+        DownloadValidator.objects.filter(url=url).delete()
+        return
+    DownloadValidator.objects.update_or_create(url=url, defaults={
+        "etag": etag[:256],
+        "last_modified": last_modified[:64],
+        "size_bytes": size_bytes,
+        "download_s": download_s,
+    })
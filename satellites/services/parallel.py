@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from sgp4.api import Satrec, SatrecArray
+
+from satellites.services.propagation import _gmst_from_jd, _rotate_teme_to_ecef
+
+"""
+Multi-core propagation for catalog-wide jobs (snapshots, exports, screening).
+The satellites are split into one contiguous shard per worker of a ProcessPoolExecutor. A worker parses its shard
+once (kept per process, keyed by a digest of the TLE lines) and propagates it chunk by chunk over the requested
+times; the results come back as NumPy arrays, which pickle as raw buffers, and are stacked in shard order.
+Satrec objects cannot be pickled, so the TLE lines are what travels to the workers.
+"""
+
+FRAMES = ("teme", "ecef")
+
+
+class PropagationResult(NamedTuple):
+    error: np.ndarray  # (n, t) SGP4 error codes, 0 means ok
+    r_km: np.ndarray  # (n, t, 3) positions, NaN where SGP4 failed
+    v_kms: Optional[np.ndarray]  # (n, t, 3) velocities (TEME) when requested
+
+
+def default_workers() -> int:
+    return int(getattr(settings, "PROPAGATION_WORKERS", 0) or os.cpu_count() or 1)
+
+
+# worker side
+
+_worker_shards: Dict[str, SatrecArray] = {}
+
+
+def _shard_digest(lines: Sequence[Tuple[str, str]]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for line1, line2 in lines:
+        digest.update(line1.encode())
+        digest.update(line2.encode())
+    return digest.hexdigest()
+
+
+def _shard_satellites(digest: str, lines: Sequence[Tuple[str, str]]) -> SatrecArray:
+    """Parse a shard once per worker process (the same shard usually comes back on every snapshot/screen run)."""
+    sats = _worker_shards.get(digest)
+    if sats is None:
+        if len(_worker_shards) >= 64:  # shards of an older catalog, not worth keeping
+            _worker_shards.clear()
+        sats = SatrecArray([Satrec.twoline2rv(line1, line2) for line1, line2 in lines])
+        _worker_shards[digest] = sats
+    return sats
+
+
+def _propagate_shard(
+    digest: str,
+    lines: Sequence[Tuple[str, str]],
+    jd: np.ndarray,
+    fr: np.ndarray,
+    frame: str,
+    with_velocity: bool,
+    time_chunk: int,
+) -> PropagationResult:
+    """Runs inside a worker: propagate one shard over every time, time_chunk instants per sgp4 call."""
+    sats = _shard_satellites(digest, lines)
+    n, t = len(lines), len(jd)
+    error = np.empty((n, t), dtype=np.uint8)
+    r_out = np.empty((n, t, 3))
+    v_out = np.empty((n, t, 3)) if with_velocity else None
+    for begin in range(0, t, time_chunk):
+        stop = min(begin + time_chunk, t)
+        err, r, v = sats.sgp4(jd[begin:stop], fr[begin:stop])
+        if frame == "ecef":
+            r = _rotate_teme_to_ecef(r, _gmst_from_jd(jd[begin:stop] + fr[begin:stop]))
+        r[err != 0] = np.nan
+        error[:, begin:stop] = err
+        r_out[:, begin:stop] = r
+        if with_velocity:
+            v_out[:, begin:stop] = v
+    return PropagationResult(error, r_out, v_out)
+
+
+# parent side
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool shared by every parallel job of this process, kept alive so the workers keep their parsed shards.
+    Workers are spawned, not forked: the parent may hold DB connections and background threads.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
+        _executor_workers = 0
+
+
+def shard_bounds(n: int, shards: int) -> List[Tuple[int, int]]:
+    """Split range(n) into `shards` contiguous, nearly equal [begin, end) slices (empty ones dropped)."""
+    edges = np.linspace(0, n, max(1, shards) + 1).round().astype(int)
+    return [(int(begin), int(end)) for begin, end in zip(edges[:-1], edges[1:]) if end > begin]
+
+
+def propagate_parallel(
+    tles: Sequence[Tuple[str, str]],
+    jd: np.ndarray,
+    fr: np.ndarray,
+    *,
+    workers: Optional[int] = None,
+    frame: str = "ecef",
+    with_velocity: bool = False,
+    time_chunk: int = 60,
+) -> PropagationResult:
+    """Propagate (line1, line2) pairs over the (jd, fr) arrays on a process pool.
+    With workers=1 everything runs in this process (same code path, no pool), which is also the baseline the
+    benchmark_propagation command compares against.
+
+    --> returns a PropagationResult with arrays aligned with tles"""
+
+    if frame not in FRAMES:
+        raise ValueError(f"Unknown frame {frame!r}, expected one of {FRAMES}")
+    workers = workers or default_workers()
+    jd = np.asarray(jd, dtype=float)
+    fr = np.asarray(fr, dtype=float)
+    bounds = shard_bounds(len(tles), workers)
+    if not bounds:
+        empty = np.zeros((0, len(jd), 3))
+        return PropagationResult(np.zeros((0, len(jd)), dtype=np.uint8), empty, empty if with_velocity else None)
+
+    jobs = []
+    for begin, end in bounds:
+        lines = list(tles[begin:end])
+        jobs.append((_shard_digest(lines), lines, jd, fr, frame, with_velocity, time_chunk))
+
+    if workers == 1:
+        parts = [_propagate_shard(*job) for job in jobs]
+    else:
+        executor = get_executor(workers)
+        parts = [future.result() for future in [executor.submit(_propagate_shard, *job) for job in jobs]]
+
+    return PropagationResult(
+        np.concatenate([part.error for part in parts]),
+        np.concatenate([part.r_km for part in parts]),
+        np.concatenate([part.v_kms for part in parts]) if with_velocity else None,
+    )
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+from django.conf import settings
+from sgp4.api import Satrec, SatrecArray
+
+from satellites.services.geodesy import look_angles
+from satellites.services.propagation import julian_dates, ecef_positions
+
+# golden ratio conjugate used by the golden-section search for the culmination
+_INV_PHI = (math.sqrt(5.0) - 1.0) / 2.0
+
+
+class Observer(NamedTuple):
+    """A ground observer, WGS84 geodetic coordinates (altitude in km above the ellipsoid)."""
+
+    lat: float
+    lon: float
+    alt_km: float = 0.0
+
+
+def _coarse_step_s() -> float:
+    return float(getattr(settings, "PASS_COARSE_STEP_S", 60.0))
+
+
+def _elevations(sat: Satrec, jd0: float, fr0: float, offsets: np.ndarray, observer: Observer):
+    """Azimuth/elevation of one satellite at start + offsets seconds (decayed instants count as -90 deg)."""
+    jd = np.full(offsets.shape, jd0)
+    fr = fr0 + offsets / 86400.0
+    error, ecef = ecef_positions(sat, jd, fr)
+    az, el, _ = look_angles(ecef, observer.lat, observer.lon, observer.alt_km)
+    el = np.where(error != 0, -90.0, el)
+    return az, el
+
+
+def _refine_crossings(sat, jd0, fr0, lo, hi, observer, min_el, precision_s):
+    """
+    Vectorized bisection: every bracket [lo, hi] contains one horizon crossing (elevation - min_el changes sign).
+    All brackets are halved together, so each iteration is a single sgp4_array call no matter how many passes.
+    """
+    lo = lo.astype(float)
+    hi = hi.astype(float)
+    if lo.size == 0:
+        return lo
+    _, el_lo = _elevations(sat, jd0, fr0, lo, observer)
+    lo_above = el_lo >= min_el
+    iterations = max(1, int(math.ceil(math.log2(max(np.max(hi - lo), precision_s) / precision_s))))
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        _, el_mid = _elevations(sat, jd0, fr0, mid, observer)
+        same_side = (el_mid >= min_el) == lo_above
+        lo = np.where(same_side, mid, lo)
+        hi = np.where(same_side, hi, mid)
+    return 0.5 * (lo + hi)
+
+
+def _refine_culminations(sat, jd0, fr0, lo, hi, observer, precision_s):
+    """Vectorized golden-section search for the elevation maximum inside each [lo, hi] interval."""
+    a = lo.astype(float)
+    b = hi.astype(float)
+    if a.size == 0:
+        return a
+    c = b - _INV_PHI * (b - a)
+    d = a + _INV_PHI * (b - a)
+    _, el_c = _elevations(sat, jd0, fr0, c, observer)
+    _, el_d = _elevations(sat, jd0, fr0, d, observer)
+    while np.max(b - a) > precision_s:
+        left = el_c > el_d  # maximum is in [a, d]
+        b = np.where(left, d, b)
+        a = np.where(left, a, c)
+        c = b - _INV_PHI * (b - a)
+        d = a + _INV_PHI * (b - a)
+        _, el_c = _elevations(sat, jd0, fr0, c, observer)
+        _, el_d = _elevations(sat, jd0, fr0, d, observer)
+    return 0.5 * (a + b)
+
+
+def _passes_from_samples(
+    sat: Satrec,
+    jd0: float,
+    fr0: float,
+    offsets: np.ndarray,
+    elevations: np.ndarray,
+    observer: Observer,
+    start: datetime,
+    min_el: float,
+    precision_s: float,
+) -> List[Dict[str, object]]:
+    """Turn one satellite's coarse elevation samples into refined passes."""
+    above = elevations >= min_el
+    change = np.flatnonzero(above[1:] != above[:-1])
+    if change.size == 0:
+        return []
+
+    rising = above[change + 1]
+    crossings = _refine_crossings(sat, jd0, fr0, offsets[change], offsets[change + 1], observer, min_el, precision_s)
+    rise_times = crossings[rising]
+    set_times = crossings[~rising]
+    rise_idx = change[rising]
+    set_idx = change[~rising]
+
+    # only complete passes are reported: drop a set without its rise (already up at start) and a trailing rise
+    if set_times.size and (rise_times.size == 0 or set_times[0] < rise_times[0]):
+        set_times, set_idx = set_times[1:], set_idx[1:]
+    count = min(rise_times.size, set_times.size)
+    if count == 0:
+        return []
+    rise_times, rise_idx = rise_times[:count], rise_idx[:count]
+    set_times, set_idx = set_times[:count], set_idx[:count]
+
+    # highest coarse sample of each pass, then a golden-section search one step either side of it
+    step = offsets[1] - offsets[0]
+    peaks = np.array([rise_idx[i] + 1 + np.argmax(elevations[rise_idx[i] + 1:set_idx[i] + 1]) for i in range(count)])
+    lo = np.maximum(offsets[peaks] - step, rise_times)
+    hi = np.minimum(offsets[peaks] + step, set_times)
+    culminations = _refine_culminations(sat, jd0, fr0, lo, hi, observer, precision_s)
+
+    # one last evaluation for the azimuths/elevations of every event
+    events = np.concatenate([rise_times, culminations, set_times])
+    az, el = _elevations(sat, jd0, fr0, events, observer)
+    az_rise, az_culm, az_set = np.split(az, 3)
+    el_culm = np.split(el, 3)[1]
+
+    passes: List[Dict[str, object]] = []
+    for i in range(count):
+        passes.append({
+            "rise_time": (start + timedelta(seconds=float(rise_times[i]))).isoformat(),
+            "rise_azimuth": float(az_rise[i]),
+            "culmination_time": (start + timedelta(seconds=float(culminations[i]))).isoformat(),
+            "culmination_azimuth": float(az_culm[i]),
+            "max_elevation": float(el_culm[i]),
+            "set_time": (start + timedelta(seconds=float(set_times[i]))).isoformat(),
+            "set_azimuth": float(az_set[i]),
+            "duration_s": float(set_times[i] - rise_times[i]),
+        })
+    return passes
+
+
+def predict_passes_many(
+    satrecs: Sequence[Satrec],
+    observer: Observer,
+    *,
+    days: float = 1.0,
+    min_el: float = 0.0,
+    start: datetime | None = None,
+    precision_s: float = 0.5,
+    chunk_size: int = 32,
+) -> List[List[Dict[str, object]]]:
+    """Predict the passes of several satellites over one observer.
+    The coarse elevation sampling (every PASS_COARSE_STEP_S seconds) is done for a chunk of satellites at once with
+    SatrecArray, then every horizon crossing is bracketed between two samples and refined by bisection, and the
+    culmination by golden-section search. Passes shorter than the coarse step can be missed, and passes already in
+    progress at start or still in progress at the end of the window are left out.
+
+    --> returns one list of passes per satellite (aligned with satrecs)"""
+
+    start = (start or datetime.now(timezone.utc)).replace(microsecond=0)
+    step = _coarse_step_s()
+    offsets = np.arange(0.0, days * 86400.0 + step, step)
+    jd, fr = julian_dates(start, offsets)
+    jd0, fr0 = float(jd[0]), float(fr[0])
+
+    results: List[List[Dict[str, object]]] = []
+    for begin in range(0, len(satrecs), chunk_size):
+        chunk = list(satrecs[begin:begin + chunk_size])
+        error, ecef = ecef_positions(SatrecArray(chunk), jd, fr)
+        _, elevations, _ = look_angles(ecef, observer.lat, observer.lon, observer.alt_km)
+        elevations = np.where(error != 0, -90.0, elevations)
+        for sat, sat_elevations in zip(chunk, elevations):
+            results.append(
+                _passes_from_samples(sat, jd0, fr0, offsets, sat_elevations, observer, start, min_el, precision_s)
+            )
+    return results
+
+
+def predict_passes(
+    sat: Satrec,
+    observer: Observer,
+    *,
+    days: float = 1.0,
+    min_el: float = 0.0,
+    start: datetime | None = None,
+    precision_s: float = 0.5,
+) -> List[Dict[str, object]]:
+    """Predict the passes of one satellite over an observer, see predict_passes_many."""
+    return predict_passes_many(
+        [sat], observer, days=days, min_el=min_el, start=start, precision_s=precision_s
+    )[0]
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import hashlib
+import math
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+"""
+Shared cache of computed "right now" positions, keyed by (norad_id, TLE version, time bucket).
+Time is cut into POSITION_CACHE_QUANTUM_S buckets and the position of a bucket is computed for the start of the
+bucket, so every request for the same satellite in the same bucket (any user, any worker sharing the cache
+backend) gets the same answer and only the first one does the work.
+The TLE version is a digest of the two lines, so a new TLE can never be served from an old entry and nothing needs
+to be invalidated; old entries just expire (POSITION_CACHE_TTL_S) or get culled by the backend (MAX_ENTRIES).
+"""
+
+CACHE_ALIAS = "positions"
+
+
+def quantum_s() -> float:
+    return float(getattr(settings, "POSITION_CACHE_QUANTUM_S", 0.0))
+
+
+def tle_version(line1: str, line2: str) -> str:
+    """Short digest of the TLE lines, the part of the key that changes when the TLE does."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(line1.encode())
+    digest.update(line2.encode())
+    return digest.hexdigest()
+
+
+def bucket_of(when: datetime, quantum: float) -> Tuple[int, datetime]:
+    """Index of the bucket containing `when` and the instant the bucket starts at."""
+    bucket = math.floor(when.timestamp() / quantum)
+    return bucket, datetime.fromtimestamp(bucket * quantum, tz=timezone.utc)
+
+
+def cache_key(norad_id: int, line1: str, line2: str, bucket: int) -> str:
+    return f"pos:{norad_id}:{tle_version(line1, line2)}:{bucket}"
+
+
+def cached_position(
+    norad_id: int,
+    line1: str,
+    line2: str,
+    when: datetime,
+    compute: Callable[[datetime], Dict[str, object]],
+) -> Optional[Dict[str, object]]:
+    """
+    Position of the bucket containing `when`, computed with compute(bucket_start) on a miss.
+    Errors raised by compute are not cached (a decayed satellite raises again on the next request).
+
+    --> returns the position dict, or None when the cache is disabled (quantum <= 0)
+    """
+    quantum = quantum_s()
+    if quantum <= 0:
+        return None
+    bucket, bucket_start = bucket_of(when, quantum)
+    key = cache_key(norad_id, line1, line2, bucket)
+    cache = caches[CACHE_ALIAS]
+
+    position = cache.get(key)
+    if position is None:
+        position = compute(bucket_start)
+        # a bucket is only asked for while it is "now", keep it a little longer than that for slow clocks
+        cache.set(key, position, timeout=float(getattr(settings, "POSITION_CACHE_TTL_S", 10.0)) + quantum)
+    return position
@@ -1,10 +1,23 @@
 from __future__ import annotations
 from datetime import datetime, timezone
-from sgp4.api import Satrec, jday
-from pyproj import Transformer
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from django.conf import settings
+from sgp4.api import Satrec, SatrecArray, jday
 import math
+import numpy as np
+from satellites.services.ephemeris import ephemeris_cache
+from satellites.services.geodesy import convert_ecef_to_geodetic
+from satellites.services.position_cache import cached_position
+from satellites.services.satrec_cache import satrec_cache
 
-_ecef_to_geodetic = Transformer.from_crs("epsg:4978", "epsg:4979", always_xy=True)
+
+def _ecef_to_geodetic(x_km, y_km, z_km):
+    """
+    ECEF (km) -> (lat, lon, alt_km) using the closed-form NumPy routine from geodesy.py.
+    pyproj is still there as a reference backend, switch with settings.GEODETIC_BACKEND = "pyproj".
+    """
+    backend = getattr(settings, "GEODETIC_BACKEND", "numpy")
+    return convert_ecef_to_geodetic(x_km, y_km, z_km, backend=backend)
 
 def _teme_to_ecef(r_teme_km, v_teme_kms, dt: datetime):
     """
@@ -32,10 +45,11 @@ def _teme_to_ecef(r_teme_km, v_teme_kms, dt: datetime):
 
     return (x_e, y_e, z_e)
 
-def _gmst_from_jd(jd_ut1: float) -> float:
+def _gmst_from_jd(jd_ut1):
     """
     This function computes the earths rotation angle (Greenwich Mean Sidereal Time) at the exact timestamp im propagating to.
     It computes the GMST based on the Julian date passed to it (time at whcih we want to see the satellite's position).
+    jd_ut1 can also be a NumPy array of Julian dates, then one angle per date comes back (used for ground tracks).
 
     --> returns the GMST in radians (used to rotate the TEME coordinates to ECEF coordinates to exact point of time)
     """
@@ -46,22 +60,52 @@ def _gmst_from_jd(jd_ut1: float) -> float:
     gmst_deg = ( 280.46061837 + 360.98564736629 * (jd_ut1 - 2451545.0) + 0.000387933 * T * T - (T ** 3) / 38710000.0 )
     gmst_deg = gmst_deg % 360.0
 
-    return math.radians(gmst_deg)
+    return np.radians(gmst_deg)
 
 # for this function, i simplified teh sgp4 algorithm available online to meet my basic needs
 # we need this function to propagate the satellite position to the current time based on its time and orbit epoch
 
-def propagate_now(line1: str, line2: str, *, timestamp: datetime | None = None):
+def propagate_now(line1: str, line2: str, *, timestamp: datetime | None = None, norad_id: int | None = None):
     """Taking the raw fetched TLE lines and propagate them to "right now" so I can plot the satellite at this point of time.
     I am calling the SGP4 (a widely used algortithm for satellite orbit propagation).
     That algorithm outputs the vector containing r (satellites coordinates in km), v (satellites velocity)--> but they are in TEME frame, 
     so i will use the function _teme_to_ecef to convert them to ECEF frame. 
     Then the ECEF coordinates are converted to geodetic coordinates (lat, lon, alt) for teh map doing the minimum math.
+    When norad_id is given the parsed Satrec comes from the process-wide satrec_cache instead of being parsed again,
+    and for "now" requests the position is shared through the time-bucketed position cache (position_cache.py) and
+    computed from the Chebyshev ephemeris cache (ephemeris.py) when it has a fit.
+    An explicit timestamp always gets an exact SGP4 position at that instant.
 
     --> returns a dictionary with lat, lon, alt_km, vel_kms, timestamp"""
 
-    now = timestamp or datetime.now(timezone.utc)
-    sat = Satrec.twoline2rv(line1, line2)
+    if timestamp is None and norad_id is not None:
+        now = datetime.now(timezone.utc)
+        cached = cached_position(norad_id, line1, line2, now, lambda when: _position_at(line1, line2, when, norad_id, True))
+        if cached is not None:
+            return cached
+        return _position_at(line1, line2, now, norad_id, True)
+
+    return _position_at(line1, line2, timestamp or datetime.now(timezone.utc), norad_id, False)
+
+
+def _position_at(line1: str, line2: str, now: datetime, norad_id: int | None, use_ephemeris: bool):
+    if use_ephemeris and getattr(settings, "EPHEMERIS_ENABLED", True):
+        sample = ephemeris_cache.position(norad_id, line1, line2, now)
+        if sample is not None:
+            x, y, z, vel_kms = sample
+            lat, lon, alt_km = _ecef_to_geodetic(x, y, z)
+            return {
+                "lat": float(lat),
+                "lon": float(lon),
+                "alt_km": float(alt_km),
+                "vel_kms": vel_kms,
+                "timestamp": now.isoformat(),
+            }
+
+    if norad_id is not None:
+        sat = satrec_cache.get(norad_id, line1, line2)
+    else:
+        sat = Satrec.twoline2rv(line1, line2)
 
     # computing the Julian date and fraction for the current time (the time when we want to know the satellite's position)
     jd, fr = jday(now.year, now.month, now.day, now.hour, now.minute, now.second + now.microsecond/1e6)
@@ -73,10 +117,8 @@ def propagate_now(line1: str, line2: str, *, timestamp: datetime | None = None):
     # converting TEME to ECEF
     x, y, z = _teme_to_ecef(r, v, now)
 
-    # converting ECEF to geodetic coordinates (longitude, latitude, altitude)
-    lon, lat, alt = _ecef_to_geodetic.transform(x*1000, y*1000, z*1000)  # meters in -> lon,lat,ellipsoidal height(m)
-    # converting altitude to kilometers
-    alt_km = alt / 1000.0
+    # converting ECEF to geodetic coordinates (latitude, longitude, ellipsoidal height in km)
+    lat, lon, alt_km = _ecef_to_geodetic(x, y, z)
     # calculating the velocity magnitude in km/s
     vel_kms = math.sqrt(v[0]**2 + v[1]**2 + v[2]**2)
 
@@ -87,3 +129,171 @@ def propagate_now(line1: str, line2: str, *, timestamp: datetime | None = None):
         "vel_kms": float(vel_kms),
         "timestamp": now.isoformat(),
     }
+
+
+def _rotate_teme_to_ecef(r_teme_km: np.ndarray, theta) -> np.ndarray:
+    """
+    Array version of the rotation in _teme_to_ecef: same rotation about Z, but for a whole (..., 3) block of
+    TEME vectors at once. theta can be a scalar (one instant for every satellite) or broadcastable against r[..., 0].
+    """
+    cos_t = np.cos(theta)
+    sin_t = np.sin(theta)
+    x_t = r_teme_km[..., 0]
+    y_t = r_teme_km[..., 1]
+    out = np.empty_like(r_teme_km)
+    out[..., 0] = cos_t * x_t + sin_t * y_t
+    out[..., 1] = -sin_t * x_t + cos_t * y_t
+    out[..., 2] = r_teme_km[..., 2]
+    return out
+
+
+def propagate_arrays(satrecs: Union[SatrecArray, Sequence[Satrec]], *, timestamp: datetime | None = None) -> Dict[str, object]:
+    """Batch counterpart of propagate_now working on already parsed satellites.
+    All satellites go through SGP4 in one C call (SatrecArray), then the TEME->ECEF rotation and the
+    geodetic conversion are done as NumPy array operations, so there is no Python loop per satellite.
+
+    --> returns a dictionary of arrays (one entry per satellite): lat, lon, alt_km, vel_kms, ecef_km (n x 3),
+    error (SGP4 error code, 0 means ok) plus the timestamp used"""
+
+    now = timestamp or datetime.now(timezone.utc)
+    sat_array = satrecs if isinstance(satrecs, SatrecArray) else SatrecArray(list(satrecs))
+
+    jd, fr = jday(now.year, now.month, now.day, now.hour, now.minute, now.second + now.microsecond/1e6)
+    error, r, v = sat_array.sgp4(np.array([jd]), np.array([fr]))
+    # SatrecArray returns (n_sats, n_times, ...) arrays, we only asked for one time
+    error = error[:, 0]
+    r = r[:, 0, :]
+    v = v[:, 0, :]
+
+    # failed satellites come back as NaN, zero them so the transforms stay finite and mask them afterwards
+    failed = error != 0
+    r = np.where(failed[:, None], 0.0, r)
+    v = np.where(failed[:, None], 0.0, v)
+
+    ecef = _rotate_teme_to_ecef(r, _gmst_from_jd(jd + fr))
+    lat, lon, alt_km = _ecef_to_geodetic(ecef[:, 0], ecef[:, 1], ecef[:, 2])
+
+    return {
+        "lat": lat,
+        "lon": lon,
+        "alt_km": alt_km,
+        "vel_kms": np.sqrt(np.einsum("ij,ij->i", v, v)),
+        "ecef_km": ecef,
+        "error": error,
+        "timestamp": now,
+    }
+
+
+def propagate_many(
+    tles: Sequence[Tuple[str, str]],
+    *,
+    timestamp: datetime | None = None,
+    norad_ids: Sequence[int] | None = None,
+) -> List[Optional[Dict[str, object]]]:
+    """Propagate a whole list of (line1, line2) pairs to the same instant in one go.
+    Uses propagate_arrays under the hood so thousands of satellites cost one SGP4 call instead of thousands.
+    Passing norad_ids (aligned with tles) lets the parsed satellites come from satrec_cache.
+
+    --> returns a list aligned with tles, every item has the same shape as the propagate_now dict,
+    or None when SGP4 reported an error for that satellite (propagate_now would raise ValueError there)"""
+
+    if not tles:
+        return []
+
+    if norad_ids is not None:
+        sats = [satrec_cache.get(nid, line1, line2) for nid, (line1, line2) in zip(norad_ids, tles)]
+    else:
+        sats = [Satrec.twoline2rv(line1, line2) for line1, line2 in tles]
+    arrays = propagate_arrays(sats, timestamp=timestamp)
+    stamp = arrays["timestamp"].isoformat()
+
+    # tolist() converts to plain python floats in one shot, much cheaper than float() per item
+    lat = arrays["lat"].tolist()
+    lon = arrays["lon"].tolist()
+    alt_km = arrays["alt_km"].tolist()
+    vel_kms = arrays["vel_kms"].tolist()
+    errors = arrays["error"].tolist()
+
+    results: List[Optional[Dict[str, object]]] = []
+    for i, err in enumerate(errors):
+        if err != 0:
+            results.append(None)
+            continue
+        results.append({
+            "lat": lat[i],
+            "lon": lon[i],
+            "alt_km": alt_km[i],
+            "vel_kms": vel_kms[i],
+            "timestamp": stamp,
+        })
+    return results
+
+
+def julian_dates(start: datetime, offsets_s: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Build the (jd, fr) arrays for start + offsets_s seconds in one go, calling jday only once.
+    The whole day stays in jd and the offsets go into the fraction so there is no float precision loss."""
+    jd, fr = jday(start.year, start.month, start.day, start.hour, start.minute, start.second + start.microsecond/1e6)
+    fr_arr = fr + np.asarray(offsets_s, dtype=float) / 86400.0
+    return np.full(fr_arr.shape, jd), fr_arr
+
+
+def ecef_positions(sat: Union[Satrec, SatrecArray], jd: np.ndarray, fr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """SGP4 + TEME->ECEF rotation for arrays of Julian dates, without the geodetic step.
+    Works with a single Satrec (arrays shaped (t,) and (t, 3)) or a SatrecArray (shaped (n, t) and (n, t, 3)).
+    Positions where SGP4 failed are NaN, so they drop out of any comparison.
+
+    --> returns (error, ecef_km)"""
+    if isinstance(sat, SatrecArray):
+        error, r, _ = sat.sgp4(jd, fr)
+    else:
+        error, r, _ = sat.sgp4_array(jd, fr)
+    ecef = _rotate_teme_to_ecef(r, _gmst_from_jd(jd + fr))
+    return error, ecef
+
+
+def propagate_track(
+    line1: str,
+    line2: str,
+    *,
+    start: datetime,
+    end: datetime,
+    step_seconds: float,
+    norad_id: int | None = None,
+) -> Dict[str, object]:
+    """Propagate one satellite over a whole time window (its ground track).
+    The Julian date array is built once, Satrec.sgp4_array does every instant in a single C call and the TEME->ECEF
+    rotation + geodetic conversion run vectorized over time, so a 3 hour track at 10 s is a couple thousand array
+    elements instead of a couple thousand propagate_now calls.
+
+    --> returns a dictionary of arrays (one entry per instant): offsets_s (seconds after start), lat, lon, alt_km,
+    vel_kms, error, plus start/step_seconds"""
+
+    if step_seconds <= 0:
+        raise ValueError("step_seconds must be positive")
+    if end < start:
+        raise ValueError("end must not be before start")
+
+    sat = satrec_cache.get(norad_id, line1, line2) if norad_id is not None else Satrec.twoline2rv(line1, line2)
+
+    total = (end - start).total_seconds()
+    offsets = np.arange(0.0, total + 1e-9, step_seconds)
+    jd, fr = julian_dates(start, offsets)
+
+    error, r, v = sat.sgp4_array(jd, fr)
+    failed = error != 0
+    r = np.where(failed[:, None], 0.0, r)
+    v = np.where(failed[:, None], 0.0, v)
+
+    ecef = _rotate_teme_to_ecef(r, _gmst_from_jd(jd + fr))
+    lat, lon, alt_km = _ecef_to_geodetic(ecef[:, 0], ecef[:, 1], ecef[:, 2])
+
+    return {
+        "offsets_s": offsets,
+        "lat": lat,
+        "lon": lon,
+        "alt_km": alt_km,
+        "vel_kms": np.sqrt(np.einsum("ij,ij->i", v, v)),
+        "error": error,
+        "start": start,
+        "step_seconds": step_seconds,
+    }
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Set, Tuple
+
+from django.conf import settings
+from sgp4.api import Satrec
+
+CacheKey = Tuple[int, str, str]
+
+
+class SatrecCache:
+    """
+    Process-wide LRU cache of initialized Satrec objects.
+    Parsing a TLE with Satrec.twoline2rv is not free, and the same few TLEs (ISS, favorites...) get propagated
+    over and over, so I keep the parsed satellite around keyed by (norad_id, line1, line2).
+    Because the lines are part of the key a new TLE can never be served from an old entry, invalidate() just
+    frees the memory of the outdated ones straight away instead of waiting for them to fall off the LRU end.
+    """
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[CacheKey, Satrec]" = OrderedDict()
+        self._keys_by_norad: Dict[int, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, norad_id: int, line1: str, line2: str) -> Satrec:
+        """Return the parsed Satrec for these lines, parsing (and caching) it on a miss."""
+        key = (norad_id, line1, line2)
+        with self._lock:
+            sat = self._entries.get(key)
+            if sat is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return sat
+            self.misses += 1
+
+        # parse outside the lock, worst case two threads parse the same TLE once
+        sat = Satrec.twoline2rv(line1, line2)
+
+        with self._lock:
+            self._entries[key] = sat
+            self._entries.move_to_end(key)
+            self._keys_by_norad.setdefault(norad_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget_key(old_key)
+                self.evictions += 1
+        return sat
+
+    def invalidate(self, norad_id: int) -> int:
+        """Drop every cached Satrec for norad_id, returns how many entries were removed."""
+        with self._lock:
+            keys = self._keys_by_norad.pop(norad_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_norad.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _forget_key(self, key: CacheKey) -> None:
+        keys = self._keys_by_norad.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_norad[key[0]]
+
+
+# one shared cache per process (each gunicorn worker gets its own)
+satrec_cache = SatrecCache(maxsize=getattr(settings, "SATREC_CACHE_SIZE", 2048))
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+import numpy as np
+from django.conf import settings
+from sgp4.api import Satrec, SatrecArray
+
+from satellites.models import TLE
+from satellites.services.catalog_snapshot import (
+    catalog_rows,
+    catalog_signature,
+    catalog_snapshot_path,
+    changed_since,
+    load_catalog_snapshot,
+    max_delta,
+    satrecs_from_rows,
+    write_catalog_snapshot,
+)
+from satellites.services.propagation import propagate_arrays
+
+try:  # POSIX only, used so a single gunicorn worker recomputes the shared snapshot
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+"""
+Full-catalog position snapshot.
+One process at a time propagates the whole TLE table with the batch propagator and writes the result to a small
+binary file (fixed header + NumPy structured array). Every gunicorn worker memory-maps that file, so the
+/api/positions/all/ endpoint only reads what is already computed instead of propagating ~10k satellites per poll.
+"""
+
+SNAPSHOT_MAGIC = b"STLPOS01"
+# magic, generation, unix timestamp, row count -> padded to 64 bytes so the array stays aligned
+_HEADER = struct.Struct("<8sQdQ")
+HEADER_SIZE = 64
+
+SNAPSHOT_DTYPE = np.dtype(
+    [
+        ("norad_id", "<u4"),
+        ("name", "S32"),
+        ("lat", "<f8"),
+        ("lon", "<f8"),
+        ("alt_km", "<f8"),
+        ("vel_kms", "<f8"),
+        ("x_km", "<f8"),
+        ("y_km", "<f8"),
+        ("z_km", "<f8"),
+    ]
+)
+
+
+class PositionSnapshot(NamedTuple):
+    generation: int
+    timestamp: datetime
+    data: np.ndarray  # SNAPSHOT_DTYPE rows, memory-mapped when loaded from disk
+
+    @property
+    def age_seconds(self) -> float:
+        return (datetime.now(timezone.utc) - self.timestamp).total_seconds()
+
+
+class CatalogArrays(NamedTuple):
+    signature: Tuple[int, int]  # catalog_signature() the arrays were built at
+    norad_ids: np.ndarray  # uint32
+    names: List[str]
+    satrecs: SatrecArray
+    sats: List[Satrec]  # the same satellites one by one, for their elements (apogee/perigee...)
+    lines: List[Tuple[str, str]]  # their TLE lines, what process pool workers get (Satrec does not pickle)
+
+
+def snapshot_path() -> Path:
+    return Path(getattr(settings, "POSITION_SNAPSHOT_PATH", Path(settings.BASE_DIR) / "var" / "positions.snapshot"))
+
+
+def snapshot_interval() -> float:
+    return float(getattr(settings, "POSITION_SNAPSHOT_INTERVAL_S", 10.0))
+
+
+def snapshot_max_age() -> float:
+    return float(getattr(settings, "POSITION_SNAPSHOT_MAX_AGE_S", 60.0))
+
+
+# catalog -> SatrecArray (parsed once per catalog change, not once per snapshot)
+
+_catalog_lock = threading.Lock()
+_catalog: Optional[CatalogArrays] = None
+
+
+def load_catalog() -> CatalogArrays:
+    """Return every TLE row parsed into one SatrecArray, re-parsing only when the catalog signature changed.
+    The rows come from the binary catalog snapshot plus the rows written since it was dumped (no ORM rows for the
+    rest, no TLE parsing), else from the TLE table. When a snapshot had to be passed over for the table, or the delta
+    got large, the snapshot is written again from what was just loaded (by one process at a time, under a file lock)."""
+    global _catalog
+    signature = catalog_signature()
+    with _catalog_lock:
+        if _catalog is not None and _catalog.signature == signature:
+            return _catalog
+
+        merged = _catalog_from_snapshot(signature)
+        if merged is not None:
+            (norad_ids, names, sats, lines), delta = merged
+        else:
+            norad_ids, names, sats, lines = _catalog_from_table()
+        if (merged is None and catalog_snapshot_path().exists()) or (merged is not None and delta > max_delta()):
+            _rewrite_catalog_snapshot(signature, norad_ids, names, sats, lines)
+
+        _catalog = CatalogArrays(
+            signature=signature,
+            norad_ids=norad_ids,
+            names=names,
+            satrecs=SatrecArray(sats),
+            sats=sats,
+            lines=lines,
+        )
+        return _catalog
+
+
+CatalogRows = Tuple[np.ndarray, List[str], List[Satrec], List[Tuple[str, str]]]
+
+
+def _catalog_from_snapshot(signature: Tuple[int, int]) -> Optional[Tuple[CatalogRows, int]]:
+    """The snapshot rows with the rows written since its dump applied on top. --> returns (rows, delta size), or
+    None when there is no snapshot or rows were deleted since (only reading the table tells which)"""
+    dumped = load_catalog_snapshot()
+    if dumped is None:
+        return None
+    changed = changed_since(dumped.signature)
+    data = dumped.data
+    norad_ids = data["norad_id"].tolist()
+    position = {norad_id: i for i, norad_id in enumerate(norad_ids)}
+    if dumped.signature[0] + sum(row[0] not in position for row in changed) != signature[0]:
+        return None
+
+    names = [raw.decode("utf-8", errors="ignore") for raw in data["name"].tolist()]
+    sats = satrecs_from_rows(data)
+    lines = [(l1.decode("ascii"), l2.decode("ascii")) for l1, l2 in zip(data["line1"].tolist(), data["line2"].tolist())]
+    appended = False
+    for norad_id, name, line1, line2 in changed:
+        try:
+            sat = Satrec.twoline2rv(line1, line2)
+        except ValueError:
+            logger.warning("Skipping unparsable TLE for NORAD %s", norad_id)
+            continue
+        i = position.get(norad_id)
+        if i is None:
+            position[norad_id] = len(norad_ids)
+            norad_ids.append(norad_id)
+            names.append("")
+            sats.append(None)
+            lines.append(None)
+            i, appended = len(norad_ids) - 1, True
+        names[i], sats[i], lines[i] = (name or "").strip(), sat, (line1, line2)
+
+    if appended:  # keep the rows sorted by NORAD ID, like the table read
+        order = sorted(range(len(norad_ids)), key=norad_ids.__getitem__)
+        norad_ids = [norad_ids[i] for i in order]
+        names, sats, lines = [names[i] for i in order], [sats[i] for i in order], [lines[i] for i in order]
+    return (np.asarray(norad_ids, dtype=np.uint32), names, sats, lines), len(changed)
+
+
+def _rewrite_catalog_snapshot(signature, norad_ids, names, sats, lines) -> None:
+    path = catalog_snapshot_path()
+    with _refresh_lock(path, blocking=False) as acquired:
+        if not acquired:
+            return  # another process is writing it
+        rows = catalog_rows(
+            (norad_id, name, line1, line2, sat)
+            for norad_id, name, (line1, line2), sat in zip(norad_ids.tolist(), names, lines, sats)
+        )
+        write_catalog_snapshot(path, rows=(signature, rows))
+
+
+def _catalog_from_table() -> Tuple[np.ndarray, List[str], List[Satrec], List[Tuple[str, str]]]:
+    norad_ids: List[int] = []
+    names: List[str] = []
+    sats: List[Satrec] = []
+    lines: List[Tuple[str, str]] = []
+    rows = TLE.objects.order_by("norad_id").values_list("norad_id", "name", "line1", "line2")
+    for norad_id, name, line1, line2 in rows.iterator(chunk_size=2000):
+        try:
+            sat = Satrec.twoline2rv(line1, line2)
+        except ValueError:
+            logger.warning("Skipping unparsable TLE for NORAD %s", norad_id)
+            continue
+        norad_ids.append(norad_id)
+        names.append((name or "").strip())
+        sats.append(sat)
+        lines.append((line1, line2))
+    return np.asarray(norad_ids, dtype=np.uint32), names, sats, lines
+
+
+def reset_catalog_cache() -> None:
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+# building / writing / reading snapshots
+
+def compute_positions(timestamp: Optional[datetime] = None) -> Tuple[datetime, np.ndarray]:
+    """Propagate the whole catalog to one instant. --> returns (timestamp, SNAPSHOT_DTYPE array without failures)"""
+    catalog = load_catalog()
+    now = timestamp or datetime.now(timezone.utc)
+    data = np.zeros(len(catalog.names), dtype=SNAPSHOT_DTYPE)
+    if len(catalog.names):
+        arrays = propagate_arrays(catalog.satrecs, timestamp=now)
+        data["norad_id"] = catalog.norad_ids
+        data["name"] = [name.encode("utf-8")[:32] for name in catalog.names]
+        data["lat"] = arrays["lat"]
+        data["lon"] = arrays["lon"]
+        data["alt_km"] = arrays["alt_km"]
+        data["vel_kms"] = arrays["vel_kms"]
+        data["x_km"] = arrays["ecef_km"][:, 0]
+        data["y_km"] = arrays["ecef_km"][:, 1]
+        data["z_km"] = arrays["ecef_km"][:, 2]
+        data = data[arrays["error"] == 0]
+    return now, data
+
+
+def write_snapshot(path: Path, generation: int, timestamp: datetime, data: np.ndarray) -> None:
+    """Write atomically (temp file + rename) so readers never see a half written snapshot."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = _HEADER.pack(SNAPSHOT_MAGIC, generation, timestamp.timestamp(), len(data)).ljust(HEADER_SIZE, b"\0")
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(header)
+        fh.write(np.ascontiguousarray(data, dtype=SNAPSHOT_DTYPE).tobytes())
+    os.replace(tmp, path)
+
+
+def read_snapshot(path: Path) -> Optional[PositionSnapshot]:
+    """Memory-map a snapshot file. --> returns None if the file does not exist or is not a snapshot"""
+    try:
+        with open(path, "rb") as fh:
+            header = fh.read(HEADER_SIZE)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER_SIZE:
+        return None
+    magic, generation, unix_ts, count = _HEADER.unpack_from(header)
+    if magic != SNAPSHOT_MAGIC:
+        return None
+    if count:
+        data = np.memmap(path, dtype=SNAPSHOT_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+    else:
+        data = np.zeros(0, dtype=SNAPSHOT_DTYPE)
+    return PositionSnapshot(generation, datetime.fromtimestamp(unix_ts, tz=timezone.utc), data)
+
+
+_loaded_lock = threading.Lock()
+_loaded: Optional[Tuple[Tuple[int, int], PositionSnapshot]] = None
+
+
+def load_snapshot() -> Optional[PositionSnapshot]:
+    """Return the current snapshot, re-mapping the file only when it was replaced since the last call."""
+    global _loaded
+    path = snapshot_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns)
+    with _loaded_lock:
+        if _loaded is not None and _loaded[0] == key:
+            return _loaded[1]
+        snapshot = read_snapshot(path)
+        if snapshot is not None:
+            _loaded = (key, snapshot)
+        return snapshot
+
+
+@contextmanager
+def _refresh_lock(path: Path, blocking: bool):
+    """Cross-process lock next to the snapshot file, yields False when it is held elsewhere (non-blocking mode)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a+b") as fh:
+        if fcntl is None:
+            yield True
+            return
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(fh.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def refresh_snapshot(*, min_age: float = 0.0, blocking: bool = True) -> Optional[PositionSnapshot]:
+    """
+    Recompute and publish a new snapshot with generation = previous + 1.
+    If another process already published one younger than min_age seconds it is reused instead, so N workers
+    ticking at the same time still produce one propagation per interval.
+    """
+    path = snapshot_path()
+    with _refresh_lock(path, blocking) as acquired:
+        current = read_snapshot(path)
+        if not acquired or (current is not None and current.age_seconds < min_age):
+            return load_snapshot()
+        timestamp, data = compute_positions()
+        generation = (current.generation if current else 0) + 1
+        write_snapshot(path, generation, timestamp, data)
+        logger.info("Position snapshot %s written (%s satellites)", generation, len(data))
+    return load_snapshot()
+
+
+def get_snapshot() -> PositionSnapshot:
+    """Snapshot for serving requests: the shared one, rebuilt inline only if it is missing or too old."""
+    if getattr(settings, "POSITION_SNAPSHOT_BACKGROUND", True):
+        ensure_refresher_started()
+    snapshot = load_snapshot()
+    if snapshot is None or snapshot.age_seconds > snapshot_max_age():
+        snapshot = refresh_snapshot(min_age=snapshot_interval())
+    return snapshot
+
+
+# background refresh
+
+class SnapshotRefresher(threading.Thread):
+    """Daemon thread that keeps the shared snapshot at most `interval` seconds old."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="position-snapshot-refresher", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                refresh_snapshot(min_age=self.interval * 0.9, blocking=False)
+            except Exception:  # keep the thread alive, the next tick will try again
+                logger.exception("Position snapshot refresh failed")
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+_refresher: Optional[SnapshotRefresher] = None
+_refresher_lock = threading.Lock()
+
+
+def ensure_refresher_started() -> SnapshotRefresher:
+    """Start this process's refresher thread once (every worker runs one, the file lock elects who computes)."""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = SnapshotRefresher(snapshot_interval())
+            _refresher.start()
+        return _refresher
+
+
+# per-generation derived data (contiguous copies, indexes...), shared by every request of this process
+
+_derived_cache: Dict[str, Tuple[Tuple[int, datetime], object]] = {}
+_derived_lock = threading.Lock()
+
+
+def snapshot_derived(snapshot: PositionSnapshot, name: str, build: Callable[[PositionSnapshot], T]) -> T:
+    """Return build(snapshot), computed once per snapshot generation and cached under name."""
+    key = (snapshot.generation, snapshot.timestamp)
+    with _derived_lock:
+        cached = _derived_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    value = build(snapshot)
+    with _derived_lock:
+        _derived_cache[name] = (key, value)
+    return value
+
+
+def snapshot_ecef(snapshot: PositionSnapshot) -> np.ndarray:
+    """Contiguous (n, 3) ECEF positions in km of a snapshot (the file stores them as strided columns)."""
+    return snapshot_derived(
+        snapshot,
+        "ecef",
+        lambda snap: np.column_stack([snap.data["x_km"], snap.data["y_km"], snap.data["z_km"]]),
+    )
+
+
+# serialization
+
+_json_cache: Dict[str, object] = {}
+_json_lock = threading.Lock()
+
+
+def snapshot_rows(data: np.ndarray) -> List[Dict[str, object]]:
+    """Convert snapshot rows to the position dicts used across the API."""
+    names = [raw.decode("utf-8", errors="ignore") for raw in data["name"].tolist()]
+    return [
+        {"norad_id": norad_id, "name": name, "lat": lat, "lon": lon, "alt_km": alt_km, "vel_kms": vel_kms}
+        for norad_id, name, lat, lon, alt_km, vel_kms in zip(
+            data["norad_id"].tolist(),
+            names,
+            data["lat"].tolist(),
+            data["lon"].tolist(),
+            data["alt_km"].tolist(),
+            data["vel_kms"].tolist(),
+        )
+    ]
+
+
+def snapshot_json(snapshot: PositionSnapshot) -> bytes:
+    """JSON body for /api/positions/all/, encoded once per generation and per process."""
+    key = (snapshot.generation, snapshot.timestamp)
+    with _json_lock:
+        if _json_cache.get("key") == key:
+            return _json_cache["body"]
+    body = json.dumps(
+        {
+            "generation": snapshot.generation,
+            "timestamp": snapshot.timestamp.isoformat(),
+            "count": int(len(snapshot.data)),
+            "positions": snapshot_rows(snapshot.data),
+        }
+    ).encode("utf-8")
+    with _json_lock:
+        _json_cache["key"] = key
+        _json_cache["body"] = body
+    return body
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import itertools
+import math
+from typing import Tuple
+
+import numpy as np
+
+"""
+Spatial indexes over propagated positions.
+Everything here is plain NumPy (sort + searchsorted), no per-point Python loop, so a whole catalog of positions
+can be indexed and queried every time step without scipy.
+"""
+
+# the 13 neighbour offsets "after" a cell in lexicographic order, together with the cell itself they cover each
+# unordered pair of adjacent cells exactly once
+_HALF_NEIGHBOURS = np.array(
+    [offset for offset in itertools.product((-1, 0, 1), repeat=3) if offset > (0, 0, 0)],
+    dtype=np.int64,
+)
+
+
+def _expand_ranges(starts: np.ndarray, stops: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Flatten the index ranges [starts[k], stops[k]) into one array. --> returns (owner k of each item, item)"""
+    counts = np.maximum(stops - starts, 0)
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    owners = np.repeat(np.arange(len(starts)), counts)
+    first = np.cumsum(counts) - counts  # position of each range's first item in the flat output
+    items = starts[owners] + (np.arange(total) - first[owners])
+    return owners, items
+
+
+def grid_candidate_pairs(positions: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Uniform 3D grid broad phase: every pair of points in the same or in adjacent cells of side cell_size.
+    Any two points closer than cell_size are guaranteed to be returned (plus some farther ones, the caller checks
+    the real distance). Rows containing NaN (failed propagations) are ignored.
+
+    --> returns (i, j) index arrays into positions, with i < j
+    """
+    positions = np.asarray(positions, dtype=float)
+    valid = np.flatnonzero(np.isfinite(positions).all(axis=1))
+    if valid.size < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    cells = np.floor(positions[valid] / cell_size).astype(np.int64)
+    # one cell of padding on every side so the neighbours of border cells never wrap onto another row
+    cells -= cells.min(axis=0) - 1
+    dims = cells.max(axis=0) + 2
+    strides = np.array([dims[1] * dims[2], dims[2], 1], dtype=np.int64)
+    keys = cells @ strides
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    sorted_ids = valid[order]
+    cell_end = np.searchsorted(sorted_keys, sorted_keys, side="right")
+
+    # same cell: every later point of that cell
+    first, second = _expand_ranges(np.arange(len(sorted_keys)) + 1, cell_end)
+    left = [first]
+    right = [second]
+
+    # adjacent cells: every point of the neighbour cell (each cell pair visited from one side only)
+    for offset in _HALF_NEIGHBOURS @ strides:
+        neighbour = sorted_keys + offset
+        starts = np.searchsorted(sorted_keys, neighbour, side="left")
+        stops = np.searchsorted(sorted_keys, neighbour, side="right")
+        first, second = _expand_ranges(starts, stops)
+        left.append(first)
+        right.append(second)
+
+    left_idx = sorted_ids[np.concatenate(left)]
+    right_idx = sorted_ids[np.concatenate(right)]
+    return np.minimum(left_idx, right_idx), np.maximum(left_idx, right_idx)
+
+
+class LatLonGrid:
+    """
+    Bucket index of sub-satellite points on a regular lat/lon grid (cell_deg x cell_deg cells).
+    Rows are sorted by cell once at build time (CSR layout), and since the cells of one latitude band are
+    consecutive, a bounding box query is one slice per band plus an exact check on the rows it returns.
+    """
+
+    def __init__(self, lat, lon, cell_deg: float = 1.0):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.cell_deg = cell_deg
+        self.n_rows = int(math.ceil(180.0 / cell_deg))
+        self.n_cols = int(math.ceil(360.0 / cell_deg))
+        cells = self._row(self.lat) * self.n_cols + self._col(self.lon)
+        self.order = np.argsort(cells, kind="stable")
+        # starts[c] is where cell c begins in self.order, starts[c + 1] where it ends
+        self.starts = np.searchsorted(cells[self.order], np.arange(self.n_rows * self.n_cols + 1))
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _row(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90.0) / self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+
+    def _col(self, lon):
+        return np.clip(np.floor((np.asarray(lon) + 180.0) / self.cell_deg).astype(np.int64), 0, self.n_cols - 1)
+
+    def query(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        """
+        Indices of the points inside the box (edges included). min_lon > max_lon means the box crosses the
+        antimeridian, e.g. (170, -170) is the 20 degree band around +/-180.
+
+        --> returns the matching indices, sorted
+        """
+        if min_lon > max_lon:
+            return np.union1d(self.query(min_lat, max_lat, min_lon, 180.0), self.query(min_lat, max_lat, -180.0, max_lon))
+
+        row_lo, row_hi = int(self._row(min_lat)), int(self._row(max_lat))
+        col_lo, col_hi = int(self._col(min_lon)), int(self._col(max_lon))
+        band_starts = np.arange(row_lo, row_hi + 1) * self.n_cols
+        slices = [self.order[self.starts[band + col_lo]:self.starts[band + col_hi + 1]] for band in band_starts.tolist()]
+        found = np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+
+        # only the border cells can hold points outside the box, but checking everything found is just as cheap
+        lat, lon = self.lat[found], self.lon[found]
+        inside = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        return np.sort(found[inside])
@@ -1,12 +1,33 @@
 from __future__ import annotations
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import httpx
-from typing import List, Dict, Tuple, Protocol, Optional
+from typing import Iterable, List, Dict, Mapping, NamedTuple, Set, Tuple, Protocol, Optional
 from datetime import datetime, timedelta, timezone
-from satellites.models import TLE
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from satellites.metrics import TLE_BACKGROUND_REFRESHES, TLE_FETCHES, TLE_FETCHES_COALESCED, UPSTREAM_CALLS_REJECTED
+from satellites.models import TLE, TLERefreshLease
+from satellites.services.ephemeris import ephemeris_cache
+from satellites.services.http_cache import Download, load_validator, record_download, record_not_modified, request_headers
+from satellites.services.satrec_cache import satrec_cache
+from satellites.services.singleflight import SingleFlight
+from satellites.services.tle_history import record_history
+from satellites.services.tle_parser import iter_chunks, iter_tles, tle_content_hash, tle_epoch
+from satellites.services.upstream import NOT_FOUND, UPSTREAM_ERROR, celestrak_breaker, negative_cache
+
+logger = logging.getLogger(__name__)
 
 class HTTPResponse(Protocol):
     status_code: int
     text: str
+    headers: Mapping[str, str]
+    num_bytes_downloaded: int
 
     def raise_for_status(self) -> None: ...
 
@@ -17,60 +38,170 @@ class TLENotFound(Exception):
     pass
 
 
+class UpstreamUnavailable(TLENotFound):
+    """CelesTrak failed (5xx, timeout...) or is being avoided after failing (negative cache, open circuit breaker).
+    A TLENotFound, so the callers that fall back to the stored TLE on a missing one do the same here."""
+
+
 def parse_tle_catalog(text: str) -> List[Dict]:
-    """Parse a block of text containing one or more TLEs in standard format --> norad id, name, line1, line2"""
-
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    records = []
-    # process lines in groups of three (name, line1, line2)
-    for i in range(0, len(lines), 3):
-        if i + 2 >= len(lines): break
-        name = lines[i]
-        line1 = lines[i+1]
-        line2 = lines[i+2]
-        if not (line1.startswith("1 ") and line2.startswith("2 ")):
-            continue
-        try:
-            norad_id = int(line1[2:7])
-        except ValueError:
-            continue
-        # add the parsed record to the list
-        records.append({"norad_id": norad_id, "name": name, "line1": line1, "line2": line2})
-
-    # return the list of parsed TLE records
-    return records
-
-def upsert_tles(records: List[Dict]) -> int:
-
-    """Given a list of TLE records (returened from parse_tle_catalog), put them into the database, TLE table."""
-    count = 0
-    # for each record, update or create the TLE entry
-    for r in records:
-        TLE.objects.update_or_create(
-            norad_id=r["norad_id"],
-            defaults={"name": r["name"], "line1": r["line1"], "line2": r["line2"]},
-        )
-        count += 1
+    """Parse a block of text containing one or more TLEs (2LE or 3LE) --> norad id, name, line1, line2.
+    Fine for a CelesTrak group or a single CATNR answer; big dumps should go through tle_parser.iter_tles and
+    upsert_tle_stream instead of being loaded as one string."""
+
+    return list(iter_tles(text.splitlines()))
+
+class UpsertResult(NamedTuple):
+    inserted: int
+    updated: int
+    unchanged: int
+    rejected: int = 0  # older epoch than the stored row, not written
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged + self.rejected
+
+
+def upsert_tles(records: List[Dict], *, chunk_size: Optional[int] = None, touch_unchanged: bool = False) -> UpsertResult:
+
+    """Given a list of TLE records (returened from parse_tle_catalog), put them into the database, TLE table.
+    Set-based: per chunk of chunk_size records one SELECT reads the stored epoch and content hash, and only the new
+    and changed rows go out in a single INSERT ... ON CONFLICT DO UPDATE (bulk_create with update_conflicts).
+    A record with the same content hash as its row is left alone; one whose epoch is older than the row's is rejected,
+    so an old dump never rolls a TLE back. Re-importing a group where few elements moved thus writes only those rows.
+    Rows left alone keep their updated_at (get_or_refresh_tle uses it to decide when to refetch), unless
+    touch_unchanged: a refresh of those very NORAD IDs did check them against CelesTrak, one UPDATE marks them fresh.
+    Every element set that is not already the stored one, rejected ones and older duplicates within records included,
+    is appended to the TLE history (tle_history.py).
+    Everything runs in one transaction, so a failed import leaves the table as it was.
+
+    --> returns UpsertResult(inserted, updated, unchanged, rejected)"""
+
+    chunk_size = chunk_size or int(getattr(settings, "TLE_UPSERT_CHUNK_SIZE", 1000))
+    prepared = [(r, tle_epoch(r["line1"]), tle_content_hash(r["name"], r["line1"], r["line2"])) for r in records]
+    # the same NORAD ID twice in one INSERT ... ON CONFLICT is an error on Postgres: the freshest epoch wins
+    # (the last record on a tie), the others only go to the history
+    latest: Dict[int, Tuple[Dict, Optional[datetime], str]] = {}
+    for entry in prepared:
+        r, epoch, _ = entry
+        current = latest.get(r["norad_id"])
+        if current is None or epoch is None or current[1] is None or epoch >= current[1]:
+            latest[r["norad_id"]] = entry
+    by_id = list(latest.values())
+    inserted = updated = unchanged = rejected = 0
+    changed_ids: List[int] = []
+    stored_already = set()  # (norad_id, content hash) of the records identical to their row
+
+    with transaction.atomic():
+        for begin in range(0, len(by_id), chunk_size):
+            chunk = by_id[begin:begin + chunk_size]
+            stored = {
+                norad_id: (epoch, content_hash)
+                for norad_id, epoch, content_hash in TLE.objects.filter(
+                    norad_id__in=[r["norad_id"] for r, _, _ in chunk]
+                ).values_list("norad_id", "epoch", "content_hash")
+            }
+            now = datetime.now(timezone.utc)
+            rows = []
+            kept_ids = []
+            for r, epoch, content_hash in chunk:
+                current = stored.get(r["norad_id"])
+                if current is None:
+                    inserted += 1
+                elif current[1] == content_hash:
+                    unchanged += 1
+                    kept_ids.append(r["norad_id"])
+                    stored_already.add((r["norad_id"], content_hash))
+                    continue
+                elif epoch is not None and current[0] is not None and epoch < current[0]:
+                    rejected += 1
+                    kept_ids.append(r["norad_id"])
+                    continue
+                else:
+                    updated += 1
+                rows.append(TLE(
+                    norad_id=r["norad_id"], name=r["name"], line1=r["line1"], line2=r["line2"],
+                    epoch=epoch, content_hash=content_hash, updated_at=now,
+                ))
+
+            if rows:
+                TLE.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=["norad_id"],
+                    update_fields=["name", "line1", "line2", "epoch", "content_hash", "updated_at"],
+                )
+                changed_ids.extend(row.norad_id for row in rows)
+            if kept_ids and touch_unchanged:
+                TLE.objects.filter(norad_id__in=kept_ids).update(updated_at=now)
+
+        history = [
+            (r["norad_id"], epoch, r["name"], r["line1"], r["line2"])
+            for r, epoch, content_hash in prepared
+            if epoch is not None and (r["norad_id"], content_hash) not in stored_already
+        ]
+        if history:
+            record_history(history, batch_size=chunk_size)
+
+    # the lines may have changed, drop the parsed Satrec and the ephemeris fit of the old ones
+    for norad_id in changed_ids:
+        satrec_cache.invalidate(norad_id)
+        ephemeris_cache.invalidate(norad_id)
+
+    return UpsertResult(inserted, updated, unchanged, rejected)
 
-    return count
+
+def upsert_tle_stream(records: Iterable[Dict], *, chunk_size: Optional[int] = None) -> UpsertResult:
+    """upsert_tles for a record stream (iter_tles over a file or a streamed response): chunk_size records are held
+    in memory at a time, each chunk is upserted in its own transaction. --> returns the summed UpsertResult"""
+
+    chunk_size = chunk_size or int(getattr(settings, "TLE_UPSERT_CHUNK_SIZE", 1000))
+    inserted = updated = unchanged = rejected = 0
+    for chunk in iter_chunks(records, chunk_size):
+        result = upsert_tles(chunk, chunk_size=chunk_size)
+        inserted += result.inserted
+        updated += result.updated
+        unchanged += result.unchanged
+        rejected += result.rejected
+    return UpsertResult(inserted, updated, unchanged, rejected)
 
 class HTTPClient(Protocol):
-    def get(self, url: str) -> HTTPResponse: ...
+    def get(self, url: str, *, headers: Optional[Dict[str, str]] = None) -> HTTPResponse: ...
     def close(self) -> None: ...
 
 
-def fetch_tle_from_celestrak(norad_id: int, *, client: Optional[HTTPClient] = None) -> Tuple[str, str, str]:
+class CelesTrakTLE(NamedTuple):
+    name: str
+    line1: str
+    line2: str
+    # the full download it came from, None when it is the stored TLE (304): its validators are only stored with
+    # record_download(*download) once the TLE is written, or a failed write would be answered 304 next time
+    download: Optional[Download] = None
+
+
+def fetch_tle_from_celestrak(norad_id: int, *, client: Optional[HTTPClient] = None) -> CelesTrakTLE:
 
     """Little helper that grabs the latest TLE from CelesTrak so I don't have to copy-paste it. 
     I hit their REST endpoint, double-check the response actually looks like a TLE, and
-    hand back the name plus the two lines in a tuple."""
+    hand back the name plus the two lines (and the download they came from).
+    The GET is conditional on the validators of the last download (see http_cache.py): on a 304 the stored TLE is
+    handed back without parsing anything."""
 
     url = CELESTRAK_TLE_BY_CATNR.format(norad_id=norad_id)
+    validator = load_validator(url)
     # fetch the TLE data from CelesTrak
     close_client = client is None
     use_client = client or httpx.Client(timeout=15.0, follow_redirects=True)
     try:
-        response = use_client.get(url)
+        started = time.perf_counter()
+        response = use_client.get(url, headers=request_headers(validator))
+        if response.status_code == 304 and validator is not None:
+            tle = TLE.objects.filter(norad_id=norad_id).first()
+            if tle is not None:
+                record_not_modified(validator)
+                return CelesTrakTLE(tle.name, tle.line1, tle.line2)
+            # the row went away since: the validators are no use, download it all again
+            validator = None
+            response = use_client.get(url, headers=request_headers(None))
         response.raise_for_status()
         text = response.text.strip()
         if not text:
@@ -78,30 +209,232 @@ def fetch_tle_from_celestrak(norad_id: int, *, client: Optional[HTTPClient] = No
         recs = parse_tle_catalog(text)
         if not recs:
             raise TLENotFound(f"Unable to parse TLE for {norad_id}")
+        download = Download(
+            url, response.headers, response.num_bytes_downloaded, time.perf_counter() - started, validator is not None
+        )
         rec = recs[0]
-        return rec["name"], rec["line1"], rec["line2"]
+        return CelesTrakTLE(rec["name"], rec["line1"], rec["line2"], download)
     finally:
         if close_client:
             use_client.close()
-    
 
-def get_or_refresh_tle(norad_id: int, max_age_hours: int = 48, *, now: Optional[datetime] = None, client: Optional[HTTPClient] = None) -> Tuple[str, str, str]:
-    """Return a recent TLE for norad_id, fetching from CelesTrak if older than 2 days."""
+
+def _fresh_tle(norad_id: int, max_age_hours: int, now: datetime) -> Optional[TLE]:
     tle = TLE.objects.filter(norad_id=norad_id).first()
+    if tle and tle.updated_at:
+        # if the TLE is recent enough, return it, otherwise fetch a new one
+        age = now - tle.updated_at.replace(tzinfo=timezone.utc)
+        if age < timedelta(hours=max_age_hours):
+            return tle
+    return None
+
+
+REFRESH_POLICIES = ("blocking", "swr")
+
+
+def refresh_policy() -> str:
+    policy = getattr(settings, "TLE_REFRESH_POLICY", "swr")
+    if policy not in REFRESH_POLICIES:
+        raise ValueError(f"Unknown TLE_REFRESH_POLICY {policy!r}, expected one of {REFRESH_POLICIES}")
+    return policy
+
+
+def stale_limit_hours() -> float:
+    """How old a stored TLE may get and still be served while it is refreshed in the background (swr policy)."""
+    return float(getattr(settings, "TLE_STALE_LIMIT_HOURS", 168.0))
+
+
+def get_or_refresh_tle(
+    norad_id: int,
+    max_age_hours: int = 48,
+    *,
+    now: Optional[datetime] = None,
+    client: Optional[HTTPClient] = None,
+    policy: Optional[str] = None,
+) -> Tuple[str, str, str]:
+    """Return a recent TLE for norad_id, fetching from CelesTrak if older than 2 days.
+    With the "swr" policy (stale-while-revalidate, TLE_REFRESH_POLICY) a stale row younger than TLE_STALE_LIMIT_HOURS
+    is returned straight away and refreshed in the background; the request only waits on CelesTrak when there is no
+    usable TLE at all. "blocking" always waits for the refresh.
+    Concurrent refreshes of the same stale TLE are coalesced: inside a worker the other threads wait for the one
+    already fetching (single-flight), across workers a TLERefreshLease row lets only one of them fetch."""
     now = now or datetime.now(timezone.utc)
+    tle = TLE.objects.filter(norad_id=norad_id).first()
     if tle and tle.updated_at:
         # if the TLE is recent enough, return it, otherwise fetch a new one
         age = now - tle.updated_at.replace(tzinfo=timezone.utc)
         if age < timedelta(hours=max_age_hours):
             return tle.name, tle.line1, tle.line2
-        
-    # fetch a new TLE from CelesTrak if its too old
-    name, l1, l2 = fetch_tle_from_celestrak(norad_id, client=client)
-    if tle:
-        tle.name, tle.line1, tle.line2 = name, l1, l2
-        tle.save(update_fields=["name", "line1", "line2", "updated_at"])
-    else:
-        # add it to the db if none existed before
-        TLE.objects.create(norad_id=norad_id, name=name, line1=l1, line2=l2)
-
-    return name, l1, l2
+        if (policy or refresh_policy()) == "swr" and age < timedelta(hours=stale_limit_hours()):
+            # a refresh the negative cache or the open breaker would refuse is not worth a background job
+            if negative_cache.get(norad_id) is None and not celestrak_breaker.is_open():
+                background_refresher.submit(norad_id, max_age_hours)
+            return tle.name, tle.line1, tle.line2
+
+    result, shared = _refresh_flight.do(norad_id, lambda: _refresh_with_lease(norad_id, max_age_hours, now, client))
+    if shared:
+        TLE_FETCHES_COALESCED.labels(scope="process").inc()
+    return result
+
+
+def _refresh_with_lease(norad_id: int, max_age_hours: int, now: datetime, client: Optional[HTTPClient]) -> Tuple[str, str, str]:
+    """Fetch the TLE under the DB lease, or wait for the worker holding it and use what it stored."""
+    _check_negative_cache(norad_id)
+    holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    lease_s = float(getattr(settings, "TLE_REFRESH_LEASE_S", 30.0))
+    deadline = time.monotonic() + lease_s
+    while not _acquire_lease(norad_id, holder, lease_s):
+        if time.monotonic() >= deadline:
+            # the holder is stuck (or its DB writes are not visible to us): do not block the request any longer
+            break
+        time.sleep(float(getattr(settings, "TLE_REFRESH_LEASE_POLL_S", 0.1)))
+        tle = _fresh_tle(norad_id, max_age_hours, now)
+        if tle:
+            TLE_FETCHES_COALESCED.labels(scope="lease").inc()
+            return tle.name, tle.line1, tle.line2
+
+    try:
+        # a worker may have finished its refresh between our first read and taking the lease
+        tle = _fresh_tle(norad_id, max_age_hours, now)
+        if tle:
+            TLE_FETCHES_COALESCED.labels(scope="lease").inc()
+            return tle.name, tle.line1, tle.line2
+
+        # fetch a new TLE from CelesTrak if its too old
+        name, l1, l2, download = _guarded_fetch(norad_id, client)
+        result = upsert_tles([{"norad_id": norad_id, "name": name, "line1": l1, "line2": l2}], touch_unchanged=True)
+        if download is not None:
+            record_download(*download)
+        if result.rejected:
+            # CelesTrak answered with an older element set than the stored one (e.g. imported from a newer dump)
+            tle = TLE.objects.get(norad_id=norad_id)
+            return tle.name, tle.line1, tle.line2
+        return name, l1, l2
+    finally:
+        TLERefreshLease.objects.filter(norad_id=norad_id, holder=holder).delete()
+
+
+def _check_negative_cache(norad_id: int) -> None:
+    """Raise straight away when the last fetch of norad_id failed recently (see upstream.py)."""
+    entry = negative_cache.get(norad_id)
+    if entry is not None:
+        error = TLENotFound if entry.reason == NOT_FOUND else UpstreamUnavailable
+        raise error(f"TLE {norad_id} not fetched again yet (failed {entry.failures}x: {entry.detail})")
+
+
+def _guarded_fetch(norad_id: int, client: Optional[HTTPClient]) -> CelesTrakTLE:
+    """fetch_tle_from_celestrak behind the circuit breaker, recording the outcome in the negative cache."""
+    if not celestrak_breaker.allow():
+        UPSTREAM_CALLS_REJECTED.labels(upstream="celestrak").inc()
+        raise UpstreamUnavailable("CelesTrak circuit breaker is open")
+    try:
+        result = fetch_tle_from_celestrak(norad_id, client=client)
+    except TLENotFound as exc:
+        # CelesTrak answered, it just has nothing for this object (decayed, unknown)
+        celestrak_breaker.record_success()
+        negative_cache.record(norad_id, NOT_FOUND, str(exc))
+        TLE_FETCHES.labels(outcome="not_found").inc()
+        raise
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code == 404:
+            celestrak_breaker.record_success()
+            negative_cache.record(norad_id, NOT_FOUND, str(exc))
+            TLE_FETCHES.labels(outcome="not_found").inc()
+            raise TLENotFound(f"No TLE returned for {norad_id}") from exc
+        _record_upstream_error(norad_id, exc)
+        raise UpstreamUnavailable(f"CelesTrak answered {exc.response.status_code} for {norad_id}") from exc
+    except httpx.HTTPError as exc:
+        _record_upstream_error(norad_id, exc)
+        raise UpstreamUnavailable(f"CelesTrak unreachable for {norad_id}: {exc}") from exc
+    except Exception:
+        # anything else (a DB error around the validators...) says nothing about CelesTrak, but a half-open breaker
+        # must not keep its trial claimed and refuse every later call
+        celestrak_breaker.release()
+        raise
+    celestrak_breaker.record_success()
+    negative_cache.forget(norad_id)
+    TLE_FETCHES.labels(outcome="ok").inc()
+    return result
+
+
+def _record_upstream_error(norad_id: int, exc: Exception) -> None:
+    celestrak_breaker.record_failure()
+    negative_cache.record(norad_id, UPSTREAM_ERROR, f"{type(exc).__name__}: {exc}")
+    TLE_FETCHES.labels(outcome="error").inc()
+
+
+def _acquire_lease(norad_id: int, holder: str, lease_s: float) -> bool:
+    """Take the refresh lease of norad_id if nobody holds it, or if the holder let it expire."""
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=lease_s)
+    try:
+        with transaction.atomic():
+            TLERefreshLease.objects.create(norad_id=norad_id, holder=holder, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        # held: only an expired lease can be taken over, and the conditional UPDATE lets a single worker do it
+        return TLERefreshLease.objects.filter(norad_id=norad_id, expires_at__lte=now).update(
+            holder=holder, expires_at=expires_at
+        ) == 1
+
+
+_refresh_flight: SingleFlight[Tuple[str, str, str]] = SingleFlight()
+
+
+class BackgroundRefresher:
+    """
+    Small thread pool running the refreshes queued by the swr policy. A NORAD ID is queued at most once at a time
+    (every request for a popular stale TLE would queue it otherwise), and the refresh itself still goes through the
+    single-flight and the DB lease, so the other workers do not fetch it too.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, norad_id: int, max_age_hours: int) -> bool:
+        """Queue a refresh of norad_id. --> returns False if one is already queued or running"""
+        with self._lock:
+            if norad_id in self._pending:
+                return False
+            self._pending.add(norad_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tle-swr")
+            self._executor.submit(self._run, norad_id, max_age_hours)
+        TLE_BACKGROUND_REFRESHES.labels(outcome="queued").inc()
+        return True
+
+    def _run(self, norad_id: int, max_age_hours: int) -> None:
+        try:
+            _refresh_flight.do(
+                norad_id,
+                lambda: _refresh_with_lease(norad_id, max_age_hours, datetime.now(timezone.utc), None),
+            )
+            TLE_BACKGROUND_REFRESHES.labels(outcome="ok").inc()
+        except TLENotFound as exc:
+            # expected: CelesTrak has nothing for it, failed (negative cache), or is avoided (open breaker)
+            TLE_BACKGROUND_REFRESHES.labels(outcome="error").inc()
+            logger.info("Background refresh of TLE %s skipped: %s", norad_id, exc)
+        except Exception:  # the stale row keeps being served, the next request queues another try
+            TLE_BACKGROUND_REFRESHES.labels(outcome="error").inc()
+            logger.warning("Background refresh of TLE %s failed", norad_id, exc_info=True)
+        finally:
+            with self._lock:
+                self._pending.discard(norad_id)
+            # pool threads outlive the request cycle, so Django never closes their connection for them
+            connection.close()
+
+    def pending(self) -> Set[int]:
+        with self._lock:
+            return set(self._pending)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+background_refresher = BackgroundRefresher(workers=int(getattr(settings, "TLE_BACKGROUND_REFRESH_WORKERS", 2)))
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import TruncDate
+
+from satellites.models import TLE, TLEHistory
+
+"""
+TLE history: every element set upsert_tles stores (or rejects as older than the stored one, which is how historical
+dumps end up here) is appended to TLEHistory, one row per (norad_id, epoch). tle_at picks the element set whose
+epoch is closest to an instant, so propagating the past uses the TLE of the time instead of today's.
+compact_history keeps the table in check: past TLE_HISTORY_COMPACT_AFTER_DAYS only the last element set of each day
+is kept, past TLE_HISTORY_RETENTION_DAYS (0: never) nothing is.
+"""
+
+
+class HistoricalTLE(NamedTuple):
+    name: str
+    line1: str
+    line2: str
+    epoch: Optional[datetime]
+    source: str  # "history", or "current" when the history has nothing for the satellite
+
+
+def record_history(entries: Iterable[Tuple[int, datetime, str, str, str]], *, batch_size: int = 1000) -> None:
+    """Append (norad_id, epoch, name, line1, line2) element sets; the ones already recorded are skipped."""
+    TLEHistory.objects.bulk_create(
+        [
+            TLEHistory(norad_id=norad_id, epoch=epoch, name=name, line1=line1, line2=line2)
+            for norad_id, epoch, name, line1, line2 in entries
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+# the last element set at or before the instant and the first one after it, in one statement: each side is a
+# single seek on the (norad_id, epoch) index
+_CLOSEST_SQL = """
+SELECT * FROM (
+    SELECT id, norad_id, epoch, name, line1, line2, recorded_at FROM {table}
+    WHERE norad_id = %s AND epoch <= %s ORDER BY epoch DESC LIMIT 1
+) AS before_t
+UNION ALL
+SELECT * FROM (
+    SELECT id, norad_id, epoch, name, line1, line2, recorded_at FROM {table}
+    WHERE norad_id = %s AND epoch > %s ORDER BY epoch ASC LIMIT 1
+) AS after_t
+"""
+
+
+def tle_at(norad_id: int, when: datetime) -> HistoricalTLE:
+    """The element set of norad_id with the epoch closest to when (the current TLE if it has no history).
+    Raises TLE.DoesNotExist when the satellite is unknown."""
+    sql = _CLOSEST_SQL.format(table=connection.ops.quote_name(TLEHistory._meta.db_table))
+    at = connection.ops.adapt_datetimefield_value(when)  # what the ORM would send for this column
+    candidates = list(TLEHistory.objects.raw(sql, [norad_id, at, norad_id, at]))
+    if candidates:
+        best = min(candidates, key=lambda row: abs(row.epoch - when))
+        return HistoricalTLE(best.name, best.line1, best.line2, best.epoch, "history")
+    tle = TLE.objects.get(pk=norad_id)
+    return HistoricalTLE(tle.name, tle.line1, tle.line2, tle.epoch, "current")
+
+
+def compact_history(
+    *,
+    now: Optional[datetime] = None,
+    compact_after_days: Optional[float] = None,
+    retention_days: Optional[float] = None,
+) -> Tuple[int, int]:
+    """Thin out and expire old history. --> returns (rows expired, rows compacted away)"""
+    now = now or datetime.now(timezone.utc)
+    if compact_after_days is None:
+        compact_after_days = float(getattr(settings, "TLE_HISTORY_COMPACT_AFTER_DAYS", 30))
+    if retention_days is None:
+        retention_days = float(getattr(settings, "TLE_HISTORY_RETENTION_DAYS", 0))
+
+    expired = 0
+    if retention_days > 0:
+        expired, _ = TLEHistory.objects.filter(epoch__lt=now - timedelta(days=retention_days)).delete()
+
+    compacted = 0
+    if compact_after_days > 0:
+        # a row is dropped when a later element set of the same satellite exists on the same (UTC) day
+        old = TLEHistory.objects.filter(epoch__lt=now - timedelta(days=compact_after_days)).annotate(day=TruncDate("epoch"))
+        later_same_day = TLEHistory.objects.annotate(day=TruncDate("epoch")).filter(
+            norad_id=OuterRef("norad_id"), day=OuterRef("day"), epoch__gt=OuterRef("epoch")
+        )
+        superseded = old.filter(Exists(later_same_day)).values("pk")
+        compacted, _ = TLEHistory.objects.filter(pk__in=superseded).delete()
+    return expired, compacted
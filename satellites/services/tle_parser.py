@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import gzip
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from satellites.tle_format import tle_content_hash, tle_epoch  # re-exported, the services take them from here
+
+"""
+Streaming TLE parser: turns any iterable of lines (str or bytes: a streamed HTTP response, an open file, a gzip
+dump...) into TLE records one at a time, so a multi-GB historical dump is never held in memory.
+Both 2LE (line 1 + line 2) and 3LE (title + line 1 + line 2, with or without the "0 " prefix) are understood, in
+the same stream even. The parser keys on the line numbers instead of counting lines in groups of three, so a
+broken or missing line only loses its own record and the next "1 " line resynchronizes it.
+"""
+
+Line = Union[str, bytes]
+
+TLE_LINE_LENGTH = 69
+
+
+class ParseStats:
+    """Counters filled in by iter_tles while it runs (records yielded, lines/records thrown away)."""
+
+    __slots__ = ("records", "skipped")
+
+    def __init__(self):
+        self.records = 0
+        self.skipped = 0
+
+
+# byte value -> checksum weight: digits count for themselves, "-" for 1, everything else for 0
+_CHECKSUM_WEIGHTS = bytes(
+    (byte - 48) if 48 <= byte <= 57 else 1 if byte == 45 else 0 for byte in range(256)
+)
+
+
+def tle_checksum(line: str) -> int:
+    """Modulo-10 checksum of a TLE line: the sum of its digits, minus signs counting as 1."""
+    return sum(line[:TLE_LINE_LENGTH - 1].encode("latin-1", "replace").translate(_CHECKSUM_WEIGHTS)) % 10
+
+
+def catalog_number(field: str) -> int:
+    """NORAD ID from columns 3-7, including the Alpha-5 form (A0000 = 100000, I and O are not used)."""
+    field = field.strip()
+    if field[:1].isalpha():
+        letter = field[0].upper()
+        if letter in "IO":
+            raise ValueError(f"Invalid Alpha-5 catalog number {field!r}")
+        index = ord(letter) - ord("A") + 10 - (letter > "I") - (letter > "O")
+        return index * 10000 + int(field[1:])
+    return int(field)
+
+
+def _is_tle_line(line: str, number: str, verify_checksums: bool) -> bool:
+    if not line.startswith(number + " "):
+        return False
+    if not verify_checksums:
+        return len(line) >= 7
+    return len(line) >= TLE_LINE_LENGTH and line[TLE_LINE_LENGTH - 1].isdigit() and (
+        tle_checksum(line) == int(line[TLE_LINE_LENGTH - 1])
+    )
+
+
+def iter_tles(
+    lines: Iterable[Line],
+    *,
+    verify_checksums: bool = True,
+    stats: Optional[ParseStats] = None,
+) -> Iterator[Dict]:
+    """
+    Yield {"norad_id", "name", "line1", "line2"} for every valid TLE in lines (name is "" for 2LE input).
+    A record is only yielded when line 1 and line 2 follow each other, pass their checksums (verify_checksums) and
+    carry the same catalog number; anything else is counted in stats.skipped and parsing picks up at the next line.
+    """
+    stats = stats if stats is not None else ParseStats()
+    title: Optional[str] = None
+    line1: Optional[str] = None
+    line1_title: Optional[str] = None
+
+    for raw in lines:
+        line = (raw.decode("latin-1") if isinstance(raw, bytes) else raw).strip()
+        if not line:
+            continue
+
+        if line.startswith("1 ") and (len(line) >= TLE_LINE_LENGTH or not verify_checksums):
+            if line1 is not None:  # the previous line 1 never got its line 2
+                stats.skipped += 1
+            if _is_tle_line(line, "1", verify_checksums):
+                line1, line1_title = line, title
+            else:
+                line1 = None
+                stats.skipped += 1
+            title = None
+            continue
+
+        if line.startswith("2 ") and (len(line) >= TLE_LINE_LENGTH or not verify_checksums):
+            first, line1 = line1, None
+            name, title = line1_title or "", None
+            if first is None or not _is_tle_line(line, "2", verify_checksums) or first[2:7] != line[2:7]:
+                stats.skipped += 1
+                continue
+            try:
+                norad_id = catalog_number(first[2:7])
+            except ValueError:
+                stats.skipped += 1
+                continue
+            stats.records += 1
+            yield {"norad_id": norad_id, "name": name, "line1": first, "line2": line}
+            continue
+
+        # a title line (3LE), or garbage; either way a pending line 1 lost its line 2
+        if line1 is not None:
+            stats.skipped += 1
+            line1 = None
+        title = line[2:].strip() if line.startswith("0 ") else line
+
+    if line1 is not None:
+        stats.skipped += 1
+
+
+def iter_chunks(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Group a record stream into lists of at most size records (what upsert_tles takes in one go)."""
+    chunk: List[Dict] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@contextmanager
+def open_tle_file(path) -> Iterator[Iterator[bytes]]:
+    """Open a TLE file for iter_tles, gunzipping it on the fly when it starts with the gzip magic bytes."""
+    with open(path, "rb") as handle:
+        if handle.peek(2)[:2] == b"\x1f\x8b":
+            with gzip.GzipFile(fileobj=handle) as unzipped:
+                yield iter(unzipped)
+        else:
+            yield iter(handle)
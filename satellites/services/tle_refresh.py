@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import httpx
+from django.conf import settings
+
+from satellites.metrics import UPSTREAM_CALLS_REJECTED
+from satellites.models import TLE
+from satellites.services.tle_fetcher import (
+    CELESTRAK_TLE_BY_CATNR,
+    UpsertResult,
+    parse_tle_catalog,
+    refresh_policy,
+    stale_limit_hours,
+    upsert_tles,
+)
+from satellites.services.upstream import NOT_FOUND, UPSTREAM_ERROR, celestrak_breaker, negative_cache
+
+logger = logging.getLogger(__name__)
+
+"""
+Concurrent TLE refresh: fetch many NORAD IDs from CelesTrak at once and upsert them in one batch.
+The requests go through one httpx.AsyncClient with keep-alive, so after the first request to a host the others reuse
+its connections, and the number of requests in flight is bounded overall (TLE_REFRESH_CONCURRENCY) and per host
+(TLE_REFRESH_PER_HOST). The client lives on an event loop in a daemon thread of its own, so it survives across
+calls (and requests) from the sync Django code, which just waits for the batch to finish.
+"""
+
+
+class RefreshResult(NamedTuple):
+    records: List[Dict]  # the fetched TLE records, one per refreshed NORAD ID
+    failed: Dict[int, str]  # NORAD ID -> message saying why it could not be refreshed
+    upserted: Optional[UpsertResult]  # None when nothing was fetched
+
+
+class TLERefresher:
+    """
+    Owns the event loop thread and the pooled AsyncClient. A transport can be injected (httpx.MockTransport in the
+    tests); everything else comes from the settings.
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: Optional[int] = None,
+        per_host: Optional[int] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.concurrency = concurrency or int(getattr(settings, "TLE_REFRESH_CONCURRENCY", 16))
+        self.per_host = per_host or int(getattr(settings, "TLE_REFRESH_PER_HOST", 8))
+        self.timeout = timeout or float(getattr(settings, "TLE_REFRESH_TIMEOUT_S", 15.0))
+        self._transport = transport
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="tle-refresher", daemon=True)
+                self._thread.start()
+                self._client = None
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # only called on the loop thread, the client is bound to that loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                    keepalive_expiry=60.0,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def fetch_many(self, norad_ids: Iterable[int]) -> Tuple[List[Dict], Dict[int, Tuple[str, str]]]:
+        """Fetch every NORAD ID concurrently. Never raises for a single ID.
+
+        --> returns (records, failures): failures maps a NORAD ID to (reason, message), reason being NOT_FOUND or
+        UPSTREAM_ERROR; refresh() keeps only the message in RefreshResult.failed"""
+        client = self._get_client()
+        in_flight = asyncio.Semaphore(self.concurrency)
+        per_host: Dict[str, asyncio.Semaphore] = {}
+
+        # (norad_id, record, reason, message): record on success, reason and message on failure
+        async def fetch_one(norad_id: int) -> Tuple[int, Optional[Dict], Optional[str], Optional[str]]:
+            url = CELESTRAK_TLE_BY_CATNR.format(norad_id=norad_id)
+            host = per_host.setdefault(httpx.URL(url).host, asyncio.Semaphore(self.per_host))
+            async with in_flight, host:
+                try:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                except httpx.HTTPStatusError as exc:
+                    reason = NOT_FOUND if exc.response.status_code == 404 else UPSTREAM_ERROR
+                    return norad_id, None, reason, f"{type(exc).__name__}: {exc}"
+                except httpx.HTTPError as exc:
+                    return norad_id, None, UPSTREAM_ERROR, f"{type(exc).__name__}: {exc}"
+            records = [record for record in parse_tle_catalog(response.text) if record["norad_id"] == norad_id]
+            if not records:
+                return norad_id, None, NOT_FOUND, f"No TLE returned for {norad_id}"
+            return norad_id, records[0], None, None
+
+        results = await asyncio.gather(*(fetch_one(norad_id) for norad_id in dict.fromkeys(norad_ids)))
+        records = [record for _, record, _, _ in results if record is not None]
+        failed = {norad_id: (reason, error) for norad_id, _, reason, error in results if error is not None}
+        return records, failed
+
+    def refresh(self, norad_ids: Iterable[int]) -> RefreshResult:
+        """Fetch the NORAD IDs concurrently, then upsert whatever came back in one batch (from the calling thread)."""
+        failed: Dict[int, str] = {}
+        to_fetch = []
+        for norad_id in dict.fromkeys(norad_ids):
+            entry = negative_cache.get(norad_id)
+            if entry is not None:
+                failed[norad_id] = f"not fetched again yet (failed {entry.failures}x: {entry.detail})"
+            else:
+                to_fetch.append(norad_id)
+        if not to_fetch:
+            return RefreshResult([], failed, None)
+        # the whole batch is one call as far as the breaker is concerned (and the trial one when half-open)
+        if not celestrak_breaker.allow():
+            UPSTREAM_CALLS_REJECTED.labels(upstream="celestrak").inc()
+            failed.update({norad_id: "CelesTrak circuit breaker is open" for norad_id in to_fetch})
+            return RefreshResult([], failed, None)
+
+        try:
+            future = asyncio.run_coroutine_threadsafe(self.fetch_many(to_fetch), self._ensure_loop())
+            records, fetch_failures = future.result()
+        except Exception:
+            # not an upstream answer: release a half-open trial without counting it either way
+            celestrak_breaker.release()
+            raise
+
+        upstream_errors = 0
+        for norad_id, (reason, error) in fetch_failures.items():
+            logger.warning("TLE refresh of %s failed: %s", norad_id, error)
+            negative_cache.record(norad_id, reason, error)
+            failed[norad_id] = error
+            upstream_errors += reason == UPSTREAM_ERROR
+        for record in records:
+            negative_cache.forget(record["norad_id"])
+        if upstream_errors and not records:
+            # nothing came back and it is CelesTrak's fault: count the batch against the breaker
+            celestrak_breaker.record_failure()
+        else:
+            celestrak_breaker.record_success()
+        # these IDs were just checked against CelesTrak: unchanged ones count as fresh again
+        return RefreshResult(records, failed, upsert_tles(records, touch_unchanged=True) if records else None)
+
+    def close(self) -> None:
+        """Close the client's connections and stop the loop thread."""
+        with self._lock:
+            loop, thread, client = self._loop, self._thread, self._client
+            self._loop = self._thread = self._client = None
+        if loop is None:
+            return
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join()
+        loop.close()
+
+
+# one shared refresher per process (each gunicorn worker gets its own pool of connections)
+tle_refresher = TLERefresher()
+
+
+def stale_norad_ids(norad_ids: Iterable[int], *, max_age_hours: float = 48, now: Optional[datetime] = None) -> List[int]:
+    """The NORAD IDs among norad_ids with no TLE row, or one older than max_age_hours (same rule as get_or_refresh_tle)."""
+    norad_ids = list(dict.fromkeys(norad_ids))
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=max_age_hours)
+    fresh = set(
+        TLE.objects.filter(norad_id__in=norad_ids, updated_at__gt=cutoff).values_list("norad_id", flat=True)
+    )
+    return [norad_id for norad_id in norad_ids if norad_id not in fresh]
+
+
+def refresh_stale_tles(norad_ids: Iterable[int], *, max_age_hours: int = 48) -> RefreshResult:
+    """Refresh, in one concurrent batch, the TLEs of norad_ids that get_or_refresh_tle would otherwise fetch one by one.
+    With the swr policy that is only the ones with no usable TLE (missing or past TLE_STALE_LIMIT_HOURS), the merely
+    stale ones are served as they are and refreshed in the background by get_or_refresh_tle."""
+    if refresh_policy() == "swr":
+        max_age_hours = max(max_age_hours, stale_limit_hours())
+    return tle_refresher.refresh(stale_norad_ids(norad_ids, max_age_hours=max_age_hours))
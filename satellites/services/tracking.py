@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
 from satellites.models import Favorite, TLE
 from satellites.services.catalog import catalog_label
-from satellites.services.propagation import propagate_now
+from satellites.services.passes import Observer, predict_passes_many
+from satellites.services.propagation import propagate_now, propagate_track
+from satellites.services.satrec_cache import satrec_cache
 from satellites.services.tle_fetcher import TLENotFound, get_or_refresh_tle
+from satellites.services.tle_history import tle_at
+from satellites.services.tle_parser import tle_epoch
+from satellites.services.tle_refresh import refresh_stale_tles
 
 
 def _resolve_tle_data(tle: TLE, max_age_hours: int = 48) -> Tuple[str, str, str]:
@@ -36,7 +41,7 @@ def satellite_detail_payload(tle: TLE, *, max_age_hours: int = 48) -> Dict[str,
     name, line1, line2 = _resolve_tle_data(tle, max_age_hours=max_age_hours)
     clean_name = (name or "").strip()
     try:
-        stats = propagate_now(line1, line2)
+        stats = propagate_now(line1, line2, norad_id=tle.norad_id)
         error_message = None
     except ValueError as exc:
         stats = None
@@ -54,23 +59,165 @@ def satellite_detail_payload(tle: TLE, *, max_age_hours: int = 48) -> Dict[str,
     return payload
 
 
-def satellite_position_payload(norad_id: int, *, max_age_hours: int = 48) -> Dict[str, object]:
-    """Return the API payload for a single satellite position."""
+def _tle_for(norad_id: int, at: Optional[datetime], max_age_hours: int) -> Tuple[str, str, str, Optional[datetime]]:
+    """(name, line1, line2, epoch): the current TLE, or with at the historical one whose epoch is closest to it."""
+    if at is not None:
+        historical = tle_at(norad_id, at)
+        return (historical.name or "").strip(), historical.line1, historical.line2, historical.epoch
     tle = TLE.objects.get(pk=norad_id)
     name, line1, line2 = _resolve_tle_data(tle, max_age_hours=max_age_hours)
-    pos = propagate_now(line1, line2)
-    return {"norad_id": norad_id, "name": name, **pos}
+    return name, line1, line2, tle_epoch(line1)
+
+
+def satellite_position_payload(
+    norad_id: int, *, at: Optional[datetime] = None, max_age_hours: int = 48
+) -> Dict[str, object]:
+    """Return the API payload for a single satellite position, now or at a past instant."""
+    name, line1, line2, epoch = _tle_for(norad_id, at, max_age_hours)
+    if at is None:
+        pos = propagate_now(line1, line2, norad_id=norad_id)
+    else:
+        # historical lines are not the ones satrec_cache and the ephemeris hold for this NORAD ID
+        pos = propagate_now(line1, line2, timestamp=at)
+    return {"norad_id": norad_id, "name": name, **pos, "tle_epoch": epoch.isoformat() if epoch else None}
+
+
+def satellite_track_payload(
+    norad_id: int,
+    *,
+    start: datetime,
+    end: datetime,
+    step_seconds: float,
+    at: Optional[datetime] = None,
+    max_age_hours: int = 48,
+) -> Dict[str, object]:
+    """Return the API payload for a satellite's ground track between start and end.
+    With at, the track is propagated from the historical TLE whose epoch is closest to that instant."""
+    name, line1, line2, epoch = _tle_for(norad_id, at, max_age_hours)
+    track = propagate_track(
+        line1, line2, start=start, end=end, step_seconds=step_seconds, norad_id=norad_id if at is None else None
+    )
+
+    points: List[Dict[str, object]] = []
+    rows = zip(
+        track["offsets_s"].tolist(),
+        track["lat"].tolist(),
+        track["lon"].tolist(),
+        track["alt_km"].tolist(),
+        track["error"].tolist(),
+    )
+    for offset, lat, lon, alt_km, err in rows:
+        # instants where SGP4 gave up (decayed etc.) are simply left out of the track
+        if err != 0:
+            continue
+        points.append({
+            "timestamp": (start + timedelta(seconds=offset)).isoformat(),
+            "lat": lat,
+            "lon": lon,
+            "alt_km": alt_km,
+        })
+
+    return {
+        "norad_id": norad_id,
+        "name": name,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "step_seconds": step_seconds,
+        "tle_epoch": epoch.isoformat() if epoch else None,
+        "points": points,
+    }
+
+
+def _favorite_tles(favorites, max_age_hours: int):
+    """
+    Refresh the stale TLEs of a favorites list in one concurrent batch (tle_refresh.py) instead of one blocking
+    CelesTrak call per favorite, then hand out a lookup for the loop. Favorites whose refresh failed fall back to
+    the stored TLE, or raise TLENotFound when there is none, rather than being fetched again one by one.
+    """
+    failed = refresh_stale_tles([fav.norad_id for fav in favorites], max_age_hours=max_age_hours).failed
+    stored = {tle.norad_id: tle for tle in TLE.objects.filter(norad_id__in=list(failed))}
+
+    def lookup(norad_id: int) -> Tuple[str, str, str]:
+        if norad_id not in failed:
+            return get_or_refresh_tle(norad_id, max_age_hours=max_age_hours)
+        tle = stored.get(norad_id)
+        if tle is None:
+            raise TLENotFound(f"TLE {norad_id} could not be refreshed: {failed[norad_id]}")
+        return (tle.name or "").strip(), tle.line1, tle.line2
+
+    return lookup
 
 
 def favorite_positions_for_user(user, *, max_age_hours: int = 48) -> List[Dict[str, object]]:
     """Return current positions for the authenticated user's favorites."""
-    favorites = Favorite.objects.filter(user=user).only("norad_id", "name")
+    favorites = list(Favorite.objects.filter(user=user).only("norad_id", "name"))
+    tles = _favorite_tles(favorites, max_age_hours)
     results: List[Dict[str, object]] = []
     for fav in favorites:
         try:
-            name, line1, line2 = get_or_refresh_tle(fav.norad_id, max_age_hours=max_age_hours)
-            stats = propagate_now(line1, line2)
+            name, line1, line2 = tles(fav.norad_id)
+            stats = propagate_now(line1, line2, norad_id=fav.norad_id)
         except (TLENotFound, ValueError):
             continue
         results.append({"norad_id": fav.norad_id, "name": name, **stats})
     return results
+
+
+def _observer_payload(observer: Observer) -> Dict[str, float]:
+    return {"lat": observer.lat, "lon": observer.lon, "alt_km": observer.alt_km}
+
+
+def satellite_passes_payload(
+    norad_id: int,
+    observer: Observer,
+    *,
+    days: float = 1.0,
+    min_el: float = 0.0,
+    max_age_hours: int = 48,
+) -> Dict[str, object]:
+    """Return the API payload with the upcoming passes of one satellite over an observer."""
+    tle = TLE.objects.get(pk=norad_id)
+    name, line1, line2 = _resolve_tle_data(tle, max_age_hours=max_age_hours)
+    sat = satrec_cache.get(norad_id, line1, line2)
+    passes = predict_passes_many([sat], observer, days=days, min_el=min_el)[0]
+    return {
+        "norad_id": norad_id,
+        "name": name,
+        "observer": _observer_payload(observer),
+        "days": days,
+        "min_elevation": min_el,
+        "passes": passes,
+    }
+
+
+def favorite_passes_for_user(
+    user,
+    observer: Observer,
+    *,
+    days: float = 1.0,
+    min_el: float = 0.0,
+    max_age_hours: int = 48,
+) -> Dict[str, object]:
+    """Return upcoming passes over an observer for every favorite of the user, predicted in one batch."""
+    favorites = list(Favorite.objects.filter(user=user).only("norad_id", "name"))
+    tles = _favorite_tles(favorites, max_age_hours)
+    entries: List[Tuple[int, str]] = []
+    sats = []
+    for fav in favorites:
+        try:
+            name, line1, line2 = tles(fav.norad_id)
+        except TLENotFound:
+            continue
+        entries.append((fav.norad_id, name))
+        sats.append(satrec_cache.get(fav.norad_id, line1, line2))
+
+    all_passes = predict_passes_many(sats, observer, days=days, min_el=min_el) if sats else []
+    return {
+        "observer": _observer_payload(observer),
+        "days": days,
+        "min_elevation": min_el,
+        "satellites": [
+            {"norad_id": norad_id, "name": name, "passes": passes}
+            for (norad_id, name), passes in zip(entries, all_passes)
+        ],
+    }
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional
+
+from django.conf import settings
+
+from satellites.metrics import CELESTRAK_BREAKER_STATE, CELESTRAK_BREAKER_TRANSITIONS, TLE_NEGATIVE_CACHE
+
+"""
+Protection of the request path against a CelesTrak that has nothing for us, or is down.
+NegativeCache remembers per NORAD ID that the last fetch found nothing (decayed/unknown object) or failed
+(5xx/timeout), and for how long not to ask again; the delay doubles with every new failure up to a cap.
+CircuitBreaker counts consecutive upstream failures over every NORAD ID: past a threshold it opens and every call
+is refused for a cooldown, then one trial call is let through (half-open) to decide whether to close it again.
+Both are per process, like the satrec/ephemeris caches.
+"""
+
+NOT_FOUND = "not_found"
+UPSTREAM_ERROR = "upstream_error"
+
+
+class NegativeEntry(NamedTuple):
+    reason: str  # NOT_FOUND or UPSTREAM_ERROR
+    failures: int  # consecutive failures of this kind
+    retry_at: float  # clock() value before which the ID is not fetched again
+    detail: str
+
+
+class NegativeCache:
+    def __init__(self, maxsize: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: "OrderedDict[int, NegativeEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ttl(reason: str, failures: int) -> float:
+        if reason == NOT_FOUND:
+            base = float(getattr(settings, "TLE_NOT_FOUND_TTL_S", 3600.0))
+            cap = float(getattr(settings, "TLE_NOT_FOUND_MAX_TTL_S", 86400.0))
+        else:
+            base = float(getattr(settings, "TLE_UPSTREAM_ERROR_TTL_S", 60.0))
+            cap = float(getattr(settings, "TLE_UPSTREAM_ERROR_MAX_TTL_S", 3600.0))
+        return min(base * 2 ** (failures - 1), cap)
+
+    def get(self, norad_id: int) -> Optional[NegativeEntry]:
+        """The entry of norad_id while it still forbids a fetch, else None."""
+        with self._lock:
+            entry = self._entries.get(norad_id)
+            if entry is None or entry.retry_at <= self.clock():
+                return None
+        TLE_NEGATIVE_CACHE.labels(event="hit", reason=entry.reason).inc()
+        return entry
+
+    def record(self, norad_id: int, reason: str, detail: str = "") -> NegativeEntry:
+        """Remember a failed fetch; a repeat of the same kind of failure doubles the delay."""
+        with self._lock:
+            previous = self._entries.pop(norad_id, None)
+            failures = previous.failures + 1 if previous is not None and previous.reason == reason else 1
+            entry = NegativeEntry(reason, failures, self.clock() + self._ttl(reason, failures), detail)
+            self._entries[norad_id] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        TLE_NEGATIVE_CACHE.labels(event="stored", reason=reason).inc()
+        return entry
+
+    def forget(self, norad_id: int) -> None:
+        with self._lock:
+            self._entries.pop(norad_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        threshold: Optional[int] = None,
+        cooldown_s: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.threshold = threshold or int(getattr(settings, "CELESTRAK_BREAKER_THRESHOLD", 5))
+        self.cooldown_s = cooldown_s or float(getattr(settings, "CELESTRAK_BREAKER_COOLDOWN_S", 60.0))
+        self.clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        CELESTRAK_BREAKER_STATE.labels(upstream=name).set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.cooldown_s:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """May a call go out now? In half-open state only one trial call is let through at a time."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self.clock() - self._opened_at < self.cooldown_s:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def is_open(self) -> bool:
+        """Would allow() refuse a call right now? Unlike allow(), this never claims the half-open trial."""
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at < self.cooldown_s:
+                return True
+            return self._state != self.CLOSED and self._trial_running
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.threshold):
+                self._opened_at = self.clock()
+                self._set_state(self.OPEN)
+
+    def release(self) -> None:
+        """Give back a claimed half-open trial without counting the call either way (it failed for a reason that
+        says nothing about the upstream)."""
+        with self._lock:
+            self._trial_running = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._set_state(self.CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        CELESTRAK_BREAKER_STATE.labels(upstream=self.name).set({self.CLOSED: 0, self.OPEN: 1, self.HALF_OPEN: 2}[state])
+        CELESTRAK_BREAKER_TRANSITIONS.labels(upstream=self.name, state=state).inc()
+
+    def stats(self) -> Dict[str, object]:
+        return {"state": self.state, "failures": self._failures}
+
+
+# one of each per process
+negative_cache = NegativeCache(maxsize=int(getattr(settings, "TLE_NEGATIVE_CACHE_SIZE", 10000)))
+celestrak_breaker = CircuitBreaker("celestrak")
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from satellites.services.geodesy import geodetic_to_ecef, look_angles
+from satellites.services.passes import Observer
+from satellites.services.snapshot import (
+    PositionSnapshot,
+    compute_positions,
+    get_snapshot,
+    snapshot_derived,
+    snapshot_ecef,
+    snapshot_rows,
+)
+from satellites.services.spatial import LatLonGrid
+
+
+def _local_up(observer: Observer) -> np.ndarray:
+    """Unit normal of the ellipsoid at the observer (the 'up' axis of its East-North-Up frame)."""
+    lat = math.radians(observer.lat)
+    lon = math.radians(observer.lon)
+    return np.array([math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)])
+
+
+def visible_satellites(snapshot: PositionSnapshot, observer: Observer, *, min_el: float = 0.0):
+    """
+    Every satellite of the snapshot at or above min_el degrees for the observer.
+    A satellite can only be above the horizon if it is on the sky side of the observer's horizon plane, which is a
+    single dot product per row, so the exact look angles (arcsin/arctan2) only run on the ~half of the catalog
+    (much less for LEO) that survives that test.
+
+    --> returns (row indices into snapshot.data, azimuth_deg, elevation_deg, range_km), sorted by elevation desc
+    """
+    ecef = snapshot_ecef(snapshot)
+    if min_el >= 0.0:
+        up = _local_up(observer)
+        origin = geodetic_to_ecef(observer.lat, observer.lon, observer.alt_km)
+        rows = np.flatnonzero(ecef @ up >= float(origin @ up))
+    else:
+        rows = np.arange(len(ecef))
+
+    az, el, rng = look_angles(ecef[rows], observer.lat, observer.lon, observer.alt_km)
+    keep = el >= min_el
+    rows, az, el, rng = rows[keep], az[keep], el[keep], rng[keep]
+    order = np.argsort(-el, kind="stable")
+    return rows[order], az[order], el[order], rng[order]
+
+
+def overhead_payload(observer: Observer, *, min_el: float = 0.0) -> Dict[str, object]:
+    """Return the API payload of every satellite above the observer, using the shared position snapshot."""
+    snapshot = get_snapshot()
+    rows, az, el, rng = visible_satellites(snapshot, observer, min_el=min_el)
+    data = snapshot.data[rows]
+    names = [raw.decode("utf-8", errors="ignore") for raw in data["name"].tolist()]
+
+    satellites: List[Dict[str, object]] = [
+        {
+            "norad_id": norad_id,
+            "name": name,
+            "azimuth": azimuth,
+            "elevation": elevation,
+            "range_km": range_km,
+            "alt_km": alt_km,
+        }
+        for norad_id, name, azimuth, elevation, range_km, alt_km in zip(
+            data["norad_id"].tolist(), names, az.tolist(), el.tolist(), rng.tolist(), data["alt_km"].tolist()
+        )
+    ]
+    return {
+        "observer": {"lat": observer.lat, "lon": observer.lon, "alt_km": observer.alt_km},
+        "min_elevation": min_el,
+        "timestamp": snapshot.timestamp.isoformat(),
+        "generation": snapshot.generation,
+        "count": len(satellites),
+        "satellites": satellites,
+    }
+
+
+def _latlon_grid(snapshot: PositionSnapshot) -> LatLonGrid:
+    return snapshot_derived(snapshot, "latlon_grid", lambda snap: LatLonGrid(snap.data["lat"], snap.data["lon"]))
+
+
+def bbox_payload(
+    min_lat: float,
+    max_lat: float,
+    min_lon: float,
+    max_lon: float,
+    *,
+    timestamp: Optional[datetime] = None,
+) -> Dict[str, object]:
+    """
+    Return the satellites whose sub-satellite point is inside the box (min_lon > max_lon crosses the antimeridian).
+    Without a timestamp the shared snapshot is used and its lat/lon grid is built once per generation; with one
+    the catalog is propagated to that instant and indexed for this request only.
+    """
+    if timestamp is None:
+        snapshot = get_snapshot()
+        data, grid = snapshot.data, _latlon_grid(snapshot)
+        stamp, generation = snapshot.timestamp, snapshot.generation
+    else:
+        stamp, data = compute_positions(timestamp)
+        grid = LatLonGrid(data["lat"], data["lon"])
+        generation = None
+
+    rows = snapshot_rows(data[grid.query(min_lat, max_lat, min_lon, max_lon)])
+    return {
+        "bbox": {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon},
+        "timestamp": stamp.isoformat(),
+        "generation": generation,
+        "count": len(rows),
+        "positions": rows,
+    }
@@ -34,8 +34,50 @@
     return map;
   }
 
+  function splitAtAntimeridian(points){
+    // Leaflet would draw a line across the whole map when the track wraps from +180 to -180
+    const segments = [];
+    let current = [];
+    let previousLon = null;
+    points.forEach(function(point){
+      if(previousLon !== null && Math.abs(point.lon - previousLon) > 180){
+        segments.push(current);
+        current = [];
+      }
+      current.push([point.lat, point.lon]);
+      previousLon = point.lon;
+    });
+    if(current.length){
+      segments.push(current);
+    }
+    return segments;
+  }
+
+  function renderGroundTrack(map, trackUrl){
+    if(!map || !trackUrl){
+      return;
+    }
+    fetch(trackUrl, { headers: { Accept: "application/json" } })
+      .then(function(response){
+        if(!response.ok){
+          throw new Error("Track request failed with status " + response.status);
+        }
+        return response.json();
+      })
+      .then(function(data){
+        const segments = splitAtAntimeridian(data.points || []);
+        if(segments.length){
+          L.polyline(segments, { color: "#7dd3fc", weight: 2, opacity: 0.8 }).addTo(map);
+        }
+      })
+      .catch(function(error){
+        console.warn("Unable to load ground track.", error);
+      });
+  }
+
   window.StarlightMap = {
     renderSatelliteMap,
+    renderGroundTrack,
   };
 
   document.addEventListener("DOMContentLoaded", function(){
@@ -56,5 +98,7 @@
     if(!map){
       return;
     }
+
+    renderGroundTrack(map, container.dataset.trackUrl);
   });
 })();
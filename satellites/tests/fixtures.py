@@ -0,0 +1,37 @@
+from typing import Iterable, Tuple
+
+from satellites.services.tle_parser import tle_checksum
+
+"""TLE lines and catalog texts the tests share."""
+
+ISS_LINE1 = "1 25544U 98067A   24172.54827691  .00016679  00000+0  29994-3 0  9994"
+ISS_LINE2 = "2 25544  51.6423  24.7205 0002520 156.6827  51.9026 15.50025038393561"
+OTHER_LINE1 = "1 40000U 14001A   24172.54827691  .00000000  00000+0  00000-0 0  9995"
+OTHER_LINE2 = "2 40000  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123456"
+# another element set for the ISS NORAD ID, on a different orbit: what a TLE refresh replaces ISS_LINE1/2 with
+ISS_NEW_LINE1 = "1 25544U 14001A   24172.54827691  .00000000  00000+0  00000-0 0  9995"
+ISS_NEW_LINE2 = "2 25544  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123456"
+# heavy drag + very low orbit so SGP4 reports the satellite as decayed a year later
+DECAYED_LINE1 = "1 40000U 14001A   24172.54827691  .50000000  00000+0  90000-1 0  9995"
+DECAYED_LINE2 = "2 40000  98.0000  24.7205 0010000 156.0000  50.0000 16.40000000123456"
+
+
+def tle_line(body: str) -> str:
+    """body padded or cut to 68 columns, with its checksum digit appended."""
+    body = body.ljust(68)[:68]
+    return body + str(tle_checksum(body))
+
+
+def tle_lines(norad_id: int, epoch: str = "24172.54827691", mean_motion: str = "15.50025038") -> Tuple[str, str]:
+    """A valid element set on the ISS orbit for norad_id, with the epoch (YYDDD.DDDDDDDD) given."""
+    line1 = tle_line(f"1 {norad_id:05d}U 98067A   {epoch}  .00016679  00000+0  29994-3 0  999")
+    line2 = tle_line(f"2 {norad_id:05d}  51.6423  24.7205 0002520 156.6827  51.9026 {mean_motion}39356")
+    return line1, line2
+
+
+def tle_text(norad_ids: Iterable[int], epoch: str = "24172.54827691", name: str = "SAT") -> str:
+    """A 3LE catalog, as CelesTrak serves it, of one tle_lines() set per NORAD ID, named "<name> <norad_id>"."""
+    lines = []
+    for norad_id in norad_ids:
+        lines += [f"{name} {norad_id}", *tle_lines(norad_id, epoch)]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from satellites.models import TLE
+from satellites.services import snapshot
+from satellites.services.snapshot import SNAPSHOT_DTYPE, PositionSnapshot
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2
+
+
+def _snapshot(generation, points):
+    data = np.zeros(len(points), dtype=SNAPSHOT_DTYPE)
+    data["norad_id"] = [norad_id for norad_id, _, _ in points]
+    data["name"] = [f"SAT {norad_id}".encode() for norad_id, _, _ in points]
+    data["lat"] = [lat for _, lat, _ in points]
+    data["lon"] = [lon for _, _, lon in points]
+    return PositionSnapshot(generation, datetime(2025, 1, 1, tzinfo=timezone.utc), data)
+
+
+class PositionsInBBoxAPITests(APITestCase):
+    @mock.patch("satellites.services.visibility.get_snapshot")
+    def test_returns_only_satellites_in_the_box(self, mock_snapshot):
+        mock_snapshot.return_value = _snapshot(2001, [(1, 48.0, 11.0), (2, 10.0, 11.0), (3, 48.0, 179.5), (4, 49.0, -179.0)])
+        response = self.client.get(
+            reverse("positions-in-bbox"), {"min_lat": "40", "max_lat": "55", "min_lon": "5", "max_lon": "20"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["generation"], 2001)
+        self.assertEqual([row["norad_id"] for row in response.data["positions"]], [1])
+
+        response = self.client.get(
+            reverse("positions-in-bbox"), {"min_lat": "40", "max_lat": "55", "min_lon": "170", "max_lon": "-170"}
+        )
+        self.assertEqual(sorted(row["norad_id"] for row in response.data["positions"]), [3, 4])
+
+    def test_propagates_catalog_at_explicit_time(self):
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1=ISS_LINE1, line2=ISS_LINE2)
+        snapshot.reset_catalog_cache()
+        params = {"min_lat": "-90", "max_lat": "90", "min_lon": "-180", "max_lon": "180", "t": "2024-06-20T12:00:00"}
+        response = self.client.get(reverse("positions-in-bbox"), params)
+        snapshot.reset_catalog_cache()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["generation"])
+        self.assertEqual(response.data["timestamp"], "2024-06-20T12:00:00+00:00")
+        self.assertEqual([row["norad_id"] for row in response.data["positions"]], [25544])
+
+    def test_validates_the_box(self):
+        for params in (
+            {"min_lat": "10", "max_lat": "0", "min_lon": "0", "max_lon": "1"},
+            {"min_lat": "0", "max_lat": "10", "min_lon": "0"},
+            {"min_lat": "0", "max_lat": "10", "min_lon": "0", "max_lon": "200"},
+            {"min_lat": "0", "max_lat": "10", "min_lon": "0", "max_lon": "1", "t": "soon"},
+        ):
+            response = self.client.get(reverse("positions-in-bbox"), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
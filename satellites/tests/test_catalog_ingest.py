@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+from io import StringIO
+
+import httpx
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from satellites.models import TLE
+from satellites.services.catalog_ingest import configured_groups, ingest_catalog
+from satellites.tests.fixtures import tle_text
+
+
+class IngestCatalogTests(TestCase):
+    def setUp(self):
+        self.groups = {
+            "active": tle_text([1, 2, 3], name="ACTIVE"),
+            "stations": tle_text([1], epoch="24173.00000000", name="STATION"),
+            "debris": tle_text([2], epoch="24100.00000000", name="DEBRIS"),
+        }
+        self.delay = 0.0
+
+    def _handler(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.delay)
+        group = request.url.params["GROUP"]
+        if group not in self.groups:
+            return httpx.Response(503, text="down")
+        return httpx.Response(200, text=self.groups[group])
+
+    def _client(self):
+        client = httpx.Client(transport=httpx.MockTransport(self._handler))
+        self.addCleanup(client.close)
+        return client
+
+    def test_merges_groups_freshest_epoch_wins(self):
+        result = ingest_catalog(["active", "stations", "debris"], client=self._client())
+
+        self.assertEqual(result.unique, 3)
+        self.assertEqual(result.upserted.inserted, 3)
+        self.assertEqual([source.records for source in result.sources], [3, 1, 1])
+        self.assertEqual(TLE.objects.get(pk=1).name, "STATION 1")  # newer epoch than in active
+        self.assertEqual(TLE.objects.get(pk=2).name, "ACTIVE 2")  # debris had an older one
+        self.assertEqual(set(result.timings), {"read", "merge", "upsert", "total"})
+
+    def test_downloads_run_concurrently(self):
+        self.delay = 0.2
+        result = ingest_catalog(["active", "stations", "debris"], client=self._client(), workers=3)
+        self.assertGreaterEqual(sum(source.seconds for source in result.sources), 0.6)
+        self.assertLess(result.timings["read"], 0.5)
+
+    def test_failed_source_is_reported_and_the_others_imported(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "extra.tle")
+            with open(path, "w") as handle:
+                handle.write(tle_text([9]))
+            result = ingest_catalog(["active", "nope"], [path], client=self._client())
+
+        self.assertEqual([source.source for source in result.failed], [result.sources[1].source])
+        self.assertIn("503", result.failed[0].error)
+        self.assertEqual(sorted(TLE.objects.values_list("norad_id", flat=True)), [1, 2, 3, 9])
+
+    @override_settings(TLE_IMPORT_GROUPS="active, starlink,")
+    def test_configured_groups(self):
+        self.assertEqual(configured_groups(), ["active", "starlink"])
+
+
+class ImportCatalogMultiSourceTests(TestCase):
+    def test_several_files_go_through_the_pipeline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for index, ids in enumerate([[1, 2], [2, 3]]):
+                paths.append(os.path.join(tmp, f"part{index}.tle"))
+                with open(paths[-1], "w") as handle:
+                    handle.write(tle_text(ids))
+            out = StringIO()
+            call_command("import_catalog", "--file", paths[0], "--file", paths[1], stdout=out)
+
+        self.assertIn("Upserted 3 TLE records (3 distinct NORAD IDs): 3 inserted", out.getvalue())
+        self.assertIn("read ", out.getvalue())
+        self.assertEqual(TLE.objects.count(), 3)
+
+    def test_unreadable_file_fails_the_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            good = os.path.join(tmp, "good.tle")
+            with open(good, "w") as handle:
+                handle.write(tle_text([1]))
+            with self.assertRaises(CommandError):
+                call_command(
+                    "import_catalog", "--file", good, "--file", os.path.join(tmp, "missing.tle"),
+                    stdout=StringIO(), stderr=StringIO(),
+                )
+        self.assertTrue(TLE.objects.filter(pk=1).exists())
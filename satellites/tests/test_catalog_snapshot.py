@@ -0,0 +1,132 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sgp4.api import Satrec
+
+from satellites.models import TLE
+from satellites.services import catalog_snapshot, snapshot
+from satellites.services.tle_fetcher import upsert_tles
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2, OTHER_LINE1, OTHER_LINE2, tle_text
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.path = Path(self.tmpdir) / "catalog.snapshot"
+        override = override_settings(CATALOG_SNAPSHOT_PATH=str(self.path))
+        override.enable()
+        self.addCleanup(override.disable)
+        for reset in (snapshot.reset_catalog_cache, catalog_snapshot.reset_catalog_snapshot_cache):
+            reset()
+            self.addCleanup(reset)
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1=ISS_LINE1, line2=ISS_LINE2)
+        TLE.objects.create(norad_id=40000, name="TEST SAT", line1=OTHER_LINE1, line2=OTHER_LINE2)
+
+    def test_dump_is_memory_mapped_back(self):
+        written = catalog_snapshot.write_catalog_snapshot()
+        loaded = catalog_snapshot.read_catalog_snapshot(self.path)
+
+        self.assertIsInstance(loaded.data, np.memmap)
+        self.assertEqual(loaded.data["norad_id"].tolist(), [25544, 40000])
+        self.assertEqual(loaded.data["line1"][0].decode(), ISS_LINE1)
+        self.assertEqual(loaded.signature, catalog_snapshot.catalog_signature())
+        self.assertEqual(loaded.data.tobytes(), written.data.tobytes())
+
+    def test_rebuilt_satrecs_propagate_like_parsed_ones(self):
+        catalog_snapshot.write_catalog_snapshot()
+        data = catalog_snapshot.read_catalog_snapshot(self.path).data
+        for sat, (line1, line2) in zip(catalog_snapshot.satrecs_from_rows(data), [(ISS_LINE1, ISS_LINE2), (OTHER_LINE1, OTHER_LINE2)]):
+            parsed = Satrec.twoline2rv(line1, line2)
+            self.assertEqual(sat.satnum, parsed.satnum)
+            self.assertEqual(sat.sgp4(parsed.jdsatepoch + 1.5, parsed.jdsatepochF), parsed.sgp4(parsed.jdsatepoch + 1.5, parsed.jdsatepochF))
+
+    def test_load_catalog_uses_a_matching_snapshot(self):
+        from_table = snapshot.load_catalog()
+        catalog_snapshot.write_catalog_snapshot()
+        snapshot.reset_catalog_cache()
+
+        with mock.patch.object(snapshot, "_catalog_from_table") as from_rows:
+            from_file = snapshot.load_catalog()
+        from_rows.assert_not_called()
+        self.assertEqual(from_file.norad_ids.tolist(), from_table.norad_ids.tolist())
+        self.assertEqual(from_file.names, from_table.names)
+        self.assertEqual(from_file.lines, from_table.lines)
+
+    def test_deleted_row_rebuilds_from_the_table_and_rewrites_the_snapshot(self):
+        catalog_snapshot.write_catalog_snapshot()
+        TLE.objects.filter(pk=40000).delete()
+        self.assertIsNone(catalog_snapshot.load_catalog_snapshot(catalog_snapshot.catalog_signature()))
+
+        self.assertEqual(snapshot.load_catalog().norad_ids.tolist(), [25544])
+        rewritten = catalog_snapshot.read_catalog_snapshot(self.path)
+        self.assertEqual(rewritten.data["norad_id"].tolist(), [25544])
+        self.assertEqual(rewritten.signature, catalog_snapshot.catalog_signature())
+
+    def test_refresh_is_applied_on_top_of_the_snapshot(self):
+        catalog_snapshot.write_catalog_snapshot()
+        upsert_tles([{"norad_id": 25544, "name": "ISS", "line1": ISS_LINE1, "line2": ISS_LINE2}])
+        TLE.objects.filter(pk=40000).update(updated_at=TLE.objects.get(pk=25544).updated_at)  # a touch
+        dumped = self.path.read_bytes()
+
+        with mock.patch.object(snapshot, "_catalog_from_table") as from_rows:
+            catalog = snapshot.load_catalog()
+        from_rows.assert_not_called()
+        self.assertEqual(catalog.names, ["ISS", "TEST SAT"])
+        self.assertEqual(catalog.norad_ids.tolist(), [25544, 40000])
+        self.assertEqual(self.path.read_bytes(), dumped)  # two rows are below CATALOG_SNAPSHOT_MAX_DELTA
+
+    def test_new_row_is_merged_in_norad_order(self):
+        TLE.objects.filter(pk=25544).delete()
+        catalog_snapshot.write_catalog_snapshot()
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1=ISS_LINE1, line2=ISS_LINE2)
+
+        with mock.patch.object(snapshot, "_catalog_from_table") as from_rows:
+            catalog = snapshot.load_catalog()
+        from_rows.assert_not_called()
+        self.assertEqual(catalog.norad_ids.tolist(), [25544, 40000])
+        self.assertEqual(catalog.lines[0], (ISS_LINE1, ISS_LINE2))
+        self.assertEqual(len(catalog.sats), 2)
+
+    @override_settings(CATALOG_SNAPSHOT_MAX_DELTA=0)
+    def test_large_delta_rewrites_the_snapshot(self):
+        catalog_snapshot.write_catalog_snapshot()
+        upsert_tles([{"norad_id": 25544, "name": "ISS", "line1": ISS_LINE1, "line2": ISS_LINE2}])
+
+        snapshot.load_catalog()
+        rewritten = catalog_snapshot.read_catalog_snapshot(self.path)
+        self.assertEqual(rewritten.data["name"][0].decode(), "ISS")
+        self.assertEqual(rewritten.signature, catalog_snapshot.catalog_signature())
+
+    def test_no_snapshot_is_written_unless_there_is_one(self):
+        snapshot.load_catalog()
+        self.assertFalse(self.path.exists())
+        self.assertIsNone(catalog_snapshot.refresh_catalog_snapshot())
+
+    def test_import_rewrites_an_existing_snapshot(self):
+        catalog_snapshot.write_catalog_snapshot()
+        path = Path(self.tmpdir) / "catalog.tle"
+        path.write_text(tle_text([11111]))
+        out = StringIO()
+        call_command("import_catalog", "--file", str(path), stdout=out)
+        self.assertIn("Catalog snapshot rewritten (3 TLEs)", out.getvalue())
+        rewritten = catalog_snapshot.read_catalog_snapshot(self.path)
+        self.assertEqual(rewritten.data["norad_id"].tolist(), [11111, 25544, 40000])
+        self.assertEqual(rewritten.signature, catalog_snapshot.catalog_signature())
+
+    def test_other_formats_are_not_read(self):
+        self.path.write_bytes(b"STLPOS01" + b"\0" * 100)
+        self.assertIsNone(catalog_snapshot.read_catalog_snapshot(self.path))
+        self.assertIsNone(catalog_snapshot.read_catalog_snapshot(Path(self.tmpdir) / "missing"))
+
+    def test_command(self):
+        out = StringIO()
+        call_command("snapshot_catalog", stdout=out)
+        self.assertIn("Catalog snapshot of 2 TLEs", out.getvalue())
+        self.assertTrue(self.path.exists())
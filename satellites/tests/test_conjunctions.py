@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from sgp4.api import Satrec, WGS72
+from sgp4.conveniences import sat_epoch_datetime
+from sgp4.exporter import export_tle
+
+from satellites.models import Conjunction, TLE
+from satellites.services import conjunctions, parallel
+from satellites.services.conjunctions import ConjunctionEvent
+
+
+def _circular(norad_id: int, inclination_rad: float, alt_km: float = 700.0) -> Satrec:
+    """Circular orbit starting at its ascending node on the x axis at epoch, so any two of them meet there."""
+    sat = Satrec()
+    semi_major = (6378.135 + alt_km) / 6378.135
+    mean_motion = 0.0743669161 * semi_major ** -1.5  # rad/min
+    sat.sgp4init(WGS72, "i", norad_id, 25000.5, 0.0, 0.0, 0.0, 0.0001, 0.0, inclination_rad, 0.0, mean_motion, 0.0)
+    return sat
+
+
+class ConjunctionScreeningTests(TestCase):
+    def setUp(self):
+        self.crossing_a = _circular(1, 0.87)
+        self.crossing_b = _circular(2, 1.69)
+        self.geo = _circular(3, 0.1, alt_km=35786.0)
+        self.epoch = sat_epoch_datetime(self.crossing_a)
+
+    def test_finds_the_crossing_pair_near_epoch(self):
+        events = conjunctions.screen_satellites(
+            [self.crossing_b, self.geo, self.crossing_a],
+            [2, 3, 1],
+            start=self.epoch - timedelta(minutes=30),
+            hours=1.0,
+        )
+        self.assertEqual(len(events), 1)
+        event = events[0]
+        self.assertEqual((event.norad_id_a, event.norad_id_b), (1, 2))
+        self.assertLess(abs((event.tca - self.epoch).total_seconds()), 10.0)
+        self.assertLess(event.miss_distance_km, 10.0)
+        self.assertGreater(event.relative_speed_kms, 1.0)
+
+    def test_process_pool_mode_finds_the_same_events(self):
+        sats = [self.crossing_a, self.crossing_b, self.geo]
+        lines = [export_tle(sat) for sat in sats]
+        # the exported TLEs round elements a little, screen the parsed copies both ways
+        sats = [Satrec.twoline2rv(line1, line2) for line1, line2 in lines]
+        kwargs = {"start": self.epoch - timedelta(minutes=30), "hours": 1.0}
+        try:
+            pooled = conjunctions.screen_satellites(sats, [1, 2, 3], lines=lines, workers=2, **kwargs)
+        finally:
+            parallel.shutdown_executor()
+        self.assertEqual(pooled, conjunctions.screen_satellites(sats, [1, 2, 3], **kwargs))
+        self.assertEqual(len(pooled), 1)
+
+    def test_threshold_is_respected(self):
+        events = conjunctions.screen_satellites(
+            [self.crossing_a, self.crossing_b],
+            [1, 2],
+            start=self.epoch - timedelta(minutes=30),
+            hours=1.0,
+            threshold_km=1.0,
+        )
+        self.assertEqual(events, [])
+
+    def test_shell_filter_drops_objects_that_cannot_meet(self):
+        mask = conjunctions.shell_overlap_mask([self.crossing_a, self.geo, self.crossing_b], 10.0)
+        self.assertEqual(mask.tolist(), [True, False, True])
+
+    def test_store_replaces_previous_results(self):
+        screened_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        Conjunction.objects.create(
+            norad_id_a=5, norad_id_b=6, tca=screened_at, miss_distance_km=1.0, relative_speed_kms=1.0, screened_at=screened_at
+        )
+        stored = conjunctions.store_conjunctions(
+            [ConjunctionEvent(1, 2, screened_at + timedelta(hours=1), 3.5, 7.0)], screened_at + timedelta(hours=1)
+        )
+        self.assertEqual(stored, 1)
+        self.assertEqual(list(Conjunction.objects.values_list("norad_id_a", "norad_id_b")), [(1, 2)])
+
+    @mock.patch("satellites.management.commands.screen_conjunctions.screen_catalog")
+    def test_command_stores_screening_result(self, mock_screen):
+        tca = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        mock_screen.return_value = [ConjunctionEvent(1, 2, tca, 3.5, 7.0)]
+        out = StringIO()
+        call_command("screen_conjunctions", "--threshold-km", "5", "--hours", "12", stdout=out)
+
+        self.assertEqual(mock_screen.call_args.kwargs["threshold_km"], 5.0)
+        self.assertEqual(mock_screen.call_args.kwargs["hours"], 12.0)
+        self.assertEqual(Conjunction.objects.count(), 1)
+        self.assertIn("Stored 1 conjunctions", out.getvalue())
+
+
+class ConjunctionsAPITests(APITestCase):
+    def setUp(self):
+        screened_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1="1", line2="2")
+        for norad_b, hours, miss in ((40000, 2, 4.0), (50000, 1, 9.0), (60000, 3, 1.0)):
+            Conjunction.objects.create(
+                norad_id_a=25544 if norad_b != 60000 else 30000,
+                norad_id_b=norad_b,
+                tca=screened_at + timedelta(hours=hours),
+                miss_distance_km=miss,
+                relative_speed_kms=10.0,
+                screened_at=screened_at,
+            )
+
+    def test_lists_conjunctions_soonest_first(self):
+        response = self.client.get(reverse("conjunctions-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual([row["norad_id_b"] for row in response.data["conjunctions"]], [50000, 40000, 60000])
+        self.assertEqual(response.data["conjunctions"][0]["name_a"], "ISS (ZARYA)")
+        self.assertEqual(response.data["conjunctions"][0]["name_b"], "NORAD 50000")
+
+    def test_filters_by_satellite_and_distance(self):
+        response = self.client.get(reverse("conjunctions-list"), {"norad_id": "25544", "max_km": "5"})
+        self.assertEqual([row["norad_id_b"] for row in response.data["conjunctions"]], [40000])
+
+        response = self.client.get(reverse("conjunctions-list"), {"norad_id": "60000"})
+        self.assertEqual([row["norad_id_a"] for row in response.data["conjunctions"]], [30000])
+
+    def test_rejects_invalid_parameters(self):
+        for params in ({"norad_id": "abc"}, {"max_km": "x"}, {"since": "yesterday"}, {"limit": "0"}):
+            response = self.client.get(reverse("conjunctions-list"), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
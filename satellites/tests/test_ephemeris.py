@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from sgp4.api import Satrec
+
+from satellites.models import TLE
+from satellites.services import propagation
+from satellites.services.ephemeris import EphemerisCache, ephemeris_cache, fit_ephemeris
+from satellites.services.propagation import ecef_positions, julian_dates
+from satellites.services.tle_fetcher import upsert_tles
+from satellites.tests.fixtures import DECAYED_LINE1, DECAYED_LINE2, ISS_LINE1, ISS_LINE2, ISS_NEW_LINE1, ISS_NEW_LINE2
+
+
+START = datetime(2024, 6, 21, 12, 0, tzinfo=timezone.utc)
+
+
+class FitEphemerisTests(SimpleTestCase):
+    def test_fit_stays_within_the_error_bound(self):
+        sat = Satrec.twoline2rv(ISS_LINE1, ISS_LINE2)
+        ephemeris = fit_ephemeris(sat, ISS_LINE1, ISS_LINE2, START, window_s=3 * 3600.0, max_error_km=0.001)
+        self.assertTrue(ephemeris.usable)
+        self.assertGreaterEqual(ephemeris.end, START + timedelta(hours=3))
+
+        offsets = np.random.default_rng(5).uniform(0.0, 3 * 3600.0, 300)
+        jd, fr = julian_dates(START, offsets)
+        _, expected = ecef_positions(sat, jd, fr)
+        _, _, v = sat.sgp4_array(jd, fr)
+        fitted = np.array([ephemeris.evaluate(START + timedelta(seconds=float(s))) for s in offsets])
+
+        self.assertLess(np.linalg.norm(fitted[:, :3] - expected, axis=1).max(), 0.001)
+        np.testing.assert_allclose(fitted[:, 3], np.linalg.norm(v, axis=1), atol=1e-6)
+
+    def test_speed_is_held_to_its_own_bound(self):
+        sat = Satrec.twoline2rv(ISS_LINE1, ISS_LINE2)
+        # a position bound loose enough to accept the first segmentation, the speed one is not
+        loose = fit_ephemeris(sat, ISS_LINE1, ISS_LINE2, START, window_s=3600.0, degree=4, max_error_km=10.0,
+                              max_speed_error_kms=1.0)
+        tight = fit_ephemeris(sat, ISS_LINE1, ISS_LINE2, START, window_s=3600.0, degree=4, max_error_km=10.0,
+                              max_speed_error_kms=1e-8)
+        self.assertLess(tight.segment_s, loose.segment_s)
+
+        offsets = np.random.default_rng(7).uniform(0.0, 3600.0, 300)
+        jd, fr = julian_dates(START, offsets)
+        _, _, v = sat.sgp4_array(jd, fr)
+        fitted = np.array([tight.evaluate(START + timedelta(seconds=float(s))) for s in offsets])
+        np.testing.assert_allclose(fitted[:, 3], np.linalg.norm(v, axis=1), atol=1e-8)
+
+    def test_tighter_bound_uses_shorter_segments(self):
+        sat = Satrec.twoline2rv(ISS_LINE1, ISS_LINE2)
+        loose = fit_ephemeris(sat, ISS_LINE1, ISS_LINE2, START, window_s=3600.0, degree=4, max_error_km=1.0)
+        tight = fit_ephemeris(sat, ISS_LINE1, ISS_LINE2, START, window_s=3600.0, degree=4, max_error_km=0.001)
+        self.assertLess(tight.segment_s, loose.segment_s)
+
+    def test_decayed_satellite_is_not_usable(self):
+        sat = Satrec.twoline2rv(DECAYED_LINE1, DECAYED_LINE2)
+        ephemeris = fit_ephemeris(sat, DECAYED_LINE1, DECAYED_LINE2, START + timedelta(days=365), window_s=3600.0)
+        self.assertFalse(ephemeris.usable)
+        self.assertTrue(ephemeris.covers(START + timedelta(days=365, minutes=30)))
+
+
+class EphemerisCacheTests(SimpleTestCase):
+    def test_fits_once_per_window_and_tle(self):
+        cache = EphemerisCache(maxsize=4)
+        cache.position(25544, ISS_LINE1, ISS_LINE2, START)
+        cache.position(25544, ISS_LINE1, ISS_LINE2, START + timedelta(minutes=30))
+        self.assertEqual(cache.stats()["fits"], 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+        cache.position(25544, ISS_NEW_LINE1, ISS_NEW_LINE2, START)  # new TLE
+        cache.position(25544, ISS_NEW_LINE1, ISS_NEW_LINE2, START + timedelta(days=1))  # left the window
+        self.assertEqual(cache.stats()["fits"], 3)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = EphemerisCache(maxsize=1)
+        cache.position(25544, ISS_LINE1, ISS_LINE2, START)
+        cache.position(40000, DECAYED_LINE1, DECAYED_LINE2, START)
+        self.assertEqual(len(cache), 1)
+        self.assertFalse(cache.invalidate(25544))
+        self.assertTrue(cache.invalidate(40000))
+
+
+@override_settings(POSITION_CACHE_QUANTUM_S=0)  # every call reaches the ephemeris
+class PropagateNowFastPathTests(SimpleTestCase):
+    def setUp(self):
+        ephemeris_cache.clear()
+
+    def tearDown(self):
+        ephemeris_cache.clear()
+
+    def test_now_requests_use_the_ephemeris(self):
+        now = datetime(2024, 6, 21, 12, 34, 56, 250000, tzinfo=timezone.utc)
+        with mock.patch.object(propagation, "datetime") as mock_datetime:
+            mock_datetime.now.return_value = now
+            fast = propagation.propagate_now(ISS_LINE1, ISS_LINE2, norad_id=25544)
+            fast_again = propagation.propagate_now(ISS_LINE1, ISS_LINE2, norad_id=25544)
+        exact = propagation.propagate_now(ISS_LINE1, ISS_LINE2, timestamp=now)
+
+        self.assertEqual(ephemeris_cache.stats()["hits"], 1)
+        self.assertEqual(fast, fast_again)
+        self.assertEqual(fast["timestamp"], exact["timestamp"])
+        for key in ("lat", "lon"):
+            self.assertAlmostEqual(fast[key], exact[key], places=4)
+        for key in ("alt_km", "vel_kms"):
+            self.assertAlmostEqual(fast[key], exact[key], places=3)
+
+    def test_explicit_timestamp_bypasses_the_ephemeris(self):
+        propagation.propagate_now(ISS_LINE1, ISS_LINE2, norad_id=25544, timestamp=START)
+        self.assertEqual(len(ephemeris_cache), 0)
+
+    @override_settings(EPHEMERIS_ENABLED=False)
+    def test_can_be_disabled(self):
+        propagation.propagate_now(ISS_LINE1, ISS_LINE2, norad_id=25544)
+        self.assertEqual(len(ephemeris_cache), 0)
+
+    def test_decayed_satellite_still_raises(self):
+        with mock.patch.object(propagation, "datetime") as mock_datetime:
+            mock_datetime.now.return_value = START + timedelta(days=365)
+            with self.assertRaises(ValueError):
+                propagation.propagate_now(DECAYED_LINE1, DECAYED_LINE2, norad_id=40000)
+
+
+class EphemerisInvalidationTests(TestCase):
+    def test_upsert_drops_the_old_fit(self):
+        TLE.objects.create(norad_id=25544, name="ISS", line1=ISS_LINE1, line2=ISS_LINE2)
+        ephemeris_cache.position(25544, ISS_LINE1, ISS_LINE2, START)
+        upsert_tles([{"norad_id": 25544, "name": "ISS", "line1": ISS_NEW_LINE1, "line2": ISS_NEW_LINE2}])
+        self.assertFalse(ephemeris_cache.invalidate(25544))
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from satellites.models import TLE
+from satellites.services import export, snapshot
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2, OTHER_LINE1, OTHER_LINE2
+
+
+def _body(response) -> str:
+    return b"".join(response.streaming_content).decode("utf-8")
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        override = override_settings(
+            POSITION_SNAPSHOT_PATH=str(Path(self.tmpdir) / "positions.snapshot"),
+            CATALOG_SNAPSHOT_PATH=str(Path(self.tmpdir) / "catalog.snapshot"),
+            POSITION_SNAPSHOT_BACKGROUND=False,
+            EXPORT_CHUNK_SIZE=1,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        snapshot.reset_catalog_cache()
+        self.addCleanup(snapshot.reset_catalog_cache)
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1=ISS_LINE1, line2=ISS_LINE2)
+        TLE.objects.create(norad_id=40000, name="TEST SAT", line1=OTHER_LINE1, line2=OTHER_LINE2)
+
+    def test_catalog_as_ndjson(self):
+        response = self.client.get(reverse("satellites-list"), {"format": "ndjson", "fields": "norad_id,name"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in _body(response).splitlines()]
+        self.assertEqual(rows, [{"norad_id": 25544, "name": "ISS (ZARYA)"}, {"norad_id": 40000, "name": "TEST SAT"}])
+
+    def test_catalog_as_csv_is_chunked(self):
+        response = self.client.get(reverse("satellites-list"), {"format": "csv"})
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)  # the header, then one block per EXPORT_CHUNK_SIZE rows
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual([row["norad_id"] for row in rows], ["25544", "40000"])
+        self.assertEqual(rows[0]["line2"], ISS_LINE2)
+
+    def test_accept_header_selects_the_format(self):
+        response = self.client.get(reverse("satellites-list"), HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(len(_body(response).splitlines()), 2)
+
+    def test_bad_fields_are_rejected(self):
+        response = self.client.get(reverse("satellites-list"), {"format": "csv", "fields": "line3"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("line3", response.content.decode())
+
+    def test_positions_from_the_snapshot(self):
+        snapshot.refresh_snapshot()
+        response = self.client.get(reverse("positions-all"), {"format": "ndjson"})
+        self.assertIn("X-Snapshot-Generation", response)
+        rows = [json.loads(line) for line in _body(response).splitlines()]
+        self.assertEqual([row["norad_id"] for row in rows], [25544, 40000])
+        self.assertEqual(list(rows[0]), list(export.POSITION_FIELDS))
+
+    def test_positions_propagated_to_t_match_the_snapshot_rows(self):
+        body = _body(self.client.get(reverse("positions-all"), {"format": "csv", "t": "2024-06-21T12:00:00Z"}))
+        rows = list(csv.DictReader(io.StringIO(body)))
+        _, expected = snapshot.compute_positions(datetime(2024, 6, 21, 12, tzinfo=timezone.utc))
+        self.assertEqual([int(row["norad_id"]) for row in rows], expected["norad_id"].tolist())
+        for row, lat in zip(rows, expected["lat"].tolist()):
+            self.assertAlmostEqual(float(row["lat"]), lat, places=9)
+        self.assertEqual(rows[0]["timestamp"], "2024-06-21T12:00:00+00:00")
+
+    def test_json_stays_the_default(self):
+        response = self.client.get(reverse("positions-all"))
+        self.assertFalse(response.streaming)
+        self.assertIn("positions", response.json())
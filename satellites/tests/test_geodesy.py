@@ -0,0 +1,64 @@
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from satellites.services import geodesy, propagation
+
+MM_IN_KM = 1e-6
+EARTH_RADIUS_M = 6378137.0
+
+
+def _random_points(radius_min_km, radius_max_km, count=5000, seed=7):
+    rng = np.random.default_rng(seed)
+    directions = rng.normal(size=(count, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    radii = rng.uniform(radius_min_km, radius_max_km, count)
+    points = directions * radii[:, None]
+    # poles and equator are the usual trouble spots for closed-form solutions
+    extra = np.array([[0.0, 0.0, 6356.7523], [0.0, 0.0, -7000.0], [7000.0, 0.0, 0.0], [0.0, -6378.137, 0.0]])
+    return np.vstack([points, extra])
+
+
+class GeodesyTests(SimpleTestCase):
+    def test_matches_pyproj_to_the_millimetre_near_the_surface(self):
+        # PROJ's own inverse is a single non-iterative Bowring step whose error grows with height
+        # (~1 mm at 200 km, a couple of cm at LEO), so the direct comparison is done where PROJ is exact
+        points = _random_points(6350.0, 6570.0)
+        lat, lon, alt = geodesy.ecef_to_geodetic(*points.T)
+        ref_lat, ref_lon, ref_alt = geodesy.ecef_to_geodetic_pyproj(*points.T)
+
+        lat_err_m = np.max(np.abs(lat - ref_lat)) * np.pi / 180.0 * EARTH_RADIUS_M
+        lon_err_m = np.max(np.abs((lon - ref_lon + 180.0) % 360.0 - 180.0)) * np.pi / 180.0 * EARTH_RADIUS_M
+        self.assertLess(lat_err_m, 1e-3)
+        self.assertLess(lon_err_m, 1e-3)
+        self.assertLess(np.max(np.abs(alt - ref_alt)), MM_IN_KM)
+
+    def test_round_trip_is_sub_millimetre_from_leo_to_geo(self):
+        points = _random_points(6500.0, 45000.0)
+        lat, lon, alt = geodesy.ecef_to_geodetic(*points.T)
+        back = geodesy.geodetic_to_ecef(lat, lon, alt)
+        self.assertLess(np.max(np.linalg.norm(back - points, axis=1)), MM_IN_KM)
+
+    def test_accepts_scalars(self):
+        lat, lon, alt = geodesy.ecef_to_geodetic(7000.0, 0.0, 0.0)
+        self.assertAlmostEqual(float(lat), 0.0)
+        self.assertAlmostEqual(float(lon), 0.0)
+        self.assertAlmostEqual(float(alt), 7000.0 - geodesy.WGS84_A_KM)
+
+    def test_scalar_version_matches_the_array_version(self):
+        points = _random_points(6500.0, 45000.0, count=200)
+        lat, lon, alt = geodesy.ecef_to_geodetic(*points.T)
+        for i, (x, y, z) in enumerate(points.tolist()):
+            s_lat, s_lon, s_alt = geodesy.convert_ecef_to_geodetic(x, y, z)
+            self.assertIsInstance(s_lat, float)
+            self.assertAlmostEqual(s_lat, lat[i], places=9)
+            self.assertAlmostEqual(s_lon, lon[i], places=9)
+            self.assertAlmostEqual(s_alt, alt[i], places=9)
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            geodesy.convert_ecef_to_geodetic(7000.0, 0.0, 0.0, backend="nope")
+
+    @override_settings(GEODETIC_BACKEND="pyproj")
+    def test_propagation_can_use_pyproj_backend(self):
+        lat, lon, alt = propagation._ecef_to_geodetic(6478.137, 0.0, 0.0)
+        self.assertAlmostEqual(float(alt), 100.0, places=6)
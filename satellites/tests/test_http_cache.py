@@ -0,0 +1,169 @@
+import gzip
+from io import StringIO
+from unittest import mock
+
+import httpx
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from satellites.models import DownloadValidator, TLE
+from satellites.services import tle_fetcher
+from satellites.services.catalog_ingest import group_url, ingest_catalog
+from satellites.services.http_cache import record_download
+from satellites.services.upstream import celestrak_breaker, negative_cache
+from satellites.tests.fixtures import tle_text
+
+REAL_CLIENT = httpx.Client
+
+
+class CelesTrakStandIn:
+    """Answers like CelesTrak: gzip when asked for it, an ETag per payload and 304 when it still matches."""
+
+    def __init__(self):
+        self.payloads = {}  # GROUP or CATNR -> (etag, text)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        key = request.url.params.get("GROUP") or request.url.params.get("CATNR")
+        etag, text = self.payloads[key]
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        headers = {"ETag": etag, "Last-Modified": "Mon, 17 Jun 2024 10:00:00 GMT"}
+        body = text.encode()
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        # a stream, not content=, so that the bytes are counted as downloaded like over a socket
+        return httpx.Response(200, stream=httpx.ByteStream(body), headers=headers)
+
+    def client(self, **kwargs):
+        return REAL_CLIENT(transport=httpx.MockTransport(self), **kwargs)
+
+
+class ImportCatalogConditionalGetTests(TestCase):
+    def setUp(self):
+        self.server = CelesTrakStandIn()
+        self.server.payloads["active"] = ('"v1"', tle_text(range(1, 51)))
+        patcher = mock.patch("satellites.management.commands.import_catalog.httpx.Client", side_effect=self.server.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _import(self):
+        out = StringIO()
+        call_command("import_catalog", stdout=out)
+        return out.getvalue()
+
+    def test_unchanged_catalog_is_not_parsed_or_written(self):
+        self._import()
+        validator = DownloadValidator.objects.get(url=group_url("active"))
+        self.assertEqual(validator.etag, '"v1"')
+        self.assertGreater(validator.size_bytes, 0)
+        self.assertLess(validator.size_bytes, len(self.server.payloads["active"][1]))  # came gzipped
+
+        with mock.patch("satellites.management.commands.import_catalog.upsert_tles") as upsert, \
+                mock.patch("satellites.management.commands.import_catalog.parse_tle_catalog") as parse:
+            output = self._import()
+        upsert.assert_not_called()
+        parse.assert_not_called()
+        self.assertIn("not modified", output)
+        self.assertIn(f"saved {validator.size_bytes / 1e6:.2f} MB", output)
+
+        request = self.server.requests[-1]
+        self.assertEqual(request.headers["If-None-Match"], '"v1"')
+        self.assertEqual(request.headers["If-Modified-Since"], "Mon, 17 Jun 2024 10:00:00 GMT")
+        self.assertIn("gzip", request.headers["Accept-Encoding"])
+
+    def test_changed_catalog_is_imported_and_its_validator_kept(self):
+        self._import()
+        self.server.payloads["active"] = ('"v2"', tle_text(range(1, 52)))
+        self.assertIn("1 inserted", self._import())
+        self.assertEqual(DownloadValidator.objects.get(url=group_url("active")).etag, '"v2"')
+
+    def test_failed_import_does_not_store_the_validator(self):
+        with mock.patch("satellites.management.commands.import_catalog.upsert_tles", side_effect=RuntimeError("db")):
+            with self.assertRaises(RuntimeError):
+                self._import()
+        self.assertFalse(DownloadValidator.objects.exists())
+
+
+class IngestConditionalGetTests(TestCase):
+    def test_unchanged_groups_are_skipped(self):
+        server = CelesTrakStandIn()
+        server.payloads["active"] = ('"a1"', tle_text([1, 2]))
+        server.payloads["debris"] = ('"d1"', tle_text([3]))
+        client = server.client()
+        self.addCleanup(client.close)
+        ingest_catalog(["active", "debris"], client=client)
+
+        server.payloads["debris"] = ('"d2"', tle_text([3, 4]))
+        result = ingest_catalog(["active", "debris"], client=client)
+
+        active, debris = result.sources
+        self.assertTrue(active.not_modified)
+        self.assertGreater(active.saved_bytes, 0)
+        self.assertFalse(debris.not_modified)
+        self.assertEqual(result.upserted.inserted, 1)
+        self.assertEqual(TLE.objects.count(), 4)
+        self.assertEqual(DownloadValidator.objects.get(url=group_url("debris")).etag, '"d2"')
+
+
+class FetchTLEConditionalGetTests(TestCase):
+    def test_304_hands_back_the_stored_tle(self):
+        server = CelesTrakStandIn()
+        server.payloads["25544"] = ('"iss"', tle_text([25544], name="ISS"))
+        client = server.client()
+        self.addCleanup(client.close)
+
+        name, line1, line2, download = tle_fetcher.fetch_tle_from_celestrak(25544, client=client)
+        record_download(*download)
+        TLE.objects.create(norad_id=25544, name=name, line1=line1, line2=line2)
+
+        with mock.patch.object(tle_fetcher, "parse_tle_catalog") as parse:
+            self.assertEqual(
+                tle_fetcher.fetch_tle_from_celestrak(25544, client=client), (name, line1, line2, None)
+            )
+        parse.assert_not_called()
+        self.assertEqual(server.requests[-1].headers["If-None-Match"], '"iss"')
+
+    def test_304_without_a_stored_row_downloads_again(self):
+        server = CelesTrakStandIn()
+        server.payloads["25544"] = ('"iss"', tle_text([25544], name="ISS"))
+        client = server.client()
+        self.addCleanup(client.close)
+        record_download(*tle_fetcher.fetch_tle_from_celestrak(25544, client=client).download)
+
+        self.assertEqual(tle_fetcher.fetch_tle_from_celestrak(25544, client=client).name, "ISS 25544")
+        self.assertEqual(len(server.requests), 3)
+        self.assertNotIn("If-None-Match", server.requests[-1].headers)
+
+    def test_no_validators_nothing_stored(self):
+        client = REAL_CLIENT(transport=httpx.MockTransport(lambda request: httpx.Response(200, text=tle_text([7]))))
+        self.addCleanup(client.close)
+        record_download(*tle_fetcher.fetch_tle_from_celestrak(7, client=client).download)
+        self.assertFalse(DownloadValidator.objects.exists())
+
+
+@override_settings(TLE_REFRESH_POLICY="blocking")
+class RefreshConditionalGetTests(TestCase):
+    def setUp(self):
+        self.addCleanup(negative_cache.clear)
+        self.addCleanup(celestrak_breaker.reset)
+        self.server = CelesTrakStandIn()
+        self.server.payloads["25544"] = ('"v1"', tle_text([25544], name="ISS"))
+        self.client = self.server.client()
+        self.addCleanup(self.client.close)
+
+    def test_validators_are_stored_with_the_row(self):
+        tle_fetcher.get_or_refresh_tle(25544, client=self.client)
+        self.assertEqual(DownloadValidator.objects.get().etag, '"v1"')
+
+    def test_failed_write_keeps_the_next_request_unconditional(self):
+        with mock.patch.object(tle_fetcher, "upsert_tles", side_effect=RuntimeError("database is locked")):
+            with self.assertRaises(RuntimeError):
+                tle_fetcher.get_or_refresh_tle(25544, client=self.client)
+        self.assertFalse(DownloadValidator.objects.exists())
+
+        self.assertEqual(tle_fetcher.get_or_refresh_tle(25544, client=self.client)[0], "ISS 25544")
+        self.assertNotIn("If-None-Match", self.server.requests[-1].headers)
+        self.assertTrue(TLE.objects.filter(pk=25544).exists())
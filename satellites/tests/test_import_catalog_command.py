@@ -1,8 +1,11 @@
+from io import StringIO
 from unittest import mock
 
 from django.core.management import call_command
 from django.test import TestCase
 
+from satellites.services.tle_fetcher import UpsertResult
+
 
 class ImportCatalogCommandTests(TestCase):
     @mock.patch("satellites.management.commands.import_catalog.upsert_tles")
@@ -12,6 +15,9 @@ class ImportCatalogCommandTests(TestCase):
         mock_client = mock.MagicMock()
         mock_response = mock.MagicMock()
         mock_response.text = "sample"
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.num_bytes_downloaded = 6
         mock_response.raise_for_status.return_value = None
         mock_client.get.return_value = mock_response
         mock_client.__enter__.return_value = mock_client
@@ -19,10 +25,13 @@ class ImportCatalogCommandTests(TestCase):
         mock_client_cls.return_value = mock_client
 
         mock_parse.return_value = [{"norad_id": 1, "name": "SAT", "line1": "L1", "line2": "L2"}]
-        mock_upsert.return_value = 1
+        mock_upsert.return_value = UpsertResult(inserted=1, updated=0, unchanged=0)
 
-        call_command("import_catalog")
+        out = StringIO()
+        call_command("import_catalog", stdout=out)
 
         mock_client.get.assert_called_once()
         mock_parse.assert_called_once_with("sample")
         mock_upsert.assert_called_once_with(mock_parse.return_value)
+        self.assertIn("1 inserted, 0 updated, 0 unchanged", out.getvalue())
+        self.assertIn("upsert", out.getvalue())
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+
+from satellites.services.geodesy import geodetic_to_ecef, look_angles
+from satellites.services.passes import Observer
+from satellites.services.snapshot import SNAPSHOT_DTYPE, PositionSnapshot
+from satellites.services.visibility import visible_satellites
+
+
+def _snapshot(generation, lat, lon, alt_km):
+    lat, lon, alt_km = np.atleast_1d(lat), np.atleast_1d(lon), np.atleast_1d(alt_km)
+    data = np.zeros(len(lat), dtype=SNAPSHOT_DTYPE)
+    ecef = geodetic_to_ecef(lat, lon, alt_km)
+    data["norad_id"] = np.arange(1, len(lat) + 1)
+    data["name"] = [f"SAT {i}".encode() for i in range(1, len(lat) + 1)]
+    data["lat"], data["lon"], data["alt_km"] = lat, lon, alt_km
+    data["x_km"], data["y_km"], data["z_km"] = ecef[:, 0], ecef[:, 1], ecef[:, 2]
+    return PositionSnapshot(generation, datetime(2025, 1, 1, tzinfo=timezone.utc), data)
+
+
+class VisibleSatellitesTests(SimpleTestCase):
+    def test_prefilter_matches_exact_look_angles(self):
+        rng = np.random.default_rng(3)
+        n = 5000
+        snap = _snapshot(
+            1001, rng.uniform(-90, 90, n), rng.uniform(-180, 180, n), rng.uniform(300, 36000, n)
+        )
+        observer = Observer(lat=48.2, lon=16.4, alt_km=0.2)
+        for min_el in (0.0, 10.0, -5.0):
+            rows, _, el, _ = visible_satellites(snap, observer, min_el=min_el)
+
+            ecef = np.column_stack([snap.data["x_km"], snap.data["y_km"], snap.data["z_km"]])
+            _, all_el, _ = look_angles(ecef, observer.lat, observer.lon, observer.alt_km)
+            self.assertEqual(sorted(rows.tolist()), np.flatnonzero(all_el >= min_el).tolist())
+            self.assertTrue(np.all(np.diff(el) <= 0))  # highest first
+
+    def test_satellite_at_zenith(self):
+        snap = _snapshot(1002, [10.0, -10.0], [20.0, -160.0], [500.0, 500.0])
+        rows, az, el, rng = visible_satellites(snap, Observer(lat=10.0, lon=20.0))
+        self.assertEqual(rows.tolist(), [0])
+        self.assertAlmostEqual(el[0], 90.0, places=6)
+        self.assertAlmostEqual(rng[0], 500.0, places=6)
+
+
+class OverheadAPITests(SimpleTestCase):
+    @mock.patch("satellites.services.visibility.get_snapshot")
+    def test_returns_satellites_above_the_horizon(self, mock_snapshot):
+        mock_snapshot.return_value = _snapshot(1003, [52.0, 0.0, -52.0], [13.0, 13.0, 13.0], [550.0, 550.0, 550.0])
+        response = self.client.get(reverse("overhead"), {"lat": "52.5", "lon": "13.4", "min_el": "10"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["generation"], 1003)
+        satellite = data["satellites"][0]
+        self.assertEqual(satellite["norad_id"], 1)
+        self.assertEqual(satellite["name"], "SAT 1")
+        self.assertGreater(satellite["elevation"], 80.0)
+        self.assertEqual(set(satellite), {"norad_id", "name", "azimuth", "elevation", "range_km", "alt_km"})
+
+    def test_requires_observer(self):
+        response = self.client.get(reverse("overhead"), {"lat": "52.5"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("overhead"), {"lat": "95", "lon": "0"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+from sgp4.api import Satrec, SatrecArray
+
+from satellites.models import TLE
+from satellites.services import parallel
+from satellites.services.propagation import ecef_positions, julian_dates
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2, OTHER_LINE1, OTHER_LINE2
+
+
+class ParallelPropagationTests(TestCase):
+    def setUp(self):
+        self.tles = [(ISS_LINE1, ISS_LINE2), (OTHER_LINE1, OTHER_LINE2)] * 3
+        self.jd, self.fr = julian_dates(datetime(2024, 6, 20, tzinfo=timezone.utc), np.arange(0.0, 600.0, 30.0))
+
+    def tearDown(self):
+        parallel.shutdown_executor()
+
+    def test_shard_bounds_cover_the_range(self):
+        self.assertEqual(parallel.shard_bounds(10, 3), [(0, 3), (3, 7), (7, 10)])
+        self.assertEqual(parallel.shard_bounds(2, 4), [(0, 1), (1, 2)])
+        self.assertEqual(parallel.shard_bounds(0, 4), [])
+
+    def test_in_process_mode_matches_ecef_positions(self):
+        result = parallel.propagate_parallel(self.tles, self.jd, self.fr, workers=1, time_chunk=7)
+        sats = SatrecArray([Satrec.twoline2rv(line1, line2) for line1, line2 in self.tles])
+        error, ecef = ecef_positions(sats, self.jd, self.fr)
+
+        self.assertEqual(result.r_km.shape, (6, 20, 3))
+        self.assertIsNone(result.v_kms)
+        np.testing.assert_array_equal(result.error, error)
+        np.testing.assert_allclose(result.r_km, ecef)
+
+    def test_process_pool_returns_the_same_arrays(self):
+        serial = parallel.propagate_parallel(self.tles, self.jd, self.fr, workers=1, frame="teme", with_velocity=True)
+        pooled = parallel.propagate_parallel(self.tles, self.jd, self.fr, workers=2, frame="teme", with_velocity=True)
+        np.testing.assert_array_equal(pooled.r_km, serial.r_km)
+        np.testing.assert_array_equal(pooled.v_kms, serial.v_kms)
+
+    def test_rejects_unknown_frame(self):
+        with self.assertRaises(ValueError):
+            parallel.propagate_parallel(self.tles, self.jd, self.fr, workers=1, frame="j2000")
+
+    def test_benchmark_command_reports_every_worker_count(self):
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1=ISS_LINE1, line2=ISS_LINE2)
+        out = StringIO()
+        call_command(
+            "benchmark_propagation", "--workers", "1,2", "--satellites", "10", "--minutes", "2", "--repeat", "1", stdout=out
+        )
+        lines = out.getvalue().splitlines()
+        self.assertIn("10 satellites x 12 instants", lines[0])
+        self.assertEqual([line.split()[0] for line in lines[2:]], ["1", "2"])
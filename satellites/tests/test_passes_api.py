@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from satellites.models import Favorite, TLE
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2
+
+
+class PassesAPITests(APITestCase):
+    def setUp(self):
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1=ISS_LINE1, line2=ISS_LINE2)
+        self.user = get_user_model().objects.create_user(username="observer", password="pass12345")
+        Favorite.objects.create(user=self.user, norad_id=25544, name="ISS", notes="")
+
+    @mock.patch("satellites.services.tracking.predict_passes_many")
+    def test_passes_single_passes_observer_through(self, mock_predict):
+        mock_predict.return_value = [[{"rise_time": "2024-01-01T00:00:00+00:00"}]]
+        response = self.client.get(
+            reverse("passes-single", args=[25544]), {"lat": "52.5", "lon": "13.4", "alt": "34", "days": "2"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["passes"]), 1)
+        observer = mock_predict.call_args.args[1]
+        self.assertAlmostEqual(observer.alt_km, 0.034)
+        self.assertEqual(mock_predict.call_args.kwargs["days"], 2.0)
+
+    def test_passes_single_returns_real_prediction(self):
+        response = self.client.get(reverse("passes-single", args=[25544]), {"lat": "0", "lon": "0"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["norad_id"], 25544)
+        self.assertIn("passes", response.data)
+
+    def test_passes_single_validates_parameters(self):
+        url = reverse("passes-single", args=[25544])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {"lat": "95", "lon": "0"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(url, {"lat": "0", "lon": "0", "days": "365"}).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_passes_single_unknown_satellite(self):
+        response = self.client.get(reverse("passes-single", args=[1]), {"lat": "0", "lon": "0"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_passes_favorites_requires_auth(self):
+        response = self.client.get(reverse("passes-favorites"), {"lat": "0", "lon": "0"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @mock.patch("satellites.services.tracking.predict_passes_many")
+    def test_passes_favorites_predicts_in_one_batch(self, mock_predict):
+        mock_predict.return_value = [[]]
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("passes-favorites"), {"lat": "52.5", "lon": "13.4"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_predict.assert_called_once()
+        self.assertEqual(len(mock_predict.call_args.args[0]), 1)
+        self.assertEqual(response.data["satellites"][0]["norad_id"], 25544)
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.test import SimpleTestCase
+from sgp4.api import Satrec
+
+from satellites.services.geodesy import look_angles
+from satellites.services.passes import Observer, predict_passes, predict_passes_many
+from satellites.services.propagation import ecef_positions, julian_dates
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2
+
+START = datetime(2024, 6, 21, tzinfo=timezone.utc)
+BERLIN = Observer(lat=52.52, lon=13.405, alt_km=0.034)
+
+
+class PassPredictionTests(SimpleTestCase):
+    def setUp(self):
+        self.sat = Satrec.twoline2rv(ISS_LINE1, ISS_LINE2)
+
+    def _brute_force(self, seconds):
+        offsets = np.arange(0.0, seconds, 1.0)
+        jd, fr = julian_dates(START, offsets)
+        _, ecef = ecef_positions(self.sat, jd, fr)
+        _, el, _ = look_angles(ecef, BERLIN.lat, BERLIN.lon, BERLIN.alt_km)
+        above = el >= 0.0
+        changes = np.flatnonzero(above[1:] != above[:-1])
+        return el, changes
+
+    def test_passes_match_one_second_brute_force(self):
+        passes = predict_passes(self.sat, BERLIN, days=1, start=START)
+        el, changes = self._brute_force(86400)
+
+        self.assertEqual(len(passes), len(changes) // 2)
+        first = passes[0]
+        rise = datetime.fromisoformat(first["rise_time"])
+        set_ = datetime.fromisoformat(first["set_time"])
+        self.assertLessEqual(abs((rise - START).total_seconds() - (changes[0] + 0.5)), 1.0)
+        self.assertLessEqual(abs((set_ - START).total_seconds() - (changes[1] + 0.5)), 1.0)
+        self.assertAlmostEqual(first["max_elevation"], el[changes[0]:changes[1] + 2].max(), places=2)
+        self.assertLess(rise, datetime.fromisoformat(first["culmination_time"]))
+        self.assertLess(datetime.fromisoformat(first["culmination_time"]), set_)
+        for key in ("rise_azimuth", "culmination_azimuth", "set_azimuth"):
+            self.assertTrue(0.0 <= first[key] < 360.0)
+
+    def test_min_elevation_filters_low_passes(self):
+        all_passes = predict_passes(self.sat, BERLIN, days=1, start=START)
+        high_passes = predict_passes(self.sat, BERLIN, days=1, start=START, min_el=30.0)
+        self.assertLess(len(high_passes), len(all_passes))
+        for item in high_passes:
+            self.assertGreaterEqual(item["max_elevation"], 30.0)
+
+    def test_batch_matches_single_satellite_prediction(self):
+        single = predict_passes(self.sat, BERLIN, days=1, start=START)
+        batch = predict_passes_many([self.sat, self.sat], BERLIN, days=1, start=START)
+        self.assertEqual(batch[0], single)
+        self.assertEqual(batch[1], single)
+
+    def test_ten_day_prediction_stays_in_window(self):
+        passes = predict_passes(self.sat, BERLIN, days=10, start=START)
+        self.assertGreater(len(passes), 10)
+        last_set = datetime.fromisoformat(passes[-1]["set_time"])
+        self.assertLessEqual(last_set, START + timedelta(days=10))
@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from satellites.services import propagation
+from satellites.services.position_cache import CACHE_ALIAS, bucket_of, cache_key, cached_position
+from satellites.tests.fixtures import DECAYED_LINE1, DECAYED_LINE2, ISS_LINE1, ISS_LINE2, ISS_NEW_LINE1, ISS_NEW_LINE2
+
+
+NOW = datetime(2024, 6, 21, 12, 34, 56, 250000, tzinfo=timezone.utc)
+
+
+@override_settings(POSITION_CACHE_QUANTUM_S=1.0)
+class PositionCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+
+    def tearDown(self):
+        caches[CACHE_ALIAS].clear()
+
+    def test_bucket_starts_on_the_quantum(self):
+        bucket, start = bucket_of(NOW, 5.0)
+        self.assertEqual(start, datetime(2024, 6, 21, 12, 34, 55, tzinfo=timezone.utc))
+        self.assertEqual(bucket_of(start, 5.0)[0], bucket)
+
+    def test_computes_once_per_bucket_and_tle(self):
+        compute = mock.Mock(side_effect=lambda when: {"timestamp": when.isoformat()})
+        first = cached_position(25544, ISS_LINE1, ISS_LINE2, NOW, compute)
+        second = cached_position(25544, ISS_LINE1, ISS_LINE2, NOW.replace(microsecond=900000), compute)
+        self.assertEqual(compute.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first["timestamp"], "2024-06-21T12:34:56+00:00")
+
+        cached_position(25544, ISS_LINE1, ISS_LINE2, NOW.replace(second=57), compute)  # next bucket
+        cached_position(25544, ISS_NEW_LINE1, ISS_NEW_LINE2, NOW, compute)  # new TLE
+        self.assertEqual(compute.call_count, 3)
+        self.assertNotEqual(cache_key(25544, ISS_LINE1, ISS_LINE2, 1), cache_key(25544, ISS_NEW_LINE1, ISS_NEW_LINE2, 1))
+
+    @override_settings(POSITION_CACHE_QUANTUM_S=0)
+    def test_zero_quantum_disables_the_cache(self):
+        compute = mock.Mock()
+        self.assertIsNone(cached_position(25544, ISS_LINE1, ISS_LINE2, NOW, compute))
+        compute.assert_not_called()
+
+    def test_propagate_now_shares_the_bucket(self):
+        with mock.patch.object(propagation, "datetime") as mock_datetime, \
+                mock.patch.object(propagation, "_position_at", wraps=propagation._position_at) as position_at:
+            mock_datetime.now.return_value = NOW
+            first = propagation.propagate_now(ISS_LINE1, ISS_LINE2, norad_id=25544)
+            mock_datetime.now.return_value = NOW.replace(microsecond=750000)
+            second = propagation.propagate_now(ISS_LINE1, ISS_LINE2, norad_id=25544)
+        self.assertEqual(position_at.call_count, 1)
+        self.assertEqual(first, second)
+        exact = propagation.propagate_now(ISS_LINE1, ISS_LINE2, timestamp=NOW.replace(microsecond=0))
+        self.assertEqual(first["timestamp"], exact["timestamp"])
+        self.assertAlmostEqual(first["lat"], exact["lat"], places=4)
+
+    def test_explicit_timestamp_bypasses_the_cache(self):
+        with mock.patch("satellites.services.propagation.cached_position") as cached:
+            propagation.propagate_now(ISS_LINE1, ISS_LINE2, norad_id=25544, timestamp=NOW)
+        cached.assert_not_called()
+
+    def test_errors_are_not_cached(self):
+        later = NOW.replace(year=2025)
+        with mock.patch.object(propagation, "datetime") as mock_datetime:
+            mock_datetime.now.return_value = later
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    propagation.propagate_now(DECAYED_LINE1, DECAYED_LINE2, norad_id=40000)
@@ -6,6 +6,7 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from satellites.models import Favorite
+from satellites.services.tle_refresh import RefreshResult
 
 
 class PositionsBatchAPITests(APITestCase):
@@ -18,11 +19,13 @@ class PositionsBatchAPITests(APITestCase):
         response = self.client.get(reverse("positions-batch"))
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    @mock.patch("satellites.services.tracking.refresh_stale_tles")
     @mock.patch("satellites.services.tracking.propagate_now")
     @mock.patch("satellites.services.tracking.get_or_refresh_tle")
     def test_positions_batch_returns_user_positions(
-        self, mock_get_or_refresh, mock_propagate
+        self, mock_get_or_refresh, mock_propagate, mock_refresh
     ):
+        mock_refresh.return_value = RefreshResult([], {}, None)
         mock_get_or_refresh.return_value = ("Fav", "line1", "line2")
         mock_propagate.return_value = {"lat": 1.0, "lon": 2.0, "timestamp": "2024-01-01T00:00:00+00:00"}
 
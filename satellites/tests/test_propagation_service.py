@@ -1,10 +1,13 @@
 import math
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from unittest import mock
 
+import numpy as np
+
 from django.test import SimpleTestCase
 
 from satellites.services import propagation
+from satellites.tests.fixtures import DECAYED_LINE1, DECAYED_LINE2, ISS_LINE1, ISS_LINE2
 
 
 class PropagationServiceTests(SimpleTestCase):
@@ -25,7 +28,7 @@ class PropagationServiceTests(SimpleTestCase):
             (0.0, 7.5, 0.0),
         )
         mock_satrec.twoline2rv.return_value = mock_sat
-        mock_transform.transform.return_value = (10.0, 20.0, 400000.0)
+        mock_transform.return_value = (20.0, 10.0, 400.0)
 
         ts = datetime(2024, 1, 1, tzinfo=timezone.utc)
         data = propagation.propagate_now("line1", "line2", timestamp=ts)
@@ -33,3 +36,56 @@ class PropagationServiceTests(SimpleTestCase):
         self.assertEqual(data["timestamp"], ts.isoformat())
         self.assertAlmostEqual(data["alt_km"], 400.0)
         mock_sat.sgp4.assert_called_once()
+
+
+class PropagateManyTests(SimpleTestCase):
+    def test_propagate_many_matches_propagate_now(self):
+        ts = datetime(2024, 6, 21, 12, 30, tzinfo=timezone.utc)
+        single = propagation.propagate_now(ISS_LINE1, ISS_LINE2, timestamp=ts)
+        batch = propagation.propagate_many([(ISS_LINE1, ISS_LINE2)] * 3, timestamp=ts)
+
+        self.assertEqual(len(batch), 3)
+        for item in batch:
+            self.assertEqual(set(item), set(single))
+            self.assertEqual(item["timestamp"], single["timestamp"])
+            for key in ("lat", "lon", "alt_km", "vel_kms"):
+                self.assertAlmostEqual(item[key], single[key], places=6)
+
+    def test_propagate_many_marks_failed_satellites_as_none(self):
+        ts = datetime(2025, 6, 21, tzinfo=timezone.utc)
+        batch = propagation.propagate_many(
+            [(ISS_LINE1, ISS_LINE2), (DECAYED_LINE1, DECAYED_LINE2)], timestamp=ts
+        )
+        self.assertIsNotNone(batch[0])
+        self.assertIsNone(batch[1])
+
+    def test_propagate_many_handles_empty_input(self):
+        self.assertEqual(propagation.propagate_many([]), [])
+
+
+class PropagateTrackTests(SimpleTestCase):
+    def test_track_matches_propagate_now_at_each_instant(self):
+        start = datetime(2024, 6, 21, 12, 0, tzinfo=timezone.utc)
+        end = datetime(2024, 6, 21, 12, 30, tzinfo=timezone.utc)
+        track = propagation.propagate_track(
+            ISS_LINE1, ISS_LINE2, start=start, end=end, step_seconds=600
+        )
+
+        self.assertEqual(track["offsets_s"].tolist(), [0.0, 600.0, 1200.0, 1800.0])
+        for i, offset in enumerate(track["offsets_s"]):
+            single = propagation.propagate_now(
+                ISS_LINE1, ISS_LINE2, timestamp=start + timedelta(seconds=float(offset))
+            )
+            self.assertAlmostEqual(track["lat"][i], single["lat"], places=6)
+            self.assertAlmostEqual(track["lon"][i], single["lon"], places=6)
+            self.assertAlmostEqual(track["alt_km"][i], single["alt_km"], places=6)
+
+    def test_gmst_from_jd_accepts_arrays(self):
+        values = propagation._gmst_from_jd(np.array([2451545.0, 2451545.5]))
+        self.assertEqual(values.shape, (2,))
+        self.assertAlmostEqual(values[0], propagation._gmst_from_jd(2451545.0))
+
+    def test_track_rejects_non_positive_step(self):
+        start = datetime(2024, 6, 21, tzinfo=timezone.utc)
+        with self.assertRaises(ValueError):
+            propagation.propagate_track(ISS_LINE1, ISS_LINE2, start=start, end=start, step_seconds=0)
@@ -18,8 +18,17 @@ class SatelliteAPITests(TestCase):
     def test_satellite_list_endpoint_returns_catalog(self):
         response = self.client.get(reverse("satellites-list"))
         self.assertEqual(response.status_code, 200)
-        self.assertGreaterEqual(len(response.json()), 1)
+        self.assertGreaterEqual(len(response.json()["results"]), 1)
+        self.assertEqual(response.json()["results"][0]["norad_id"], self.tle.norad_id)
+        self.assertIsNone(response.json()["next"])
+
+    def test_full_dump_stays_available(self):
+        response = self.client.get(reverse("satellites-list"), {"all": "1"})
+        self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()[0]["norad_id"], self.tle.norad_id)
+        # the keyset page renders the rows the same way
+        page = self.client.get(reverse("satellites-list")).json()["results"]
+        self.assertEqual(page, response.json())
 
     @mock.patch("satellites.views.satellite_position_payload")
     def test_position_single_returns_payload(self, mock_payload):
@@ -37,4 +46,47 @@ class SatelliteAPITests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["norad_id"], self.tle.norad_id)
-        mock_payload.assert_called_once_with(self.tle.norad_id)
+        mock_payload.assert_called_once_with(self.tle.norad_id, at=None)
+
+
+class SatelliteListPaginationTests(TestCase):
+    def setUp(self):
+        TLE.objects.bulk_create([
+            TLE(norad_id=norad_id, name=f"SAT {norad_id}", line1=f"1 {norad_id:05d}U", line2=f"2 {norad_id:05d}")
+            for norad_id in range(1, 26)
+        ])
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1="1 25544U", line2="2 25544")
+
+    def test_pages_walk_the_whole_catalog(self):
+        url = reverse("satellites-list") + "?limit=10&fields=norad_id"
+        seen = []
+        pages = 0
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url).json()
+            seen += [row["norad_id"] for row in data["results"]]
+            url = data["next"]
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [*range(1, 26), 25544])
+
+    def test_next_keeps_the_other_parameters(self):
+        data = self.client.get(reverse("satellites-list"), {"limit": "5", "fields": "norad_id,name"}).json()
+        self.assertEqual(data["results"][0], {"norad_id": 1, "name": "SAT 1"})
+        self.assertIn("after=5", data["next"])
+        self.assertIn("fields=norad_id%2Cname", data["next"])
+        self.assertEqual(self.client.get(data["next"]).json()["results"][0]["norad_id"], 6)
+
+    def test_fields_leave_out_the_lines(self):
+        rows = self.client.get(reverse("satellites-list"), {"fields": "name"}).json()["results"]
+        self.assertEqual(rows[0], {"name": "SAT 1"})
+
+    def test_search(self):
+        url = reverse("satellites-list")
+        self.assertEqual([r["norad_id"] for r in self.client.get(url, {"search": "iss"}).json()["results"]], [25544])
+        self.assertEqual([r["norad_id"] for r in self.client.get(url, {"search": "25544"}).json()["results"]], [25544])
+
+    def test_bad_parameters(self):
+        url = reverse("satellites-list")
+        for params in ({"fields": "line3"}, {"after": "abc"}, {"limit": "0"}, {"limit": "100000"}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+
+from django.test import SimpleTestCase, TestCase
+
+from satellites.models import TLE
+from satellites.services import propagation
+from satellites.services.satrec_cache import SatrecCache, satrec_cache
+from satellites.services.tle_fetcher import upsert_tles
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2, OTHER_LINE1, OTHER_LINE2
+
+
+class SatrecCacheTests(SimpleTestCase):
+    def test_get_counts_hits_and_misses(self):
+        cache = SatrecCache(maxsize=4)
+        first = cache.get(25544, ISS_LINE1, ISS_LINE2)
+        second = cache.get(25544, ISS_LINE1, ISS_LINE2)
+
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = SatrecCache(maxsize=2)
+        cache.get(25544, ISS_LINE1, ISS_LINE2)
+        cache.get(40000, OTHER_LINE1, OTHER_LINE2)
+        cache.get(25544, ISS_LINE1, ISS_LINE2)  # ISS is now the most recent
+        cache.get(1, OTHER_LINE1, OTHER_LINE2)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.invalidate(40000), 0)
+        self.assertEqual(cache.invalidate(25544), 1)
+
+    def test_propagate_now_uses_cache_when_norad_id_given(self):
+        satrec_cache.clear()
+        ts = datetime(2024, 6, 21, tzinfo=timezone.utc)
+        propagation.propagate_now(ISS_LINE1, ISS_LINE2, timestamp=ts, norad_id=25544)
+        propagation.propagate_now(ISS_LINE1, ISS_LINE2, timestamp=ts, norad_id=25544)
+        self.assertEqual(satrec_cache.stats()["hits"], 1)
+        satrec_cache.clear()
+
+
+class SatrecCacheInvalidationTests(TestCase):
+    def tearDown(self):
+        satrec_cache.clear()
+
+    def test_upsert_tles_invalidates_cached_satrec(self):
+        satrec_cache.get(25544, ISS_LINE1, ISS_LINE2)
+        upsert_tles([{"norad_id": 25544, "name": "ISS", "line1": ISS_LINE1, "line2": ISS_LINE2}])
+        self.assertEqual(len(satrec_cache), 0)
+        self.assertTrue(TLE.objects.filter(pk=25544).exists())
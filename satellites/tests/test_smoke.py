@@ -3,6 +3,7 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from satellites.models import TLE
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2, OTHER_LINE1, OTHER_LINE2
 
 """Basic smoke tests for key views."""
 
@@ -19,8 +20,8 @@ class CatalogTests(TestCase):
         TLE.objects.create(
             norad_id=25544,
             name="ISS (ZARYA)",
-            line1="1 25544U 98067A   24172.54827691  .00016679  00000+0  29994-3 0  9994",
-            line2="2 25544  51.6423  24.7205 0002520 156.6827  51.9026 15.50025038393561",
+            line1=ISS_LINE1,
+            line2=ISS_LINE2,
         )
 
     # test that the catalog page renders correctly
@@ -42,8 +43,8 @@ class FavoritesTests(TestCase):
         TLE.objects.create(
             norad_id=40000,
             name="TEST SAT",
-            line1="1 40000U 14001A   24172.54827691  .00000000  00000+0  00000-0 0  9995",
-            line2="2 40000  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123456",
+            line1=OTHER_LINE1,
+            line2=OTHER_LINE2,
         )
 
     def test_favorites_requires_login(self):
@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from satellites.models import TLE
+from satellites.services import snapshot
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2, OTHER_LINE1, OTHER_LINE2
+
+
+class SnapshotTestMixin:
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            POSITION_SNAPSHOT_PATH=str(Path(self.tmpdir) / "positions.snapshot"),
+            CATALOG_SNAPSHOT_PATH=str(Path(self.tmpdir) / "catalog.snapshot"),
+            POSITION_SNAPSHOT_BACKGROUND=False,
+        )
+        self.settings_override.enable()
+        snapshot.reset_catalog_cache()
+        TLE.objects.create(norad_id=25544, name="ISS (ZARYA)", line1=ISS_LINE1, line2=ISS_LINE2)
+        TLE.objects.create(norad_id=40000, name="TEST SAT", line1=OTHER_LINE1, line2=OTHER_LINE2)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+        snapshot.reset_catalog_cache()
+
+
+class SnapshotServiceTests(SnapshotTestMixin, TestCase):
+    def test_refresh_writes_memory_mapped_snapshot(self):
+        first = snapshot.refresh_snapshot()
+        self.assertEqual(first.generation, 1)
+        self.assertEqual(sorted(first.data["norad_id"].tolist()), [25544, 40000])
+
+        loaded = snapshot.read_snapshot(snapshot.snapshot_path())
+        self.assertEqual(loaded.generation, 1)
+        self.assertEqual(loaded.data.tolist(), first.data.tolist())
+
+        second = snapshot.refresh_snapshot()
+        self.assertEqual(second.generation, 2)
+        self.assertEqual(snapshot.load_snapshot().generation, 2)
+
+    def test_refresh_reuses_recent_snapshot(self):
+        snapshot.refresh_snapshot()
+        again = snapshot.refresh_snapshot(min_age=60)
+        self.assertEqual(again.generation, 1)
+
+    def test_get_snapshot_rebuilds_when_too_old(self):
+        first = snapshot.refresh_snapshot()
+        with mock.patch.object(snapshot, "snapshot_max_age", return_value=-1.0), \
+                mock.patch.object(snapshot, "snapshot_interval", return_value=0.0):
+            rebuilt = snapshot.get_snapshot()
+        self.assertGreater(rebuilt.generation, first.generation)
+
+    def test_catalog_is_parsed_once_until_it_changes(self):
+        first = snapshot.load_catalog()
+        self.assertIs(snapshot.load_catalog(), first)
+        TLE.objects.filter(pk=40000).delete()
+        self.assertEqual(snapshot.load_catalog().norad_ids.tolist(), [25544])
+
+    def test_positions_all_endpoint_serves_snapshot(self):
+        response = self.client.get(reverse("positions-all"))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["generation"], 1)
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(response["X-Snapshot-Generation"], "1")
+        iss = next(item for item in data["positions"] if item["norad_id"] == 25544)
+        self.assertEqual(iss["name"], "ISS (ZARYA)")
+        self.assertEqual(set(iss), {"norad_id", "name", "lat", "lon", "alt_km", "vel_kms"})
+
+    def test_refresh_positions_command_runs_once(self):
+        out = StringIO()
+        call_command("refresh_positions", "--once", stdout=out)
+        self.assertIn("Snapshot generation 1", out.getvalue())
+        self.assertEqual(snapshot.load_snapshot().generation, 1)
+
+    def test_snapshot_age_uses_its_timestamp(self):
+        current = snapshot.refresh_snapshot()
+        older = current._replace(timestamp=current.timestamp - timedelta(minutes=5))
+        self.assertGreater(older.age_seconds, 299)
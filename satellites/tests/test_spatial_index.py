@@ -0,0 +1,54 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from satellites.services.spatial import LatLonGrid, grid_candidate_pairs
+
+
+class GridCandidatePairsTests(SimpleTestCase):
+    def test_returns_every_pair_closer_than_the_cell_size(self):
+        rng = np.random.default_rng(7)
+        points = rng.uniform(-2000.0, 2000.0, size=(1500, 3))
+        i, j = grid_candidate_pairs(points, 150.0)
+
+        dist = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=-1)
+        close_i, close_j = np.nonzero(np.triu(dist < 150.0, 1))
+        candidates = set(zip(i.tolist(), j.tolist()))
+        self.assertTrue(set(zip(close_i.tolist(), close_j.tolist())) <= candidates)
+        self.assertTrue(np.all(i < j))
+        self.assertEqual(len(candidates), len(i))  # no pair twice
+        self.assertLess(len(i), len(points) * (len(points) - 1) // 20)  # far fewer than all pairs
+
+    def test_ignores_failed_positions(self):
+        points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [np.nan, np.nan, np.nan], [2.0, 0.0, 0.0]])
+        i, j = grid_candidate_pairs(points, 10.0)
+        self.assertEqual(sorted(zip(i.tolist(), j.tolist())), [(0, 1), (0, 3), (1, 3)])
+
+    def test_handles_fewer_than_two_points(self):
+        i, j = grid_candidate_pairs(np.zeros((1, 3)), 10.0)
+        self.assertEqual(i.size, 0)
+        self.assertEqual(j.size, 0)
+
+
+class LatLonGridTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.lat = rng.uniform(-90.0, 90.0, 20000)
+        self.lon = rng.uniform(-180.0, 180.0, 20000)
+        self.grid = LatLonGrid(self.lat, self.lon, cell_deg=2.0)
+
+    def _brute(self, min_lat, max_lat, min_lon, max_lon):
+        lat_ok = (self.lat >= min_lat) & (self.lat <= max_lat)
+        if min_lon > max_lon:
+            lon_ok = (self.lon >= min_lon) | (self.lon <= max_lon)
+        else:
+            lon_ok = (self.lon >= min_lon) & (self.lon <= max_lon)
+        return np.flatnonzero(lat_ok & lon_ok).tolist()
+
+    def test_matches_brute_force(self):
+        for box in ((-10.3, 25.7, 5.1, 60.9), (-90.0, 90.0, -180.0, 180.0), (44.0, 44.5, 3.0, 3.2), (0.0, 0.0, 0.0, 0.0)):
+            self.assertEqual(self.grid.query(*box).tolist(), self._brute(*box), box)
+
+    def test_box_across_the_antimeridian(self):
+        found = self.grid.query(-30.0, 30.0, 170.0, -170.0)
+        self.assertEqual(found.tolist(), self._brute(-30.0, 30.0, 170.0, -170.0))
+        self.assertTrue(np.all(np.abs(self.lon[found]) >= 170.0))
@@ -1,15 +1,22 @@
+import threading
 from datetime import datetime, timedelta, timezone
 from unittest import mock
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 
 from satellites.models import TLE
 from satellites.services import tle_fetcher
+from satellites.services.tle_parser import tle_content_hash
+from satellites.services.tle_refresh import refresh_stale_tles
+from satellites.services.upstream import NOT_FOUND, celestrak_breaker, negative_cache
 
 
 class FakeResponse:
     def __init__(self, text: str):
         self.text = text
+        self.status_code = 200
+        self.headers = {}
+        self.num_bytes_downloaded = len(text)
 
     def raise_for_status(self):
         return None
@@ -21,7 +28,7 @@ class FakeClient:
         self.requested_url = None
         self.closed = False
 
-    def get(self, url: str):
+    def get(self, url: str, headers=None):
         self.requested_url = url
         return self._response
 
@@ -35,7 +42,7 @@ class TLEFetcherTests(TestCase):
             [
                 "SAT A",
                 "1 12345U 20000A   00000.00000000  .00000000  00000-0  00000-0 0  0000",
-                "2 12345  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123456",
+                "2 12345  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123452",
             ]
         )
 
@@ -46,7 +53,7 @@ class TLEFetcherTests(TestCase):
 
     def test_fetch_tle_uses_injected_client(self):
         client = FakeClient(self.sample_text)
-        name, line1, line2 = tle_fetcher.fetch_tle_from_celestrak(12345, client=client)
+        name, line1, line2, _ = tle_fetcher.fetch_tle_from_celestrak(12345, client=client)
         self.assertEqual(name, "SAT A")
         self.assertTrue(client.closed is False)
         self.assertIn("CATNR=12345", client.requested_url)
@@ -61,6 +68,7 @@ class TLEFetcherTests(TestCase):
         )
         self.assertEqual((name, line1, line2), ("Old", "L1", "L2"))
 
+    @override_settings(TLE_REFRESH_POLICY="blocking")
     def test_get_or_refresh_tle_fetches_when_stale(self):
         tle = TLE.objects.create(
             norad_id=12345, name="Old", line1="L1", line2="L2"
@@ -76,3 +84,197 @@ class TLEFetcherTests(TestCase):
         self.assertEqual(name, "SAT A")
         tle.refresh_from_db()
         self.assertEqual(tle.name, "SAT A")
+
+    @override_settings(TLE_REFRESH_POLICY="blocking")
+    def test_refresh_keeps_a_newer_stored_tle(self):
+        line1 = "1 12345U 20000A   24100.00000000  .00000000  00000-0  00000-0 0  0000"
+        TLE.objects.create(norad_id=12345, name="Newer", line1=line1, line2="L2")
+        stale_time = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        TLE.objects.filter(pk=12345).update(updated_at=stale_time)
+
+        name, _, _ = tle_fetcher.get_or_refresh_tle(
+            12345, max_age_hours=24, now=stale_time + timedelta(days=3), client=FakeClient(self.sample_text)
+        )
+        self.assertEqual(name, "Newer")
+        tle = TLE.objects.get(pk=12345)
+        self.assertEqual(tle.line1, line1)
+        self.assertGreater(tle.updated_at, stale_time)  # checked, so fresh again
+
+
+class UpsertTLEsTests(TestCase):
+    def _record(self, norad_id, name="SAT", rev="1"):
+        return {
+            "norad_id": norad_id,
+            "name": name,
+            "line1": f"1 {norad_id:05d}U 20000A   00000.00000000  .00000000  00000-0  00000-0 0  000{rev}",
+            "line2": f"2 {norad_id:05d}  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123456",
+        }
+
+    def test_counts_inserted_updated_and_unchanged_rows(self):
+        first = tle_fetcher.upsert_tles([self._record(n) for n in range(1, 6)], chunk_size=2)
+        self.assertEqual(first, tle_fetcher.UpsertResult(inserted=5, updated=0, unchanged=0))
+
+        records = [self._record(1, rev="2"), self._record(2, name="RENAMED"), self._record(3), self._record(7)]
+        second = tle_fetcher.upsert_tles(records, chunk_size=3)
+        self.assertEqual(second, tle_fetcher.UpsertResult(inserted=1, updated=2, unchanged=1))
+        self.assertEqual(second.total, 4)
+        self.assertEqual(TLE.objects.count(), 6)
+        self.assertTrue(TLE.objects.get(pk=1).line1.endswith("0002"))
+        self.assertEqual(TLE.objects.get(pk=2).name, "RENAMED")
+
+    def test_unchanged_rows_are_not_touched(self):
+        tle_fetcher.upsert_tles([self._record(1)])
+        old = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        TLE.objects.filter(pk=1).update(updated_at=old)
+        with self.assertNumQueries(3):  # savepoint, select, release
+            result = tle_fetcher.upsert_tles([self._record(1)])
+        self.assertEqual(result.unchanged, 1)
+        self.assertEqual(TLE.objects.get(pk=1).updated_at, old)
+
+    def test_touch_unchanged_marks_checked_rows_fresh(self):
+        tle_fetcher.upsert_tles([self._record(1)])
+        old = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        TLE.objects.filter(pk=1).update(updated_at=old)
+        with mock.patch.object(TLE.objects, "bulk_create") as bulk_create:
+            result = tle_fetcher.upsert_tles([self._record(1)], touch_unchanged=True)
+        bulk_create.assert_not_called()
+        self.assertEqual(result.unchanged, 1)
+        self.assertGreater(TLE.objects.get(pk=1).updated_at, old)
+
+    def test_older_epoch_is_rejected(self):
+        newer = self._record(1)
+        newer["line1"] = newer["line1"].replace("00000.00000000", "24100.50000000")
+        older = self._record(1, name="OLD")
+        older["line1"] = older["line1"].replace("00000.00000000", "24099.00000000")
+        tle_fetcher.upsert_tles([newer])
+
+        result = tle_fetcher.upsert_tles([older])
+        self.assertEqual(result, tle_fetcher.UpsertResult(inserted=0, updated=0, unchanged=0, rejected=1))
+        tle = TLE.objects.get(pk=1)
+        self.assertEqual((tle.name, tle.line1), ("SAT", newer["line1"]))
+        self.assertEqual(tle.epoch, datetime(2024, 4, 9, 12, tzinfo=timezone.utc))
+        self.assertEqual(tle.content_hash, tle_content_hash("SAT", newer["line1"], newer["line2"]))
+
+    def test_same_epoch_with_new_content_is_written(self):
+        tle_fetcher.upsert_tles([self._record(1)])
+        result = tle_fetcher.upsert_tles([self._record(1, name="RENAMED")])
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(TLE.objects.get(pk=1).name, "RENAMED")
+
+    def test_save_fills_epoch_and_hash(self):
+        record = self._record(5)
+        tle = TLE.objects.create(**record)
+        self.assertEqual(tle.epoch, datetime(1999, 12, 31, tzinfo=timezone.utc))
+        self.assertEqual(tle.content_hash, tle_content_hash(record["name"], record["line1"], record["line2"]))
+        # nothing to do for the bulk upsert afterwards
+        self.assertEqual(tle_fetcher.upsert_tles([record]).unchanged, 1)
+
+    def test_duplicate_ids_keep_the_last_record(self):
+        result = tle_fetcher.upsert_tles([self._record(1, name="A"), self._record(1, name="B")])
+        self.assertEqual(result.inserted, 1)
+        self.assertEqual(TLE.objects.get(pk=1).name, "B")
+
+    def test_query_count_does_not_grow_with_the_rows(self):
+        tle_fetcher.upsert_tles([self._record(n) for n in range(1, 51)])
+        records = [self._record(n, rev="2" if n % 2 else "1") for n in range(1, 101)]
+        # savepoint and its release, one select, one insert ... on conflict for the changed rows and one insert
+        # into the TLE history
+        with self.assertNumQueries(5):
+            tle_fetcher.upsert_tles(records, chunk_size=100)
+
+
+@override_settings(TLE_REFRESH_POLICY="swr", TLE_STALE_LIMIT_HOURS=168)
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        self.now = datetime(2024, 1, 10, tzinfo=timezone.utc)
+        self.client = FakeClient("\n".join([
+            "SAT A",
+            "1 12345U 20000A   00000.00000000  .00000000  00000-0  00000-0 0  0000",
+            "2 12345  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123452",
+        ]))
+
+    def _stored(self, age):
+        TLE.objects.create(norad_id=12345, name="Old", line1="L1", line2="L2")
+        TLE.objects.filter(pk=12345).update(updated_at=self.now - age)
+
+    @mock.patch.object(tle_fetcher.background_refresher, "submit")
+    def test_stale_row_is_served_and_refreshed_in_the_background(self, mock_submit):
+        self._stored(timedelta(days=3))
+        result = tle_fetcher.get_or_refresh_tle(12345, max_age_hours=48, now=self.now, client=self.client)
+        self.assertEqual(result, ("Old", "L1", "L2"))
+        self.assertIsNone(self.client.requested_url)
+        mock_submit.assert_called_once_with(12345, 48)
+
+    @mock.patch.object(tle_fetcher.background_refresher, "submit")
+    def test_no_background_refresh_while_upstream_is_avoided(self, mock_submit):
+        self.addCleanup(negative_cache.clear)
+        self.addCleanup(celestrak_breaker.reset)
+        self._stored(timedelta(days=3))
+        negative_cache.record(12345, NOT_FOUND, "decayed")
+        self.assertEqual(tle_fetcher.get_or_refresh_tle(12345, now=self.now, client=self.client)[0], "Old")
+        negative_cache.clear()
+        for _ in range(celestrak_breaker.threshold):
+            celestrak_breaker.record_failure()
+        self.assertEqual(tle_fetcher.get_or_refresh_tle(12345, now=self.now, client=self.client)[0], "Old")
+        mock_submit.assert_not_called()
+
+    @mock.patch.object(tle_fetcher.background_refresher, "submit")
+    def test_blocks_past_the_stale_limit_or_without_a_row(self, mock_submit):
+        self._stored(timedelta(days=8))
+        self.assertEqual(tle_fetcher.get_or_refresh_tle(12345, now=self.now, client=self.client)[0], "SAT A")
+        TLE.objects.all().delete()
+        self.assertEqual(tle_fetcher.get_or_refresh_tle(12345, now=self.now, client=self.client)[0], "SAT A")
+        mock_submit.assert_not_called()
+
+    @mock.patch.object(tle_fetcher.background_refresher, "submit")
+    def test_blocking_policy_per_call(self, mock_submit):
+        self._stored(timedelta(days=3))
+        name, _, _ = tle_fetcher.get_or_refresh_tle(12345, now=self.now, client=self.client, policy="blocking")
+        self.assertEqual(name, "SAT A")
+        mock_submit.assert_not_called()
+
+    @override_settings(TLE_REFRESH_POLICY="eventually")
+    def test_unknown_policy(self):
+        self._stored(timedelta(days=3))
+        with self.assertRaises(ValueError):
+            tle_fetcher.get_or_refresh_tle(12345, now=self.now, client=self.client)
+
+    def test_batch_refresh_only_blocks_for_unusable_tles(self):
+        TLE.objects.create(norad_id=1, name="STALE", line1="L1", line2="L2")
+        TLE.objects.filter(pk=1).update(updated_at=datetime.now(timezone.utc) - timedelta(days=3))
+        with mock.patch("satellites.services.tle_refresh.tle_refresher.refresh") as mock_refresh:
+            refresh_stale_tles([1, 2], max_age_hours=48)
+        mock_refresh.assert_called_once_with([2])
+
+
+class BackgroundRefresherTests(SimpleTestCase):
+    def test_queues_each_norad_id_once_at_a_time(self):
+        refresher = tle_fetcher.BackgroundRefresher(workers=1)
+        release = threading.Event()
+        refreshed = []
+
+        def refresh(norad_id, max_age_hours, now, client):
+            release.wait(5)
+            refreshed.append(norad_id)
+            return ("N", "1", "2")
+
+        with mock.patch.object(tle_fetcher, "_refresh_with_lease", side_effect=refresh):
+            self.assertTrue(refresher.submit(1, 48))
+            self.assertFalse(refresher.submit(1, 48))
+            self.assertTrue(refresher.submit(2, 48))
+            release.set()
+            refresher.shutdown(wait=True)
+
+        self.assertEqual(refreshed, [1, 2])
+        self.assertEqual(refresher.pending(), set())
+
+    def test_failures_are_swallowed(self):
+        refresher = tle_fetcher.BackgroundRefresher(workers=1)
+        with mock.patch.object(tle_fetcher, "_refresh_with_lease", side_effect=tle_fetcher.TLENotFound("gone")), \
+                self.assertLogs("satellites.services.tle_fetcher", "INFO") as logs:
+            refresher.submit(1, 48)
+            refresher.shutdown(wait=True)
+        self.assertEqual(refresher.pending(), set())
+        # an expected failure is one line, no traceback
+        self.assertEqual([record.levelname for record in logs.records], ["INFO"])
+        self.assertIsNone(logs.records[0].exc_info)
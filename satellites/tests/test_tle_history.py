@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from satellites.models import TLE, TLEHistory
+from satellites.services.tle_fetcher import UpsertResult, upsert_tles
+from satellites.services.tle_history import compact_history, tle_at
+from satellites.services.tle_parser import iter_tles
+from satellites.tests.fixtures import tle_line
+
+
+def _record(epoch_day: str, norad_id: int = 25544, name: str = "ISS (ZARYA)", raan: str = "24.7205"):
+    """A TLE record of the ISS orbit with the epoch (YYDDD.DDDDDDDD) and right ascension given."""
+    return {
+        "norad_id": norad_id,
+        "name": name,
+        "line1": tle_line(f"1 {norad_id:05d}U 98067A   {epoch_day}  .00016679  00000+0  29994-3 0  999"),
+        "line2": tle_line(f"2 {norad_id:05d}  51.6423 {raan:>8} 0002520 156.6827  51.9026 15.5002503839356"),
+    }
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TLEAtTests(TestCase):
+    def setUp(self):
+        # three element sets, imported newest first: the older two only end up in the history
+        for day, raan in (("24172.50000000", "30.0000"), ("24170.50000000", "20.0000"), ("24160.50000000", "10.0000")):
+            upsert_tles([_record(day, raan=raan)])
+
+    def test_imports_are_recorded(self):
+        self.assertEqual(TLEHistory.objects.filter(norad_id=25544).count(), 3)
+        self.assertIn("30.0000", TLE.objects.get(pk=25544).line2)
+
+    def test_closest_epoch_wins(self):
+        self.assertIn("10.0000", tle_at(25544, _utc(2024, 6, 1)).line2)  # before all of them
+        self.assertIn("10.0000", tle_at(25544, _utc(2024, 6, 13)).line2)  # nearer June 8 than June 18
+        self.assertIn("20.0000", tle_at(25544, _utc(2024, 6, 16)).line2)
+        self.assertIn("20.0000", tle_at(25544, _utc(2024, 6, 18, 12)).line2)  # exactly on the epoch
+        latest = tle_at(25544, _utc(2025, 1, 1))
+        self.assertIn("30.0000", latest.line2)
+        self.assertEqual((latest.epoch, latest.source), (_utc(2024, 6, 20, 12), "history"))
+
+    def test_no_history_falls_back_to_the_current_tle(self):
+        TLE.objects.create(**_record("24172.50000000", norad_id=40000, name="TEST SAT"))
+        historical = tle_at(40000, _utc(2020, 1, 1))
+        self.assertEqual((historical.name, historical.source), ("TEST SAT", "current"))
+        with self.assertRaises(TLE.DoesNotExist):
+            tle_at(99999, _utc(2020, 1, 1))
+
+    def test_unchanged_reimport_is_not_recorded_again(self):
+        self.assertEqual(upsert_tles([_record("24172.50000000", raan="30.0000")]).unchanged, 1)
+        self.assertEqual(TLEHistory.objects.count(), 3)
+
+
+class BackfillTests(TestCase):
+    def test_stream_with_several_epochs_per_satellite(self):
+        records = [
+            _record("24150.00000000", raan="1.0000"),
+            _record("24152.00000000", raan="2.0000"),
+            _record("24151.00000000", raan="3.0000"),
+            _record("24151.00000000", norad_id=40000, name="TEST SAT"),
+        ]
+        text = "\n".join(line for r in records for line in (r["name"], r["line1"], r["line2"])) + "\n"
+
+        result = upsert_tles(list(iter_tles(text.splitlines())))
+
+        self.assertEqual(result, UpsertResult(inserted=2, updated=0, unchanged=0))
+        self.assertIn("2.0000", TLE.objects.get(pk=25544).line2)  # the freshest, not the last one read
+        self.assertEqual(TLEHistory.objects.filter(norad_id=25544).count(), 3)
+        self.assertEqual(TLEHistory.objects.filter(norad_id=40000).count(), 1)
+
+    def test_an_older_dump_fills_the_history_only(self):
+        upsert_tles([_record("24172.50000000", raan="30.0000")])
+        result = upsert_tles([_record("23001.50000000", raan="5.0000")])
+        self.assertEqual(result.rejected, 1)
+        self.assertIn("30.0000", TLE.objects.get(pk=25544).line2)
+        self.assertIn("5.0000", tle_at(25544, _utc(2023, 1, 1)).line2)
+
+
+class HistoryAPITests(TestCase):
+    def setUp(self):
+        upsert_tles([_record("24100.00000000", raan="10.0000")])
+        upsert_tles([_record("24172.50000000", raan="200.0000")])
+
+    def test_position_at_t_uses_the_historical_tle(self):
+        url = reverse("position-single", args=[25544])
+        past = self.client.get(url, {"t": "2024-04-09T00:00:00Z"}).json()
+        self.assertEqual(past["tle_epoch"], "2024-04-09T00:00:00+00:00")
+        self.assertEqual(past["timestamp"], "2024-04-09T00:00:00+00:00")
+        self.assertEqual(self.client.get(url, {"t": "2024-06-20T12:00:00Z"}).json()["tle_epoch"], "2024-06-20T12:00:00+00:00")
+        self.assertEqual(self.client.get(url, {"t": "not a time"}).status_code, 400)
+
+    def test_track_window_defaults_to_t_plus_minus_90_minutes(self):
+        data = self.client.get(reverse("position-track", args=[25544]), {"t": "2024-04-09T00:00:00Z", "step": "60"}).json()
+        self.assertEqual(data["tle_epoch"], "2024-04-09T00:00:00+00:00")
+        self.assertEqual(data["start"], "2024-04-08T22:30:00+00:00")
+        self.assertEqual(data["end"], "2024-04-09T01:30:00+00:00")
+        self.assertEqual(len(data["points"]), 181)
+
+
+class CompactHistoryTests(TestCase):
+    def setUp(self):
+        now = _utc(2024, 6, 30)
+        self.now = now
+        for days_ago in (100, 60):
+            for hour in (2, 10, 20):
+                when = now - timedelta(days=days_ago) + timedelta(hours=hour)
+                TLEHistory.objects.create(norad_id=25544, epoch=when, name="ISS", line1="l1", line2="l2")
+        TLEHistory.objects.create(norad_id=25544, epoch=now - timedelta(days=1), name="ISS", line1="l1", line2="l2")
+        TLEHistory.objects.create(norad_id=25544, epoch=now - timedelta(hours=12), name="ISS", line1="l1", line2="l2")
+
+    def test_old_days_keep_their_last_element_set(self):
+        self.assertEqual(compact_history(now=self.now, compact_after_days=30, retention_days=0), (0, 4))
+        kept = list(TLEHistory.objects.values_list("epoch", flat=True))
+        self.assertEqual(len(kept), 4)
+        self.assertIn(self.now - timedelta(days=100, hours=-20), kept)
+        self.assertIn(self.now - timedelta(hours=12), kept)
+
+    def test_retention_expires_old_rows(self):
+        self.assertEqual(compact_history(now=self.now, compact_after_days=30, retention_days=90), (3, 2))
+        self.assertEqual(TLEHistory.objects.count(), 3)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("compact_tle_history", "--compact-after-days", "0", "--retention-days", "3650", stdout=out)
+        self.assertIn("0 expired, 0 compacted away, 8 kept", out.getvalue())
@@ -0,0 +1,134 @@
+import gzip
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from satellites.models import TLE
+from satellites.services.tle_fetcher import upsert_tle_stream
+from satellites.services.tle_parser import ParseStats, catalog_number, iter_chunks, iter_tles, open_tle_file, tle_checksum, tle_epoch
+from satellites.tests.fixtures import tle_line, tle_lines
+
+
+class IterTLEsTests(SimpleTestCase):
+    def test_checksum_of_a_real_line(self):
+        line = "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927"
+        self.assertEqual(tle_checksum(line), 7)
+
+    def test_reads_2le_and_3le_in_the_same_stream(self):
+        a1, a2 = tle_lines(11111)
+        b1, b2 = tle_lines(22222)
+        c1, c2 = tle_lines(33333)
+        lines = ["SAT A", a1, a2, b1, b2, "0 SAT C", c1, c2]
+        records = list(iter_tles(lines))
+        self.assertEqual([r["norad_id"] for r in records], [11111, 22222, 33333])
+        self.assertEqual([r["name"] for r in records], ["SAT A", "", "SAT C"])
+        self.assertEqual(records[0]["line2"], a2)
+
+    def test_resynchronizes_after_bad_input(self):
+        a1, a2 = tle_lines(11111)
+        b1, b2 = tle_lines(22222)
+        c1, c2 = tle_lines(33333)
+        d1, d2 = tle_lines(44444)
+        corrupted = b2[:-1] + str((int(b2[-1]) + 1) % 10)
+        lines = [
+            "SAT A", a1,  # line 2 missing
+            "SAT B", b1, corrupted,  # bad checksum
+            "SAT C", c1, d2,  # line 2 of another object
+            "garbage", "", "SAT D", d1, d2,
+        ]
+        stats = ParseStats()
+        records = list(iter_tles(lines, stats=stats))
+        self.assertEqual([(r["norad_id"], r["name"]) for r in records], [(44444, "SAT D")])
+        self.assertEqual(stats.records, 1)
+        self.assertEqual(stats.skipped, 3)
+
+    def test_checksums_can_be_ignored(self):
+        a1, a2 = tle_lines(11111)
+        corrupted = a2[:-1] + str((int(a2[-1]) + 1) % 10)
+        self.assertEqual(list(iter_tles([a1, corrupted])), [])
+        self.assertEqual(len(list(iter_tles([a1, corrupted], verify_checksums=False))), 1)
+
+    def test_accepts_bytes_lines(self):
+        a1, a2 = tle_lines(11111)
+        records = list(iter_tles([b"SAT A\r\n", a1.encode() + b"\r\n", a2.encode() + b"\r\n"]))
+        self.assertEqual(records[0]["name"], "SAT A")
+        self.assertEqual(records[0]["line1"], a1)
+
+    def test_is_lazy(self):
+        def lines():
+            for norad_id in range(1, 1000000):
+                yield from tle_lines(norad_id)
+
+        first = next(iter_tles(lines()))
+        self.assertEqual(first["norad_id"], 1)
+
+    def test_alpha5_catalog_numbers(self):
+        self.assertEqual(catalog_number("A0000"), 100000)
+        self.assertEqual(catalog_number("J1234"), 181234)
+        self.assertEqual(catalog_number("Z9999"), 339999)
+        self.assertEqual(catalog_number("25544"), 25544)
+
+    def test_epoch(self):
+        line1, _ = tle_lines(25544)
+        self.assertEqual(tle_epoch(line1), datetime(2024, 6, 20, 13, 9, 31, 125024, tzinfo=timezone.utc))
+        self.assertEqual(tle_epoch(line1.replace("24172.54827691", "98001.50000000")).year, 1998)
+        self.assertIsNone(tle_epoch("L1"))
+
+    def test_chunks(self):
+        self.assertEqual([len(chunk) for chunk in iter_chunks(iter(range(7)), 3)], [3, 3, 1])
+
+    def test_reads_gzipped_and_plain_files(self):
+        a1, a2 = tle_lines(11111)
+        text = f"SAT A\n{a1}\n{a2}\n".encode()
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, data in (("plain.tle", text), ("dump.tle.gz", gzip.compress(text))):
+                path = os.path.join(tmp, name)
+                with open(path, "wb") as handle:
+                    handle.write(data)
+                with open_tle_file(path) as lines:
+                    self.assertEqual([r["norad_id"] for r in iter_tles(lines)], [11111])
+
+
+class StreamUpsertTests(TestCase):
+    def test_upserts_a_stream_in_chunks(self):
+        lines = [line for norad_id in range(1, 8) for line in tle_lines(norad_id)]
+        result = upsert_tle_stream(iter_tles(lines), chunk_size=3)
+        self.assertEqual(result.inserted, 7)
+        self.assertEqual(TLE.objects.count(), 7)
+
+    def test_import_catalog_from_a_gzipped_file(self):
+        text = "\n".join(["SAT A", *tle_lines(11111), "junk", "SAT B", *tle_lines(22222, "14.00000000")]) + "\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dump.tle.gz")
+            with gzip.open(path, "wt") as handle:
+                handle.write(text)
+            out = StringIO()
+            call_command("import_catalog", "--file", path, "--chunk-size", "1", stdout=out)
+        self.assertIn("2 inserted", out.getvalue())
+        self.assertEqual(TLE.objects.get(pk=11111).name, "SAT A")
+        self.assertEqual(TLE.objects.get(pk=22222).name, "SAT B")
+
+    def test_reimport_only_writes_the_rows_that_moved(self):
+        def catalog(epochs):
+            lines = []
+            for norad_id, epoch in epochs.items():
+                line1, line2 = tle_lines(norad_id)
+                lines += [tle_line(line1[:68].replace("24172.54827691", epoch)), line2]
+            return lines
+
+        epochs = {norad_id: "24172.54827691" for norad_id in range(1, 21)}
+        upsert_tle_stream(iter_tles(catalog(epochs)))
+        epochs[3] = "24173.00000000"  # newer elements
+        epochs[4] = "24100.00000000"  # older than what is stored
+
+        with mock.patch.object(TLE.objects, "bulk_create", wraps=TLE.objects.bulk_create) as bulk_create:
+            result = upsert_tle_stream(iter_tles(catalog(epochs)))
+
+        self.assertEqual((result.inserted, result.updated, result.unchanged, result.rejected), (0, 1, 18, 1))
+        self.assertEqual([row.norad_id for row in bulk_create.call_args.args[0]], [3])
+        self.assertEqual(TLE.objects.get(pk=4).epoch.day, 20)
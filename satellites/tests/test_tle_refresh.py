@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import httpx
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from satellites.models import Favorite, TLE
+from satellites.services.tle_fetcher import upsert_tles
+from satellites.services.tle_refresh import RefreshResult, TLERefresher, stale_norad_ids
+from satellites.services.tracking import favorite_positions_for_user
+from satellites.services.upstream import celestrak_breaker, negative_cache
+from satellites.tests.fixtures import tle_text
+
+
+class TLERefresherTests(TestCase):
+    def setUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+
+    async def _handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        norad_id = int(request.url.params["CATNR"])
+        if norad_id == 404:
+            return httpx.Response(404, text="No GP data found")
+        if norad_id == 500:
+            return httpx.Response(200, text="No GP data found")
+        return httpx.Response(200, text=tle_text([norad_id]))
+
+    def _refresher(self, **kwargs):
+        refresher = TLERefresher(transport=httpx.MockTransport(self._handler), **kwargs)
+        self.addCleanup(refresher.close)
+        self.addCleanup(negative_cache.clear)
+        self.addCleanup(celestrak_breaker.reset)
+        return refresher
+
+    def test_refreshes_concurrently_and_upserts_in_one_batch(self):
+        refresher = self._refresher(concurrency=4)
+        with mock.patch("satellites.services.tle_refresh.upsert_tles", wraps=upsert_tles) as upsert:
+            result = refresher.refresh([1, 2, 3, 404, 500, 6, 7, 8, 9, 10, 2])
+
+        upsert.assert_called_once()
+        self.assertEqual(sorted(record["norad_id"] for record in result.records), [1, 2, 3, 6, 7, 8, 9, 10])
+        self.assertEqual(sorted(result.failed), [404, 500])
+        self.assertIn("404", result.failed[404])
+        self.assertTrue(all(isinstance(message, str) for message in result.failed.values()))
+        self.assertEqual(result.upserted.inserted, 8)
+        self.assertEqual(TLE.objects.get(pk=7).name, "SAT 7")
+        self.assertEqual(len(self.requests), 10)  # duplicate ID fetched once
+        self.assertGreater(self.max_in_flight, 1)
+        self.assertLessEqual(self.max_in_flight, 4)
+
+    def test_failures_are_negatively_cached_and_skipped_next_time(self):
+        refresher = self._refresher()
+        refresher.refresh([1, 404])
+        self.requests.clear()
+        result = refresher.refresh([1, 404])
+        self.assertEqual([int(request.url.params["CATNR"]) for request in self.requests], [1])
+        self.assertIn("not fetched again yet", result.failed[404])
+
+    def test_open_breaker_skips_the_whole_batch(self):
+        refresher = self._refresher()
+        for _ in range(celestrak_breaker.threshold):
+            celestrak_breaker.record_failure()
+        result = refresher.refresh([1, 2])
+        self.assertEqual(self.requests, [])
+        self.assertEqual(sorted(result.failed), [1, 2])
+
+    def test_trial_batch_that_raises_releases_the_breaker(self):
+        refresher = self._refresher()
+        for _ in range(celestrak_breaker.threshold):
+            celestrak_breaker.record_failure()
+        celestrak_breaker._opened_at -= celestrak_breaker.cooldown_s  # cooldown over: this batch is the trial
+        with mock.patch.object(refresher, "fetch_many", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                refresher.refresh([1])
+        self.assertEqual(celestrak_breaker.state, "half_open")  # not reopened, and the trial is free again
+        self.assertFalse(celestrak_breaker.is_open())
+        self.assertEqual(len(refresher.refresh([1]).records), 1)
+        self.assertEqual(celestrak_breaker.state, "closed")
+
+    def test_per_host_limit(self):
+        refresher = self._refresher(concurrency=10, per_host=2)
+        refresher.refresh(range(1, 9))
+        self.assertEqual(self.max_in_flight, 2)
+
+    def test_client_is_kept_between_batches(self):
+        refresher = self._refresher()
+        refresher.refresh([1])
+        client = refresher._client
+        refresher.refresh([2])
+        self.assertIs(refresher._client, client)
+
+    def test_nothing_to_refresh(self):
+        self.assertEqual(self._refresher().refresh([]), RefreshResult([], {}, None))
+        self.assertEqual(self.requests, [])
+
+    def test_stale_norad_ids(self):
+        now = datetime.now(timezone.utc)
+        TLE.objects.create(norad_id=1, name="FRESH", line1="L1", line2="L2")
+        TLE.objects.create(norad_id=2, name="OLD", line1="L1", line2="L2")
+        TLE.objects.filter(pk=2).update(updated_at=now - timedelta(days=3))
+        self.assertEqual(stale_norad_ids([1, 2, 3], max_age_hours=48, now=now), [2, 3])
+
+
+class FavoriteBatchRefreshTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="batch", password="pass12345")
+        for norad_id in (11, 12, 13):
+            Favorite.objects.create(user=self.user, norad_id=norad_id, name=f"F{norad_id}", notes="")
+        TLE.objects.create(norad_id=12, name="STORED", line1="S1", line2="S2")
+
+    @mock.patch("satellites.services.tracking.propagate_now")
+    @mock.patch("satellites.services.tracking.get_or_refresh_tle")
+    @mock.patch("satellites.services.tracking.refresh_stale_tles")
+    def test_failed_refreshes_fall_back_to_the_stored_tle(self, mock_refresh, mock_get, mock_propagate):
+        mock_refresh.return_value = RefreshResult([], {12: "timeout", 13: "timeout"}, None)
+        mock_get.return_value = ("F11", "A1", "A2")
+        mock_propagate.return_value = {"lat": 0.0}
+
+        results = favorite_positions_for_user(self.user)
+
+        self.assertEqual(sorted(mock_refresh.call_args.args[0]), [11, 12, 13])
+        mock_get.assert_called_once_with(11, max_age_hours=48)
+        self.assertEqual(sorted((r["norad_id"], r["name"]) for r in results), [(11, "F11"), (12, "STORED")])
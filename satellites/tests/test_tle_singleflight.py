@@ -0,0 +1,143 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from satellites.models import TLE, TLERefreshLease
+from satellites.services import tle_fetcher
+from satellites.services.singleflight import SingleFlight
+from satellites.services.upstream import celestrak_breaker, negative_cache
+
+SAMPLE = "\n".join([
+    "SAT A",
+    "1 12345U 20000A   00000.00000000  .00000000  00000-0  00000-0 0  0000",
+    "2 12345  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123452",
+])
+
+
+def _coalesced(scope):
+    return REGISTRY.get_sample_value("satellites_tle_fetches_coalesced_total", {"scope": scope}) or 0.0
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do(7, slow)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do(7, slow))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        while flight.coalesced < 4:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("result", False)] + [("result", True)] * 4)
+        self.assertEqual(flight.in_flight(), 0)
+        self.assertEqual(flight.do(7, lambda: "again"), ("again", False))
+
+    def test_followers_get_the_leaders_exception(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise tle_fetcher.TLENotFound("gone")
+
+        errors = []
+
+        def call():
+            try:
+                flight.do(1, failing)
+            except tle_fetcher.TLENotFound as exc:
+                errors.append(exc)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=call)
+        follower.start()
+        while flight.coalesced < 1:
+            threading.Event().wait(0.001)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(len(errors), 2)
+
+
+@override_settings(TLE_REFRESH_POLICY="blocking", TLE_REFRESH_LEASE_S=30.0, TLE_REFRESH_LEASE_POLL_S=0.0)
+class RefreshLeaseTests(TestCase):
+    def setUp(self):
+        self.now = datetime.now(timezone.utc)
+        TLE.objects.create(norad_id=12345, name="Old", line1="L1", line2="L2")
+        TLE.objects.filter(pk=12345).update(updated_at=self.now - timedelta(days=3))
+        self.client = mock.Mock()
+        self.client.get.return_value = mock.Mock(
+            text=SAMPLE, status_code=200, headers={}, num_bytes_downloaded=len(SAMPLE), raise_for_status=mock.Mock()
+        )
+        self.addCleanup(negative_cache.clear)
+        self.addCleanup(celestrak_breaker.reset)
+
+    def test_fetches_under_the_lease_and_releases_it(self):
+        name, _, _ = tle_fetcher.get_or_refresh_tle(12345, client=self.client)
+        self.assertEqual(name, "SAT A")
+        self.client.get.assert_called_once()
+        self.assertFalse(TLERefreshLease.objects.exists())
+
+    def test_lease_is_released_when_the_fetch_fails(self):
+        self.client.get.side_effect = tle_fetcher.httpx.ConnectError("down")
+        with self.assertRaises(tle_fetcher.UpstreamUnavailable):
+            tle_fetcher.get_or_refresh_tle(12345, client=self.client)
+        self.assertFalse(TLERefreshLease.objects.exists())
+
+    def test_waits_for_the_worker_holding_the_lease(self):
+        TLERefreshLease.objects.create(norad_id=12345, holder="other:1:x", expires_at=self.now + timedelta(seconds=30))
+        before = _coalesced("lease")
+
+        def other_worker_finishes(_):
+            TLE.objects.filter(pk=12345).update(name="FROM OTHER", updated_at=datetime.now(timezone.utc))
+
+        with mock.patch.object(tle_fetcher.time, "sleep", side_effect=other_worker_finishes):
+            name, _, _ = tle_fetcher.get_or_refresh_tle(12345, client=self.client)
+
+        self.assertEqual(name, "FROM OTHER")
+        self.client.get.assert_not_called()
+        self.assertEqual(_coalesced("lease"), before + 1)
+        self.assertTrue(TLERefreshLease.objects.filter(holder="other:1:x").exists())
+
+    def test_expired_lease_is_taken_over(self):
+        TLERefreshLease.objects.create(norad_id=12345, holder="crashed:1:x", expires_at=self.now - timedelta(seconds=1))
+        name, _, _ = tle_fetcher.get_or_refresh_tle(12345, client=self.client)
+        self.assertEqual(name, "SAT A")
+        self.assertFalse(TLERefreshLease.objects.exists())
+
+    @override_settings(TLE_REFRESH_LEASE_S=0.0)
+    def test_gives_up_waiting_on_a_stuck_holder(self):
+        TLERefreshLease.objects.create(norad_id=12345, holder="stuck:1:x", expires_at=self.now + timedelta(hours=1))
+        name, _, _ = tle_fetcher.get_or_refresh_tle(12345, client=self.client)
+        self.assertEqual(name, "SAT A")
+        self.assertTrue(TLERefreshLease.objects.filter(holder="stuck:1:x").exists())
+
+    def test_waiting_threads_are_counted_as_coalesced(self):
+        before = _coalesced("process")
+        with mock.patch.object(tle_fetcher._refresh_flight, "do", return_value=(("N", "1", "2"), True)):
+            self.assertEqual(tle_fetcher.get_or_refresh_tle(12345, client=self.client), ("N", "1", "2"))
+        self.assertEqual(_coalesced("process"), before + 1)
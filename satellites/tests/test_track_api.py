@@ -0,0 +1,62 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from satellites.models import TLE
+from satellites.tests.fixtures import ISS_LINE1, ISS_LINE2
+
+
+class TrackAPITests(TestCase):
+    def setUp(self):
+        TLE.objects.create(
+            norad_id=25544,
+            name="ISS (ZARYA)",
+            line1=ISS_LINE1,
+            line2=ISS_LINE2,
+        )
+
+    def test_track_returns_points_for_window(self):
+        response = self.client.get(
+            reverse("position-track", args=[25544]),
+            {"start": "2024-06-21T12:00:00Z", "end": "2024-06-21T12:01:00Z", "step": "10"},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["norad_id"], 25544)
+        self.assertEqual(len(data["points"]), 7)
+        self.assertEqual(data["points"][0]["timestamp"], "2024-06-21T12:00:00+00:00")
+        self.assertEqual(data["points"][-1]["timestamp"], "2024-06-21T12:01:00+00:00")
+        for point in data["points"]:
+            self.assertLessEqual(abs(point["lat"]), 52.0)
+
+    def test_track_defaults_to_three_hour_window(self):
+        response = self.client.get(reverse("position-track", args=[25544]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["points"]), 1081)
+
+    def test_offset_timestamps_are_converted_to_utc(self):
+        url = reverse("position-track", args=[25544])
+        with_offset = self.client.get(url, {"start": "2024-06-21T14:00:00+02:00", "end": "2024-06-21T14:01:00+02:00"})
+        utc = self.client.get(url, {"start": "2024-06-21T12:00:00Z", "end": "2024-06-21T12:01:00Z"})
+        self.assertEqual(with_offset.status_code, 200)
+        self.assertEqual(with_offset.json()["start"], "2024-06-21T12:00:00+00:00")
+        self.assertEqual(with_offset.json()["points"], utc.json()["points"])
+
+        position = reverse("position-single", args=[25544])
+        self.assertEqual(
+            self.client.get(position, {"t": "2024-06-21T08:00:00-04:00"}).json(),
+            self.client.get(position, {"t": "2024-06-21T12:00:00Z"}).json(),
+        )
+
+    def test_track_rejects_bad_parameters(self):
+        url = reverse("position-track", args=[25544])
+        self.assertEqual(self.client.get(url, {"start": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"step": "0"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"step": "0.001"}).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {"start": "2024-06-21T12:00:00", "end": "2024-06-21T11:00:00"}).status_code,
+            400,
+        )
+
+    def test_track_unknown_satellite_returns_404(self):
+        response = self.client.get(reverse("position-track", args=[1]))
+        self.assertEqual(response.status_code, 404)
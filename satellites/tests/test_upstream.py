@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase, TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from satellites.models import TLE
+from satellites.services import tle_fetcher
+from satellites.services.tracking import _resolve_tle_data
+from satellites.services.upstream import (
+    NOT_FOUND,
+    UPSTREAM_ERROR,
+    CircuitBreaker,
+    NegativeCache,
+    celestrak_breaker,
+    negative_cache,
+)
+
+SAMPLE = "\n".join([
+    "SAT A",
+    "1 12345U 20000A   00000.00000000  .00000000  00000-0  00000-0 0  0000",
+    "2 12345  98.0000  24.7205 0010000 156.0000  50.0000 14.00000000123452",
+])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(
+    TLE_NOT_FOUND_TTL_S=100.0,
+    TLE_NOT_FOUND_MAX_TTL_S=350.0,
+    TLE_UPSTREAM_ERROR_TTL_S=10.0,
+    TLE_UPSTREAM_ERROR_MAX_TTL_S=1000.0,
+)
+class NegativeCacheTests(SimpleTestCase):
+    def test_backoff_doubles_up_to_the_cap(self):
+        clock = FakeClock()
+        cache = NegativeCache(clock=clock)
+        delays = [cache.record(1, NOT_FOUND).retry_at - clock.now for _ in range(4)]
+        self.assertEqual(delays, [100.0, 200.0, 350.0, 350.0])
+
+    def test_entry_expires_and_a_new_kind_of_failure_starts_over(self):
+        clock = FakeClock()
+        cache = NegativeCache(clock=clock)
+        cache.record(1, NOT_FOUND)
+        cache.record(1, NOT_FOUND)
+        self.assertEqual(cache.get(1).failures, 2)
+        clock.now += 201.0
+        self.assertIsNone(cache.get(1))
+
+        entry = cache.record(1, UPSTREAM_ERROR)
+        self.assertEqual((entry.failures, entry.retry_at - clock.now), (1, 10.0))
+        cache.forget(1)
+        self.assertIsNone(cache.get(1))
+
+    def test_size_is_bounded(self):
+        cache = NegativeCache(maxsize=2)
+        for norad_id in range(5):
+            cache.record(norad_id, NOT_FOUND)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(0))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def _state_metric(self, name):
+        return REGISTRY.get_sample_value("satellites_upstream_breaker_state", {"upstream": name})
+
+    def test_opens_after_the_threshold_then_lets_one_trial_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("test-open", threshold=3, cooldown_s=60.0, clock=clock)
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(self._state_metric("test-open"), 1.0)
+
+        clock.now += 60.0
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # only one trial at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self._state_metric("test-open"), 0.0)
+
+    def test_is_open_does_not_take_the_trial(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("test-is-open", threshold=1, cooldown_s=60.0, clock=clock)
+        self.assertFalse(breaker.is_open())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open())
+        clock.now += 60.0
+        self.assertFalse(breaker.is_open())
+        self.assertTrue(breaker.allow())  # still free for the trial
+        self.assertTrue(breaker.is_open())  # while the trial runs
+
+    def test_failed_trial_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("test-reopen", threshold=1, cooldown_s=60.0, clock=clock)
+        breaker.record_failure()
+        clock.now += 61.0
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        clock.now += 59.0
+        self.assertFalse(breaker.allow())
+
+    def test_release_frees_the_trial_without_settling_it(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("test-release", threshold=2, cooldown_s=60.0, clock=clock)
+        breaker.record_failure()
+        breaker.release()
+        breaker.record_failure()  # the failure before release() still counts
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        clock.now += 60.0
+        self.assertTrue(breaker.allow())
+        breaker.release()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker("test-reset", threshold=2, cooldown_s=60.0)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+@override_settings(TLE_REFRESH_POLICY="blocking", CELESTRAK_BREAKER_THRESHOLD=5)
+class GuardedRefreshTests(TestCase):
+    def setUp(self):
+        self.addCleanup(negative_cache.clear)
+        self.addCleanup(celestrak_breaker.reset)
+        self.now = datetime.now(timezone.utc)
+        self.client = mock.Mock()
+
+    def _respond(self, status_code=200, text=SAMPLE):
+        request = httpx.Request("GET", "https://celestrak.org/")
+        self.client.get.return_value = httpx.Response(status_code, text=text, request=request)
+
+    def test_not_found_is_not_asked_again_and_the_stored_row_is_used(self):
+        tle = TLE.objects.create(norad_id=12345, name="Decayed", line1="L1", line2="L2")
+        TLE.objects.filter(pk=12345).update(updated_at=self.now - timedelta(days=30))
+        self._respond(text="No GP data found")
+
+        with mock.patch("satellites.services.tracking.get_or_refresh_tle", side_effect=lambda norad_id, max_age_hours: (
+            tle_fetcher.get_or_refresh_tle(norad_id, max_age_hours, client=self.client)
+        )):
+            for _ in range(3):
+                self.assertEqual(_resolve_tle_data(tle), ("Decayed", "L1", "L2"))
+        self.client.get.assert_called_once()
+        self.assertEqual(negative_cache.get(12345).reason, NOT_FOUND)
+
+    def test_404_counts_as_not_found(self):
+        self._respond(status_code=404, text="")
+        with self.assertRaises(tle_fetcher.TLENotFound) as raised:
+            tle_fetcher.get_or_refresh_tle(777, client=self.client)
+        self.assertNotIsInstance(raised.exception, tle_fetcher.UpstreamUnavailable)
+        self.assertEqual(celestrak_breaker.state, "closed")
+
+    def test_upstream_failures_open_the_breaker(self):
+        self._respond(status_code=503, text="down")
+        for norad_id in range(1, 6):
+            with self.assertRaises(tle_fetcher.UpstreamUnavailable):
+                tle_fetcher.get_or_refresh_tle(norad_id, client=self.client)
+        self.assertEqual(self.client.get.call_count, 5)
+        self.assertEqual(celestrak_breaker.state, "open")
+        self.assertEqual(negative_cache.get(1).reason, UPSTREAM_ERROR)
+
+        with self.assertRaises(tle_fetcher.UpstreamUnavailable):
+            tle_fetcher.get_or_refresh_tle(99, client=self.client)
+        self.assertEqual(self.client.get.call_count, 5)
+
+    def test_timeouts_are_upstream_errors(self):
+        self.client.get.side_effect = httpx.ReadTimeout("slow")
+        with self.assertRaises(tle_fetcher.UpstreamUnavailable):
+            tle_fetcher.get_or_refresh_tle(1, client=self.client)
+        with self.assertRaises(tle_fetcher.UpstreamUnavailable):
+            tle_fetcher.get_or_refresh_tle(1, client=self.client)
+        self.client.get.assert_called_once()
+
+    def test_success_clears_the_entry(self):
+        negative_cache.record(12345, UPSTREAM_ERROR)
+        negative_cache.forget(12345)
+        self._respond()
+        self.assertEqual(tle_fetcher.get_or_refresh_tle(12345, client=self.client)[0], "SAT A")
+        self.assertIsNone(negative_cache.get(12345))
+
+    def test_unexpected_error_in_the_trial_releases_it(self):
+        for _ in range(celestrak_breaker.threshold):
+            celestrak_breaker.record_failure()
+        celestrak_breaker._opened_at -= celestrak_breaker.cooldown_s  # cooldown over: the next call is the trial
+        with mock.patch.object(tle_fetcher, "load_validator", side_effect=RuntimeError("database is locked")):
+            with self.assertRaises(RuntimeError):
+                tle_fetcher.get_or_refresh_tle(12345, client=self.client)
+        self.assertEqual(celestrak_breaker.state, "half_open")  # not reopened, and the trial is free again
+        self.assertFalse(celestrak_breaker.is_open())
+
+        self._respond()
+        self.assertEqual(tle_fetcher.get_or_refresh_tle(12345, client=self.client)[0], "SAT A")
+        self.assertEqual(celestrak_breaker.state, "closed")
@@ -0,0 +1,25 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+"""Derived TLE fields the model keeps next to the lines (TLE.save) and the bulk writers set themselves. Plain string
+work with no service imports, so the models can use it."""
+
+
+def tle_epoch(line1: str) -> Optional[datetime]:
+    """Epoch of the element set from columns 19-32 of line 1 (YYDDD.DDDDDDDD, years 57-99 are 19xx), None if the
+    field does not parse."""
+    try:
+        year = int(line1[18:20])
+        day = float(line1[20:32])
+    except ValueError:
+        return None
+    year += 1900 if year >= 57 else 2000
+    return datetime(year, 1, 1, tzinfo=timezone.utc) + timedelta(days=day - 1)
+
+
+def tle_content_hash(name: str, line1: str, line2: str) -> str:
+    """Hex digest of a TLE record: equal digests mean there is nothing to write."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{name}\n{line1}\n{line2}".encode("utf-8"))
+    return digest.hexdigest()
@@ -1,9 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
+    conjunctions_list,
     FavoriteViewSet,
+    overhead,
+    passes_favorites,
+    passes_single,
     position_single,
+    position_track,
+    positions_all,
     positions_batch,
+    positions_in_bbox,
     SatelliteListView,
 )
 
@@ -14,5 +21,12 @@ urlpatterns = [
     path("", include(router.urls)),
     path("satellites/", SatelliteListView.as_view(), name="satellites-list"),
     path("position/<int:norad_id>/", position_single, name="position-single"),
+    path("position/<int:norad_id>/track/", position_track, name="position-track"),
+    path("passes/favorites/", passes_favorites, name="passes-favorites"),
+    path("passes/<int:norad_id>/", passes_single, name="passes-single"),
     path("positions/", positions_batch, name="positions-batch"),
+    path("positions/all/", positions_all, name="positions-all"),
+    path("positions/in-bbox/", positions_in_bbox, name="positions-in-bbox"),
+    path("overhead/", overhead, name="overhead"),
+    path("conjunctions/", conjunctions_list, name="conjunctions-list"),
 ]
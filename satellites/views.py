@@ -1,27 +1,41 @@
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from rest_framework import generics, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 from django.contrib.auth.forms import UserCreationForm
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 from .models import Favorite, TLE
+from .renderers import CSVRenderer, NDJSONRenderer
 from .serializers import FavoriteSerializer, TLESerializer
-from .services.catalog import list_catalog_entries, search_catalog
+from .services.catalog import catalog_page, list_catalog_entries, parse_catalog_fields, search_catalog
+from .services.conjunctions import conjunctions_payload
+from .services.export import CONTENT_TYPES, EXPORT_FORMATS, stream_catalog, stream_positions
+from .services.passes import Observer
+from .services.snapshot import get_snapshot, snapshot_json
+from .services.visibility import bbox_payload, overhead_payload
 from .services.tracking import (
+    favorite_passes_for_user,
     favorite_positions_for_user,
     satellite_detail_payload,
+    satellite_passes_payload,
     satellite_position_payload,
+    satellite_track_payload,
 )
 from satellites.services.tle_fetcher import TLENotFound
 import logging
+import math
 logger = logging.getLogger(__name__)
 
 
@@ -137,9 +151,11 @@ def satellite_detail(request, norad_id: int):
 
 @api_view(["GET"])
 def position_single(request, norad_id: int):
-    """Given a NORAD ID, return the current position of the satellite as JSON."""
+    """Given a NORAD ID, return the position of the satellite as JSON: now, or at ?t= propagated from the
+    historical TLE closest to that instant."""
     try:
-        payload = satellite_position_payload(norad_id)
+        at = _parse_time_param(request, "t", None)
+        payload = satellite_position_payload(norad_id, at=at)
     except TLE.DoesNotExist:
         return Response({"detail": "Satellite not found."}, status=status.HTTP_404_NOT_FOUND)
     except TLENotFound as e:
@@ -150,14 +166,221 @@ def position_single(request, norad_id: int):
     # return the position info as JSON
     return Response(payload)
 
+def _parse_time_param(request, name: str, default: datetime) -> datetime:
+    """Read an ISO 8601 timestamp from the query string, converted to UTC (naive values are taken as UTC)."""
+    raw = (request.query_params.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        value = datetime.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' timestamp, expected ISO 8601.")
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    # the propagators hand the calendar fields to jday as UTC, so an offset has to be applied here
+    return value.astimezone(timezone.utc)
+
+
+def _parse_float_param(request, name: str, default: float | None = None) -> float:
+    """Read a float from the query string, raising ValueError with a readable message."""
+    raw = (request.query_params.get(name) or "").strip()
+    if not raw:
+        if default is None:
+            raise ValueError(f"'{name}' is required.")
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError(f"Invalid '{name}', expected a number.")
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid '{name}', expected a finite number.")
+    return value
+
+
+@api_view(["GET"])
+def position_track(request, norad_id: int):
+    """Return the ground track of a satellite over ?start=&end=&step= (defaults to now +/- 90 minutes every 10 s).
+    With ?t= the track comes from the historical TLE closest to t, and the default window is t +/- 90 minutes."""
+    window = timedelta(minutes=90)
+    try:
+        at = _parse_time_param(request, "t", None)
+        now = at or datetime.now(timezone.utc)
+        start = _parse_time_param(request, "start", now - window)
+        end = _parse_time_param(request, "end", now + window)
+        step = _parse_float_param(request, "step", 10.0)
+        if step <= 0:
+            raise ValueError("'step' must be a positive number of seconds.")
+        if end <= start:
+            raise ValueError("'end' must be after 'start'.")
+        max_points = getattr(settings, "TRACK_MAX_POINTS", 20000)
+        if (end - start).total_seconds() / step + 1 > max_points:
+            raise ValueError(f"Track would have more than {max_points} points, use a larger step or a shorter window.")
+        payload = satellite_track_payload(norad_id, start=start, end=end, step_seconds=step, at=at)
+    except TLE.DoesNotExist:
+        return Response({"detail": "Satellite not found."}, status=status.HTTP_404_NOT_FOUND)
+    except TLENotFound as e:
+        return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(payload)
+
+def _parse_observer(request):
+    """Read the observer (?lat=&lon=&alt= in metres) and the ?min_el= elevation mask."""
+    lat = _parse_float_param(request, "lat")
+    lon = _parse_float_param(request, "lon")
+    alt_m = _parse_float_param(request, "alt", 0.0)
+    min_el = _parse_float_param(request, "min_el", 0.0)
+    if not -90.0 <= lat <= 90.0:
+        raise ValueError("'lat' must be between -90 and 90.")
+    if not -180.0 <= lon <= 180.0:
+        raise ValueError("'lon' must be between -180 and 180.")
+    if not -90.0 <= min_el < 90.0:
+        raise ValueError("'min_el' must be between -90 and 90.")
+    return Observer(lat=lat, lon=lon, alt_km=alt_m / 1000.0), min_el
+
+
+def _parse_pass_query(request):
+    """Read the observer (see _parse_observer) and the ?days= window for pass predictions."""
+    observer, min_el = _parse_observer(request)
+    days = _parse_float_param(request, "days", 1.0)
+    max_days = getattr(settings, "PASS_MAX_DAYS", 10)
+    if not 0 < days <= max_days:
+        raise ValueError(f"'days' must be between 0 and {max_days}.")
+    return observer, days, min_el
+
+
+@api_view(["GET"])
+def passes_single(request, norad_id: int):
+    """Return the upcoming passes of a satellite over the observer given by ?lat=&lon=&alt=&days=&min_el=."""
+    try:
+        observer, days, min_el = _parse_pass_query(request)
+        payload = satellite_passes_payload(norad_id, observer, days=days, min_el=min_el)
+    except TLE.DoesNotExist:
+        return Response({"detail": "Satellite not found."}, status=status.HTTP_404_NOT_FOUND)
+    except TLENotFound as e:
+        return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(payload)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def passes_favorites(request):
+    """Return the upcoming passes of every favorite of the current user over the same observer."""
+    try:
+        observer, days, min_el = _parse_pass_query(request)
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(favorite_passes_for_user(request.user, observer, days=days, min_el=min_el))
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def positions_batch(request):
     out = favorite_positions_for_user(request.user)
     return Response(out)
 
+# the JSON (and browsable) renderers plus the streaming export formats
+EXPORT_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, CSVRenderer]
+
+
+def _export_format(request):
+    """"ndjson" or "csv" when the request asked for a streaming export (?format= or Accept), else None."""
+    fmt = getattr(request.accepted_renderer, "format", None)
+    return fmt if fmt in EXPORT_FORMATS else None
+
+
+def _streaming_response(chunks, fmt: str, filename: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'inline; filename="{filename}.{fmt}"'
+    return response
+
+
+@api_view(["GET"])
+@renderer_classes(EXPORT_RENDERERS)
+def positions_all(request):
+    """Return the position of every satellite in the catalog from the shared, periodically refreshed snapshot.
+    ?format=ndjson|csv streams the rows instead, from the snapshot or propagated to ?t= chunk by chunk."""
+    fmt = _export_format(request)
+    if fmt is not None:
+        try:
+            timestamp = _parse_time_param(request, "t", None)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if timestamp is not None:
+            return _streaming_response(stream_positions(fmt, timestamp=timestamp), fmt, "positions")
+        snapshot = get_snapshot()
+        response = _streaming_response(stream_positions(fmt, snapshot=snapshot), fmt, "positions")
+        response["X-Snapshot-Generation"] = str(snapshot.generation)
+        return response
+
+    snapshot = get_snapshot()
+    # the body is already JSON (encoded once per snapshot generation), so skip DRF's renderer
+    response = HttpResponse(snapshot_json(snapshot), content_type="application/json")
+    response["X-Snapshot-Generation"] = str(snapshot.generation)
+    return response
+
+@api_view(["GET"])
+def overhead(request):
+    """Return every satellite above the observer's horizon (?lat=&lon=&alt=&min_el=) from the position snapshot."""
+    try:
+        observer, min_el = _parse_observer(request)
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(overhead_payload(observer, min_el=min_el))
+
+@api_view(["GET"])
+def positions_in_bbox(request):
+    """Return the satellites whose sub-satellite point is inside ?min_lat=&max_lat=&min_lon=&max_lon= at ?t= (default now)."""
+    try:
+        min_lat = _parse_float_param(request, "min_lat")
+        max_lat = _parse_float_param(request, "max_lat")
+        min_lon = _parse_float_param(request, "min_lon")
+        max_lon = _parse_float_param(request, "max_lon")
+        timestamp = _parse_time_param(request, "t", None)
+        if not -90.0 <= min_lat <= max_lat <= 90.0:
+            raise ValueError("Expected -90 <= 'min_lat' <= 'max_lat' <= 90.")
+        if not (-180.0 <= min_lon <= 180.0 and -180.0 <= max_lon <= 180.0):
+            raise ValueError("'min_lon' and 'max_lon' must be between -180 and 180 (min_lon > max_lon crosses the antimeridian).")
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(bbox_payload(min_lat, max_lat, min_lon, max_lon, timestamp=timestamp))
+
+@api_view(["GET"])
+def conjunctions_list(request):
+    """Return the stored close approaches, filtered by ?norad_id=&max_km=&since= (soonest first, at most ?limit=)."""
+    try:
+        raw_id = (request.query_params.get("norad_id") or "").strip()
+        if raw_id and not raw_id.isdigit():
+            raise ValueError("Invalid 'norad_id', expected a positive integer.")
+        max_km = _parse_float_param(request, "max_km") if request.query_params.get("max_km") else None
+        since = _parse_time_param(request, "since", None)
+        limit = int(_parse_float_param(request, "limit", 1000))
+        if limit <= 0:
+            raise ValueError("'limit' must be positive.")
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    payload = conjunctions_payload(
+        norad_id=int(raw_id) if raw_id else None,
+        max_km=max_km,
+        since=since,
+        limit=min(limit, getattr(settings, "CONJUNCTION_MAX_RESULTS", 5000)),
+    )
+    return Response(payload)
+
 class SatelliteListView(generics.ListAPIView): 
-    """API view to list satellites"""
+    """API view to list satellites, one keyset page at a time.
+
+    ?after=<norad_id>&limit=&fields=norad_id,name&search= --> {"results": [...], "next": url of the next page or null}
+    ?all=1 keeps the old full dump (a plain list through TLESerializer, with ?search= and ?ordering=).
+    ?format=ndjson|csv streams the whole catalog (only the ?fields= columns) without paging.
+    """
 
     # so when someone requests /api/satellites/, this view handles the request and returns a list of satellites as JSON 
     queryset = TLE.objects.all().order_by("norad_id")
@@ -166,3 +389,39 @@ class SatelliteListView(generics.ListAPIView):
     search_fields = ["name", "norad_id"]
     ordering_fields = ["name", "norad_id"]
     pagination_class = None 
+    renderer_classes = EXPORT_RENDERERS
+
+    def list(self, request, *args, **kwargs):
+        fmt = _export_format(request)
+        if fmt is not None:
+            try:
+                fields = parse_catalog_fields(request.query_params.get("fields"))
+            except ValueError as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            return _streaming_response(stream_catalog(fmt, fields), fmt, "satellites")
+        if request.query_params.get("all") in ("1", "true"):
+            return super().list(request, *args, **kwargs)
+        try:
+            raw_after = (request.query_params.get("after") or "").strip()
+            if raw_after and not raw_after.isdigit():
+                raise ValueError("Invalid 'after', expected a NORAD ID.")
+            max_limit = getattr(settings, "SATELLITE_PAGE_MAX_SIZE", 5000)
+            limit = int(_parse_float_param(request, "limit", getattr(settings, "SATELLITE_PAGE_SIZE", 500)))
+            if not 0 < limit <= max_limit:
+                raise ValueError(f"'limit' must be between 1 and {max_limit}.")
+            fields = parse_catalog_fields(request.query_params.get("fields"))
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = catalog_page(
+            after=int(raw_after) if raw_after else None,
+            limit=limit,
+            fields=fields,
+            search=request.query_params.get("search", ""),
+        )
+        next_url = None
+        if page.next_after is not None:
+            params = request.query_params.copy()
+            params["after"] = str(page.next_after)
+            next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+        return Response({"results": page.results, "next": next_url})